@@ -1,16 +1,41 @@
 import asyncio
+import json
 import logging
-import random
+import os
+import time
 from collections import defaultdict
 from typing import Any, Dict, List, Optional
 
 import httpx
 
 # Абсолютный импорт
+import metrics
+import tracing
 from config import config
 
+try:
+    import msgpack
+except ImportError:  # без msgpack колода запрашивается в JSON
+    msgpack = None
+
 logger = logging.getLogger(__name__)
 
+# Поля карт, которые использует бот: остальные сервер не присылает
+DECK_FIELDS = "id,name,desc,rdesc,advice,radvice,image"
+# Заголовок с общим секретом: без него Django не отдаёт историю и получателей
+BOT_TOKEN_HEADER = "X-Bot-Token"
+CARDS_ACCEPT = (
+    "application/msgpack, application/json;q=0.9" if msgpack else "application/json"
+)
+
+
+def decode_response(response: httpx.Response) -> Any:
+    """Разбирает ответ API карт в JSON или MessagePack (сжатие httpx снимает сам)"""
+    content_type = response.headers.get("content-type", "")
+    if msgpack is not None and content_type.startswith("application/msgpack"):
+        return msgpack.unpackb(response.content, raw=False)
+    return response.json()
+
 
 class RateLimiter:
     def __init__(self):
@@ -44,44 +69,236 @@ class TarotAPI:
         self.base_url = base_url
         self.timeout = timeout
         self.cards_cache = None
+        # Колода по id, курсор изменений и файл для восстановления после перезапуска
+        self.cards_by_id = {}
+        self.deck_cursor = None
+        self.deck_cache_path = config.DECK_CACHE_PATH
+        self.deck_version = None
         self.cache_timestamp = 0
-        self.cache_ttl = 300
+        # Изменения колоды стоят почти ничего, поэтому проверяем их часто
+        self.cache_ttl = config.DECK_SYNC_INTERVAL
         self.session = None
+        # Первая страница истории по пользователям: {user_id: (время, данные)}
+        self.history_cache = {}
+        self.history_cache_ttl = 60
+        self.history_cache_size = 1000
 
     async def get_session(self) -> httpx.AsyncClient:
         if self.session is None or self.session.is_closed:
-            self.session = httpx.AsyncClient(timeout=self.timeout)
+            headers = {BOT_TOKEN_HEADER: config.API_TOKEN} if config.API_TOKEN else None
+            self.session = httpx.AsyncClient(timeout=self.timeout, headers=headers)
         return self.session
 
     async def close(self):
         if self.session:
             await self.session.aclose()
 
+    async def _request(
+        self, method: str, endpoint: str, path: str, **kwargs
+    ) -> httpx.Response:
+        """Запрос к API с метриками и trace id апдейта; endpoint — метка без id пользователя"""
+        client = await self.get_session()
+        trace_id = tracing.current_trace_id()
+        if trace_id:
+            kwargs["headers"] = {**(kwargs.get("headers") or {}), tracing.TRACE_HEADER: trace_id}
+        metrics.API_IN_PROGRESS.inc()
+        start = time.perf_counter()
+        with tracing.span(f"api.{endpoint}") as attrs:
+            try:
+                response = await client.request(method, f"{self.base_url}{path}", **kwargs)
+            except httpx.HTTPError as e:
+                metrics.API_ERRORS.labels(endpoint, type(e).__name__).inc()
+                raise
+            finally:
+                metrics.API_IN_PROGRESS.dec()
+                metrics.API_LATENCY.labels(endpoint).observe(time.perf_counter() - start)
+            attrs["status"] = response.status_code
+        if response.is_error:
+            metrics.API_ERRORS.labels(endpoint, str(response.status_code)).inc()
+        return response
+
     async def get_cards(self) -> Optional[list]:
+        """Колода карт: берётся с диска и догружается изменениями не чаще раза в cache_ttl"""
         current_time = asyncio.get_event_loop().time()
 
-        if self.cards_cache and current_time - self.cache_timestamp < self.cache_ttl:
+        fresh = self.cards_cache and current_time - self.cache_timestamp < self.cache_ttl
+        metrics.count_cache("deck", bool(fresh))
+        if fresh:
             return self.cards_cache
 
+        if self.cards_cache is None:
+            self._load_deck()
+        if await self.sync_deck():
+            logger.info("Колода обновлена: %s карт", len(self.cards_cache))
+        if self.cards_cache is not None:
+            self.cache_timestamp = current_time
+        return self.cards_cache
+
+    async def sync_deck(self) -> bool:
+        """Применяет изменения колоды с сервера; возвращает True, если колода изменилась"""
+        params = {"fields": DECK_FIELDS}
+        if self.deck_cursor:
+            params["since"] = self.deck_cursor
+
         try:
-            client = await self.get_session()
-            response = await client.get(f"{self.base_url}/api/cards/")
+            response = await self._request(
+                "GET",
+                "cards_changes",
+                "/api/cards/changes/",
+                params=params,
+                headers={"Accept": CARDS_ACCEPT},
+            )
+            if response.status_code == 400 and self.deck_cursor:
+                # Сервер не принял курсор — начинаем с полной выгрузки
+                self.deck_cursor = None
+                return await self.sync_deck()
             response.raise_for_status()
-            cards = response.json()
+            changes = decode_response(response)
 
-            self.cards_cache = cards
-            self.cache_timestamp = current_time
+        except Exception as e:
+            logger.error("Ошибка при синхронизации колоды: %s", e, exc_info=True)
+            return False
+
+        if changes["full"]:
+            self.cards_by_id = {}
+        for card in changes["changed"]:
+            self.cards_by_id[card["id"]] = card
+        for card_id in changes["deleted"]:
+            self.cards_by_id.pop(card_id, None)
+
+        updated = bool(
+            changes["full"]
+            or changes["changed"]
+            or changes["deleted"]
+            or changes["deck_version"] != self.deck_version
+        )
+        self.deck_cursor = changes["cursor"]
+        self.deck_version = changes["deck_version"]
+        if updated:
+            self.cards_cache = sorted(self.cards_by_id.values(), key=lambda card: card["id"])
+            self.save_deck()
+        return updated
+
+    def _load_deck(self) -> None:
+        """Читает сохранённую колоду, чтобы после перезапуска скачать только изменения"""
+        try:
+            with open(self.deck_cache_path, "r", encoding="utf-8") as f:
+                saved = json.load(f)
+        except (OSError, ValueError):
+            return
+        # Набор полей поменялся — сохранённая колода не подходит
+        if saved.get("fields") != DECK_FIELDS:
+            return
+        self.cards_by_id = {card["id"]: card for card in saved["cards"]}
+        self.cards_cache = saved["cards"]
+        self.deck_cursor = saved["cursor"]
+        self.deck_version = saved["deck_version"]
+
+    def save_deck(self) -> None:
+        """Атомарно сохраняет колоду и курсор изменений на диск (его читает _load_deck)"""
+        tmp_path = f"{self.deck_cache_path}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(
+                    {
+                        "fields": DECK_FIELDS,
+                        "cursor": self.deck_cursor,
+                        "deck_version": self.deck_version,
+                        "cards": self.cards_cache,
+                    },
+                    f,
+                    ensure_ascii=False,
+                )
+            os.replace(tmp_path, self.deck_cache_path)
+        except OSError as e:
+            logger.warning("Не удалось сохранить колоду на диск: %s", e)
 
-            logger.info(f"Загружено {len(cards)} карт из API")
-            return cards
+    async def get_random_card(self) -> Optional[Dict[Any, Any]]:
+        try:
+            response = await self._request(
+                "GET",
+                "cards_random",
+                "/api/cards/random/",
+                params={"fields": DECK_FIELDS},
+                headers={"Accept": CARDS_ACCEPT},
+            )
+            response.raise_for_status()
+            return decode_response(response)
 
         except Exception as e:
-            logger.error(f"Ошибка при получении карт: {e}", exc_info=True)
+            logger.error("Ошибка при получении случайной карты: %s", e)
             return None
 
-    async def get_random_card(self) -> Optional[Dict[Any, Any]]:
-        cards = await self.get_cards()
-        return random.choice(cards) if cards else None
+    async def draw_spread(
+        self,
+        spread_type: str,
+        user_id: int = None,
+        question: str = None,
+        seed: str = None,
+    ) -> Optional[Dict[str, Any]]:
+        """Вытягивает карты расклада на сервере; с user_id запрос сохраняется в историю.
+
+        С seed сервер выбирает карты повторяемо: тот же seed — тот же расклад.
+        """
+        params = {"type": spread_type}
+        if user_id is not None:
+            params["telegram_id"] = user_id
+        if question:
+            params["question"] = question
+        if seed:
+            params["seed"] = seed
+
+        try:
+            response = await self._request(
+                "GET", "spreads_draw", "/api/spreads/draw/", params=params
+            )
+            response.raise_for_status()
+            if user_id is not None:
+                self.history_cache.pop(user_id, None)
+            return response.json()
+
+        except Exception as e:
+            logger.error("Ошибка при получении расклада %s: %s", spread_type, e)
+            return None
+
+    async def get_user_history(
+        self, user_id: int, cursor: str = None, limit: int = 10
+    ) -> Optional[Dict[str, Any]]:
+        """История запросов пользователя; первая страница кэшируется ненадолго"""
+        current_time = asyncio.get_event_loop().time()
+        if cursor is None:
+            cached = self.history_cache.get(user_id)
+            hit = bool(cached and current_time - cached[0] < self.history_cache_ttl)
+            metrics.count_cache("history", hit)
+            if hit:
+                return cached[1]
+
+        params = {"limit": limit}
+        if cursor:
+            params["cursor"] = cursor
+
+        try:
+            response = await self._request(
+                "GET",
+                "user_requests_list",
+                f"/api/users/{user_id}/requests/",
+                params=params,
+            )
+            if response.status_code == 404:
+                return {"results": [], "next_cursor": None}
+            response.raise_for_status()
+            history = response.json()
+
+        except Exception as e:
+            logger.error("Ошибка при получении истории %s: %s", user_id, e)
+            return None
+
+        if cursor is None:
+            if len(self.history_cache) >= self.history_cache_size:
+                # Вытесняем самую старую запись (словарь хранит порядок вставки)
+                self.history_cache.pop(next(iter(self.history_cache)))
+            self.history_cache[user_id] = (current_time, history)
+        return history
 
     async def register_user(
         self,
@@ -98,28 +315,65 @@ class TarotAPI:
                 "last_name": last_name,
             }
 
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
-                response = await client.post(
-                    f"{self.base_url}/api/users/register/", json=data
-                )
-                return response.status_code in [201, 400]
+            response = await self._request(
+                "POST", "users_register", "/api/users/register/", json=data
+            )
+            return response.status_code in [201, 400]
 
         except Exception as e:
-            logger.error(f"Ошибка регистрации пользователя {user_id}: {e}")
+            logger.error("Ошибка регистрации пользователя %s: %s", user_id, e)
             return False
 
-    async def save_user_request(self, user_id: int, request_text: str) -> bool:
+    async def save_user_request(
+        self, user_id: int, request_text: str, spread_type: Optional[str] = None
+    ) -> bool:
         try:
             data = {"telegram_id": user_id, "request_text": request_text}
+            if spread_type:
+                data["spread_type"] = spread_type
 
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
-                response = await client.post(
-                    f"{self.base_url}/api/users/requests/", json=data
-                )
-                return response.status_code == 201
+            response = await self._request(
+                "POST", "user_requests_create", "/api/users/requests/", json=data
+            )
+            self.history_cache.pop(user_id, None)
+            return response.status_code == 201
+
+        except Exception as e:
+            logger.error("Ошибка сохранения запроса %s: %s", user_id, e)
+            return False
+
+    async def get_recipients(
+        self, after: int = None, limit: int = 500
+    ) -> Optional[Dict[str, Any]]:
+        """Страница telegram_id получателей рассылки по возрастанию (keyset по after)"""
+        params = {"limit": limit}
+        if after is not None:
+            params["after"] = after
+
+        try:
+            response = await self._request(
+                "GET", "users_recipients", "/api/users/recipients/", params=params
+            )
+            response.raise_for_status()
+            return response.json()
+
+        except Exception as e:
+            logger.error("Ошибка при получении получателей после %s: %s", after, e)
+            return None
+
+    async def mark_blocked(self, user_ids: List[int]) -> bool:
+        """Отмечает пользователей, заблокировавших бота, чтобы рассылки их пропускали"""
+        try:
+            response = await self._request(
+                "POST",
+                "users_blocked",
+                "/api/users/blocked/",
+                json={"telegram_ids": user_ids},
+            )
+            return response.status_code == 200
 
         except Exception as e:
-            logger.error(f"Ошибка сохранения запроса {user_id}: {e}")
+            logger.error("Ошибка отметки %s заблокировавших бота: %s", len(user_ids), e)
             return False
 
 
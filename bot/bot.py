@@ -7,20 +7,40 @@ from api_client import rate_limiter_instance, tarot_api_instance
 
 # Абсолютные импорты
 from config import config
+from file_ids import file_id_cache
 from handlers.common import router as common_router
+from handlers.interpretation import precompile_blocks
+from handlers.spreads import SPREADS_CONFIG
 from handlers.spreads import router as spreads_router
 from handlers.start import router as start_router
+from metrics import MetricsMiddleware, set_ready, start_metrics_server
+from logs import setup_logging
+from shutdown import ShutdownCoordinator
+from tracing import TracingMiddleware
+from warmup import process_uptime, warm_up
 
-logging.basicConfig(
-    level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
-)
 logger = logging.getLogger(__name__)
 
 
-async def main():
-    logger.info("🚀 Запуск бота...")
+async def sync_deck_periodically():
+    """Подтягивает изменения колоды, чтобы правки из админки доходили за секунды"""
+    while True:
+        await asyncio.sleep(config.DECK_SYNC_INTERVAL)
+        if await tarot_api_instance.sync_deck():
+            precompile_blocks(
+                tarot_api_instance.cards_cache, tarot_api_instance.deck_version
+            )
+        # Заодно сбрасываем на диск новые file_id, чтобы не потерять их при падении
+        await asyncio.to_thread(file_id_cache.save)
 
-    bot = Bot(token=config.TOKEN)
+
+def save_deck_snapshot():
+    if tarot_api_instance.cards_cache:
+        tarot_api_instance.save_deck()
+
+
+def create_dispatcher() -> Dispatcher:
+    """Диспетчер со всеми роутерами и middleware (его же запускает loadtest.py)"""
     dp = Dispatcher(storage=MemoryStorage())
 
     # Регистрируем роутеры
@@ -28,25 +48,68 @@ async def main():
     dp.include_router(spreads_router)
     dp.include_router(common_router)
 
+    # Учёт апдейтов в обработке — первым, чтобы остановка дождалась их целиком
+    coordinator = ShutdownCoordinator(config.SHUTDOWN_TIMEOUT)
+    coordinator.add_flush("deck", save_deck_snapshot)
+    coordinator.add_flush("file_ids", file_id_cache.save)
+    dp.update.outer_middleware(coordinator)
+    dp.shutdown.register(coordinator.on_shutdown)
+
+    # Trace id выдаётся на весь апдейт, до выбора хендлера
+    dp.update.outer_middleware(TracingMiddleware(config.TRACE_FILE))
+
+    # Inner middleware на корневом роутере действует и на вложенные
+    metrics_middleware = MetricsMiddleware(SPREADS_CONFIG)
+    dp.message.middleware(metrics_middleware)
+    dp.callback_query.middleware(metrics_middleware)
+    return dp
+
+
+async def main():
+    # До main процесс только загружал модули: это этап imports прогрева
+    imports_seconds = process_uptime()
+    logger.info("🚀 Запуск бота...")
+
+    bot = Bot(token=config.TOKEN)
+    dp = create_dispatcher()
+
+    deck_sync_task = None
+    metrics_runner = None
     try:
-        # Проверяем API
-        cards = await tarot_api_instance.get_cards()
-        logger.info(f"✅ API доступно, загружено {len(cards) if cards else 0} карт")
+        # Сервер метрик — до прогрева, чтобы /ready отвечал 503, пока бот не готов
+        if config.METRICS_PORT:
+            metrics_runner = await start_metrics_server(
+                config.METRICS_HOST, config.METRICS_PORT
+            )
 
-        await dp.start_polling(bot)
+        await warm_up(bot, imports_seconds)
+        deck_sync_task = asyncio.create_task(sync_deck_periodically())
+
+        # По SIGTERM aiogram останавливает polling и вызывает dp.shutdown:
+        # координатор дожидается апдейтов в обработке; сессию закрываем сами ниже
+        await dp.start_polling(bot, close_bot_session=False)
 
     except Exception as e:
-        logger.error(f"❌ Критическая ошибка: {e}", exc_info=True)
+        logger.error("❌ Критическая ошибка: %s", e, exc_info=True)
         raise
     finally:
+        set_ready(False)
+        if deck_sync_task:
+            deck_sync_task.cancel()
+        if metrics_runner:
+            await metrics_runner.cleanup()
         await tarot_api_instance.close()
         await bot.session.close()
 
 
 if __name__ == "__main__":
+    log_listener = setup_logging(config.LOG_LEVEL, config.LOG_FORMAT)
     try:
         asyncio.run(main())
     except KeyboardInterrupt:
         logger.info("👋 Бот остановлен пользователем")
     except Exception as e:
-        logger.error(f"💥 Неожиданная ошибка: {e}", exc_info=True)
+        logger.error("💥 Неожиданная ошибка: %s", e, exc_info=True)
+    finally:
+        # Дописываем записи, оставшиеся в очереди логов
+        log_listener.stop()
@@ -0,0 +1,368 @@
+"""Рассылка «карты дня» всем пользователям бота.
+
+Получатели читаются из API страницами по возрастанию telegram_id (keyset),
+картинка рисуется и загружается один раз, дальше отправляется по file_id.
+Сообщения уходят с постоянной скоростью в пределах лимитов Telegram,
+заблокировавшие бота отмечаются в API и в следующие рассылки не попадают.
+Прогресс пишется в файл: прерванная рассылка продолжается с того же места.
+
+    python broadcast.py --checkpoint broadcast.json
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import signal
+import sys
+import time
+from typing import Optional
+
+from aiogram import Bot
+from aiogram.exceptions import (
+    TelegramBadRequest,
+    TelegramForbiddenError,
+    TelegramNetworkError,
+    TelegramRetryAfter,
+    TelegramServerError,
+)
+from aiogram.types import BufferedInputFile
+
+from api_client import tarot_api_instance
+from config import config
+from file_ids import file_id_cache, spread_image_key
+from handlers.spreads import escape_md
+from images import generate_single_card_image
+from keyboards import get_main_keyboard
+from logs import setup_logging
+from utils import format_card_message
+
+logger = logging.getLogger("broadcast")
+
+# Telegram допускает около 30 сообщений в секунду от бота в разные чаты
+DEFAULT_RATE = 25
+SEND_ATTEMPTS = 3
+PAGE_ATTEMPTS = 5
+# Прогресс внутри страницы сохраняется каждые N доставок или секунд:
+# после kill повторно получат сообщение не больше этого числа пользователей
+CHECKPOINT_EVERY = 25
+CHECKPOINT_INTERVAL = 2.0
+
+
+class SendRateLimiter:
+    """Равномерно распределяет отправки: не чаще rate в секунду на все задачи.
+
+    После RetryAfter от Telegram пауза действует на всех, а не на одну задачу.
+    """
+
+    def __init__(self, rate: float):
+        self.interval = 1 / rate
+        self._next_slot = 0.0
+
+    async def wait(self) -> None:
+        now = time.monotonic()
+        slot = max(now, self._next_slot)
+        self._next_slot = slot + self.interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+    def pause(self, seconds: float) -> None:
+        self._next_slot = max(self._next_slot, time.monotonic() + seconds)
+
+
+class Checkpoint:
+    """Состояние рассылки на диске: содержимое, file_id, позиция и счётчики.
+
+    after — последний telegram_id полностью обработанной страницы, done —
+    уже обработанные получатели текущей страницы (на случай остановки посреди неё),
+    pending_blocked — заблокировавшие бота, ещё не отмеченные в API.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.state = {}
+
+    def load(self) -> bool:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                self.state = json.load(f)
+        except FileNotFoundError:
+            return False
+        return True
+
+    def save(self) -> None:
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.state, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+
+class Broadcast:
+    def __init__(self, bot: Bot, checkpoint: Checkpoint, args):
+        self.bot = bot
+        self.checkpoint = checkpoint
+        self.state = checkpoint.state
+        self.limiter = SendRateLimiter(args.rate)
+        self.concurrency = args.concurrency
+        self.page_size = args.page_size
+        self.dry_run = args.dry_run
+        self._image = None
+        self._unsaved = 0
+        self._saved_at = time.monotonic()
+
+    async def prepare(self, text: Optional[str]) -> None:
+        """Вытягивает карту дня один раз: при продолжении рассылки берётся из файла"""
+        if "caption" in self.state:
+            return
+        spread = await tarot_api_instance.draw_spread("single_card")
+        if not spread or not spread.get("cards"):
+            raise RuntimeError("Не удалось вытянуть карту дня")
+        card = spread["cards"][0]
+        body = format_card_message([card], ["Карта дня"], [card["is_reversed"]], "🌞 Карта дня")
+        if text:
+            body = f"{text}\n\n{body}"
+        self.state.update(
+            card=card,
+            deck_version=spread.get("deck_version"),
+            caption=escape_md(body),
+            file_id=None,
+            after=None,
+            done=[],
+            sent=0,
+            blocked=0,
+            failed=0,
+            pending_blocked=[],
+            finished=False,
+        )
+        # Картинка могла уже уйти пользователям в обычном раскладе
+        file_id_cache.load()
+        self.state["file_id"] = file_id_cache.get(self._image_key())
+        self.checkpoint.save()
+
+    def _image_key(self) -> Optional[str]:
+        card = self.state["card"]
+        return spread_image_key(
+            self.state["deck_version"],
+            generate_single_card_image.__name__,
+            [card],
+            [card["is_reversed"]],
+        )
+
+    def _render(self) -> Optional[BufferedInputFile]:
+        """Картинка для первой загрузки (None — у карты нет изображения, уйдёт текст)"""
+        card = self.state["card"]
+        return generate_single_card_image(card, card["is_reversed"])
+
+    async def _send(self, chat_id: int, photo) -> Optional[str]:
+        """Отправляет сообщение (photo — file_id, картинка или None); возвращает file_id загруженной картинки"""
+        options = {
+            "parse_mode": "MarkdownV2",
+            "reply_markup": get_main_keyboard(),
+        }
+        if self.dry_run:
+            return None
+        if photo is None:
+            await self.bot.send_message(chat_id, self.state["caption"], **options)
+            return None
+        sent = await self.bot.send_photo(
+            chat_id, photo, caption=self.state["caption"], **options
+        )
+        if isinstance(photo, BufferedInputFile) and sent.photo:
+            return sent.photo[-1].file_id
+        return None
+
+    async def deliver(self, chat_id: int, photo) -> str:
+        """Доставка одному получателю: sent, blocked или failed"""
+        for attempt in range(1, SEND_ATTEMPTS + 1):
+            await self.limiter.wait()
+            try:
+                file_id = await self._send(chat_id, photo)
+            except TelegramRetryAfter as e:
+                logger.warning("Telegram просит подождать %s с", e.retry_after)
+                self.limiter.pause(e.retry_after)
+                continue
+            except TelegramForbiddenError:
+                # Бот заблокирован или аккаунт удалён
+                self.state["pending_blocked"].append(chat_id)
+                return "blocked"
+            except TelegramBadRequest as e:
+                if "chat not found" in e.message.lower():
+                    self.state["pending_blocked"].append(chat_id)
+                    return "blocked"
+                logger.warning("Не удалось отправить рассылку %s: %s", chat_id, e.message)
+                return "failed"
+            except (TelegramNetworkError, TelegramServerError) as e:
+                logger.warning("Ошибка Telegram для %s (попытка %s): %s", chat_id, attempt, e)
+                await asyncio.sleep(attempt)
+                continue
+            if file_id:
+                self._remember_file_id(file_id)
+            return "sent"
+        return "failed"
+
+    def _remember_file_id(self, file_id: str) -> None:
+        """Загруженная картинка: в прогресс рассылки и в кэш file_id бота для обычных раскладов"""
+        self.state["file_id"] = file_id
+        self.checkpoint.save()
+        image_key = self._image_key()
+        if image_key:
+            # Перечитываем файл: бот мог дописать его, пока шла рассылка
+            file_id_cache.load()
+            file_id_cache.put(image_key, file_id)
+            file_id_cache.save()
+
+    async def _fetch_page(self, after: Optional[int]) -> dict:
+        for attempt in range(1, PAGE_ATTEMPTS + 1):
+            page = await tarot_api_instance.get_recipients(after, self.page_size)
+            if page is not None:
+                return page
+            await asyncio.sleep(2 ** attempt)
+        raise RuntimeError(f"API не отдаёт получателей после {after}")
+
+    async def _flush_blocked(self) -> None:
+        blocked = self.state["pending_blocked"]
+        if blocked and not self.dry_run:
+            if not await tarot_api_instance.mark_blocked(blocked):
+                # Не страшно: в следующий раз они снова попадут в Forbidden
+                logger.warning("Не удалось отметить %s заблокировавших бота", len(blocked))
+        self.state["pending_blocked"] = []
+
+    async def _deliver_page(self, chat_ids: list) -> None:
+        done = set(self.state["done"])
+        pending = [chat_id for chat_id in chat_ids if chat_id not in done]
+        if not pending:
+            return
+
+        # Пока нет file_id, картинка загружается по одному получателю за раз,
+        # остальные получают её уже по file_id
+        while pending and not self.state["file_id"] and not self.dry_run:
+            if self._image is None:
+                self._image = await asyncio.to_thread(self._render)
+            if self._image is None:
+                break
+            chat_id = pending.pop(0)
+            self._count(chat_id, await self.deliver(chat_id, self._image))
+        photo = self.state["file_id"]
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def deliver_one(chat_id: int) -> None:
+            async with semaphore:
+                self._count(chat_id, await self.deliver(chat_id, photo))
+
+        await asyncio.gather(*(deliver_one(chat_id) for chat_id in pending))
+
+    def _count(self, chat_id: int, result: str) -> None:
+        self.state[result] += 1
+        self.state["done"].append(chat_id)
+        self._unsaved += 1
+        if (
+            self._unsaved >= CHECKPOINT_EVERY
+            or time.monotonic() - self._saved_at >= CHECKPOINT_INTERVAL
+        ):
+            self._save()
+
+    def _save(self) -> None:
+        self.checkpoint.save()
+        self._unsaved = 0
+        self._saved_at = time.monotonic()
+
+    async def run(self) -> None:
+        start = time.perf_counter()
+        sent_before = self.state["sent"]
+        next_page = asyncio.create_task(self._fetch_page(self.state["after"]))
+        try:
+            while True:
+                page = await next_page
+                chat_ids = page["results"]
+                # Следующую страницу запрашиваем, пока отправляется текущая
+                if page["next_after"] is not None:
+                    next_page = asyncio.create_task(self._fetch_page(page["next_after"]))
+
+                await self._deliver_page(chat_ids)
+                await self._flush_blocked()
+                if chat_ids:
+                    self.state["after"] = chat_ids[-1]
+                self.state["done"] = []
+                self._save()
+
+                elapsed = time.perf_counter() - start
+                logger.info(
+                    "Рассылка: отправлено %s, заблокировали %s, ошибок %s",
+                    self.state["sent"],
+                    self.state["blocked"],
+                    self.state["failed"],
+                    extra={
+                        "after": self.state["after"],
+                        "rate": round((self.state["sent"] - sent_before) / elapsed, 1),
+                    },
+                )
+                if page["next_after"] is None:
+                    break
+            self.state["finished"] = True
+        finally:
+            if not next_page.done():
+                next_page.cancel()
+            # Остановка посреди страницы: сохраняем, кому уже отправлено
+            try:
+                await self._flush_blocked()
+            finally:
+                self._save()
+
+
+async def run(args) -> dict:
+    checkpoint = Checkpoint(args.checkpoint)
+    if checkpoint.load() and checkpoint.state.get("finished") and not args.restart:
+        logger.info("Рассылка из %s уже завершена", args.checkpoint)
+        return checkpoint.state
+    if args.restart:
+        checkpoint.state = {}
+
+    # SIGTERM (systemd, kill) завершает рассылку так же, как Ctrl+C: с сохранением прогресса
+    asyncio.get_running_loop().add_signal_handler(
+        signal.SIGTERM, asyncio.current_task().cancel
+    )
+    checkpoint.state.setdefault("pending_blocked", [])
+
+    bot = Bot(token=config.TOKEN)
+    broadcast = Broadcast(bot, checkpoint, args)
+    start = time.perf_counter()
+    try:
+        await broadcast.prepare(args.text)
+        await broadcast.run()
+    finally:
+        await tarot_api_instance.close()
+        await bot.session.close()
+    checkpoint.state["elapsed"] = time.perf_counter() - start
+    return checkpoint.state
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Рассылка карты дня всем пользователям бота")
+    parser.add_argument("--checkpoint", default="broadcast.json", help="Файл прогресса: с ним прерванная рассылка продолжается")
+    parser.add_argument("--restart", action="store_true", help="Начать новую рассылку, даже если в файле прогресса есть незавершённая")
+    parser.add_argument("--text", help="Текст перед картой дня")
+    parser.add_argument("--rate", type=float, default=DEFAULT_RATE, help="Сообщений в секунду")
+    parser.add_argument("--concurrency", type=int, default=20, help="Отправок одновременно")
+    parser.add_argument("--page-size", type=int, default=500, help="Получателей на страницу API")
+    parser.add_argument("--dry-run", action="store_true", help="Пройти по получателям, ничего не отправляя")
+    parser.add_argument("--log-level", default=config.LOG_LEVEL)
+    args = parser.parse_args()
+
+    log_listener = setup_logging(args.log_level, config.LOG_FORMAT)
+    try:
+        state = asyncio.run(run(args))
+    except (KeyboardInterrupt, asyncio.CancelledError):
+        sys.exit(f"Рассылка прервана, прогресс сохранён в {args.checkpoint}")
+    finally:
+        log_listener.stop()
+
+    print(
+        f"Отправлено: {state['sent']}, заблокировали бота: {state['blocked']}, "
+        f"ошибок: {state['failed']}"
+        + (f", за {state['elapsed']:.1f} с" if "elapsed" in state else "")
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -9,6 +9,39 @@ class Config:
     TOKEN = os.getenv("BOT_TOKEN")
     API_BASE_URL = os.getenv("API_BASE_URL")
     API_TIMEOUT = int(os.getenv("API_TIMEOUT", "10"))
+    # Общий секрет с Django (BOT_API_TOKEN): история и рассылки доступны только боту
+    API_TOKEN = os.getenv("BOT_API_TOKEN", "")
+    MEDIA_ROOT = os.getenv("MEDIA_ROOT", "/var/www/mystratarotbot/web/media")
+    # Колода, сохранённая между перезапусками, и период проверки изменений (сек)
+    DECK_CACHE_PATH = os.getenv(
+        "DECK_CACHE_PATH", os.path.join(os.path.dirname(__file__), "deck_cache.json")
+    )
+    DECK_SYNC_INTERVAL = int(os.getenv("DECK_SYNC_INTERVAL", "10"))
+    # Локальный HTTP-сервер с /metrics (формат Prometheus); порт 0 — выключен
+    METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+    METRICS_PORT = int(os.getenv("METRICS_PORT", "9101"))
+    # JSONL-файл для спанов обработки апдейтов (тот же, что TRACE_FILE у Django);
+    # пусто — спаны не пишутся, trace id всё равно уходит в логи и API
+    TRACE_FILE = os.getenv("TRACE_FILE", "")
+    # Уровень логов и формат: json (по строке JSON на запись) или text
+    LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+    LOG_FORMAT = os.getenv("LOG_FORMAT", "json")
+    # Память под декодированные изображения карт (спрайты), МБ
+    SPRITE_CACHE_MB = int(os.getenv("SPRITE_CACHE_MB", "128"))
+    # file_id отправленных картинок раскладов (повтор без рендера и загрузки)
+    FILE_ID_CACHE_PATH = os.getenv(
+        "FILE_ID_CACHE_PATH", os.path.join(os.path.dirname(__file__), "file_id_cache.json")
+    )
+    FILE_ID_CACHE_SIZE = int(os.getenv("FILE_ID_CACHE_SIZE", "10000"))
+    # Сколько ждать апдейты в обработке при остановке (сек)
+    SHUTDOWN_TIMEOUT = float(os.getenv("SHUTDOWN_TIMEOUT", "25"))
+    # Расклад на день определяется пользователем и датой: повторные нажатия
+    # в тот же день показывают тот же расклад без рендера
+    DAILY_SPREAD_SEEDED = os.getenv("DAILY_SPREAD_SEEDED", "false").lower() == "true"
+    # Часовой пояс, в котором наступает новый день для расклада на день
+    DAILY_SPREAD_TZ = os.getenv("DAILY_SPREAD_TZ", "Europe/Moscow")
+    # Сколько пользователей держать в памяти с их раскладом на день
+    DAILY_CACHE_SIZE = int(os.getenv("DAILY_CACHE_SIZE", "10000"))
 
     if not TOKEN:
         raise ValueError("BOT_TOKEN не найден в переменных окружения")
@@ -0,0 +1,55 @@
+import datetime
+from collections import OrderedDict
+from typing import Optional
+from zoneinfo import ZoneInfo
+
+import metrics
+from config import config
+
+# Расклады, которые в детерминированном режиме повторяются весь день
+SEEDED_SPREADS = ("daily_spread",)
+
+
+def daily_seed(spread_type: str, user_id: int, today: datetime.date = None) -> Optional[str]:
+    """Seed расклада по пользователю и дате; None — расклад тянется случайно"""
+    if not config.DAILY_SPREAD_SEEDED or spread_type not in SEEDED_SPREADS:
+        return None
+    if today is None:
+        today = datetime.datetime.now(ZoneInfo(config.DAILY_SPREAD_TZ)).date()
+    return f"{user_id}:{today.isoformat()}"
+
+
+class DailySpreadCache:
+    """Расклад на день по пользователю: ответ API и готовая подпись.
+
+    Запись действительна, пока не сменился seed (то есть дата). file_id картинки
+    хранится в file_id_cache под ключом тех же карт, поэтому повтор обходится
+    без запроса карт, рендера и загрузки.
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._items = OrderedDict()
+
+    def get(self, user_id: int, seed: str) -> Optional[dict]:
+        entry = self._items.get(user_id)
+        hit = entry is not None and entry["seed"] == seed
+        metrics.count_cache("daily", hit)
+        if not hit:
+            return None
+        self._items.move_to_end(user_id)
+        return entry
+
+    def put(self, user_id: int, seed: str, spread: dict, question: Optional[str], caption: str) -> None:
+        self._items[user_id] = {
+            "seed": seed,
+            "spread": spread,
+            "question": question,
+            "caption": caption,
+        }
+        self._items.move_to_end(user_id)
+        while len(self._items) > self.max_size:
+            self._items.popitem(last=False)
+
+
+daily_cache = DailySpreadCache(config.DAILY_CACHE_SIZE)
@@ -0,0 +1,87 @@
+import json
+import logging
+import os
+from collections import OrderedDict
+from pathlib import Path
+from typing import List, Optional
+
+import metrics
+from config import config
+
+logger = logging.getLogger(__name__)
+
+
+def spread_image_key(
+    deck_version: Optional[str], layout: str, cards: List[dict], is_reversed_list: List[bool]
+) -> Optional[str]:
+    """Ключ картинки расклада: одинаковые карты в тех же позициях дают ту же картинку.
+
+    Версия колоды входит в ключ, чтобы после правки карт картинки отрисовались заново.
+    """
+    parts = []
+    for card, is_reversed in zip(cards, is_reversed_list):
+        if not card.get("image"):
+            return None
+        parts.append(Path(card["image"]).name + ("~r" if is_reversed else ""))
+    return f"{deck_version}:{layout}:{','.join(parts)}"
+
+
+class FileIdCache:
+    """file_id картинок, уже загруженных в Telegram: повтор отправляется без рендера и загрузки.
+
+    Хранит не больше max_size записей (вытесняются давно не использованные)
+    и сохраняется на диск, чтобы после перезапуска не загружать картинки заново.
+    """
+
+    def __init__(self, path: str, max_size: int):
+        self.path = path
+        self.max_size = max_size
+        self._items = OrderedDict()
+        self._dirty = False
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def get(self, key: Optional[str]) -> Optional[str]:
+        file_id = self._items.get(key) if key else None
+        metrics.count_cache("file_id", file_id is not None)
+        if file_id is not None:
+            self._items.move_to_end(key)
+        return file_id
+
+    def put(self, key: str, file_id: str) -> None:
+        self._items[key] = file_id
+        self._items.move_to_end(key)
+        while len(self._items) > self.max_size:
+            self._items.popitem(last=False)
+        self._dirty = True
+
+    def discard(self, key: str) -> None:
+        if self._items.pop(key, None) is not None:
+            self._dirty = True
+
+    def load(self) -> int:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                items = json.load(f)
+        except (OSError, ValueError):
+            return 0
+        self._items = OrderedDict(items[-self.max_size:])
+        self._dirty = False
+        return len(self._items)
+
+    def save(self) -> None:
+        """Атомарно записывает кэш на диск, если он менялся"""
+        if not self._dirty:
+            return
+        tmp_path = f"{self.path}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(list(self._items.items()), f)
+            os.replace(tmp_path, self.path)
+            self._dirty = False
+        except OSError as e:
+            logger.warning("Не удалось сохранить file_id на диск: %s", e)
+
+
+file_id_cache = FileIdCache(config.FILE_ID_CACHE_PATH, config.FILE_ID_CACHE_SIZE)
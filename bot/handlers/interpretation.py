@@ -1,90 +1,74 @@
-def interpret_single_card(card, is_reversed):
-    card_name = card.get("name", "Неизвестная карта")
-    interpretation = f"📖 **Толкование карты {card_name}**\n\n"
-    if is_reversed:
-        interpretation += f"🔄 **Перевернутое положение:**\n{card.get('rdesc', 'Описание отсутствует')}\n\n"
-        interpretation += f"💡 **Совет:** {card.get('radvice', 'Примите ситуацию как есть')}"
-    else:
-        interpretation += f"⬆️ **Прямое положение:**\n{card.get('desc', 'Описание отсутствует')}\n\n"
-        interpretation += f"💡 **Совет:** {card.get('advice', 'Доверьтесь своей интуиции')}"
-    return interpretation
-
-def interpret_daily_spread(cards, positions, is_reversed_list):
-    interpretation = "🌅 **Толкование расклада на день**\n\n"
-    parts = []
-    for card, pos, rev in zip(cards, positions, is_reversed_list):
-        card_name = card.get("name", "Неизвестная карта")
-        if rev:
-            desc = card.get("rdesc", "Описание отсутствует")
-            advice = card.get("radvice", "Примите ситуацию как есть")
-            parts.append(
-                f"**{pos}** — {card_name}\n🔄 Перевернутое положение:\n{desc}\n💡 Совет: {advice}\n"
-            )
-        else:
-            desc = card.get("desc", "Описание отсутствует")
-            advice = card.get("advice", "Доверьтесь своей интуиции")
-            parts.append(
-                f"**{pos}** — {card_name}\n⬆️ Прямое положение:\n{desc}\n💡 Совет: {advice}\n"
-            )
-    interpretation += "\n".join(parts)
-    return interpretation
-
-def interpret_love_spread(cards, positions, is_reversed_list):
-    interpretation = "💕 **Толкование расклада на любовь**\n\n"
-    parts = []
-    for card, pos, rev in zip(cards, positions, is_reversed_list):
-        card_name = card.get("name", "Неизвестная карта")
-        if rev:
-            desc = card.get("rdesc", "Описание отсутствует")
-            advice = card.get("radvice", "Примите ситуацию как есть")
-            parts.append(
-                f"**{pos}** — {card_name}\n🔄 Перевернутое положение:\n{desc}\n💡 Совет: {advice}\n"
-            )
-        else:
-            desc = card.get("desc", "Описание отсутствует")
-            advice = card.get("advice", "Доверьтесь своей интуиции")
-            parts.append(
-                f"**{pos}** — {card_name}\n⬆️ Прямое положение:\n{desc}\n💡 Совет: {advice}\n"
-            )
-    interpretation += "\n".join(parts)
-    return interpretation
-
-def interpret_work_spread(cards, positions, is_reversed_list):
-    interpretation = "💼 **Толкование расклада на работу**\n\n"
-    parts = []
-    for card, pos, rev in zip(cards, positions, is_reversed_list):
-        card_name = card.get("name", "Неизвестная карта")
-        if rev:
-            desc = card.get("rdesc", "Описание отсутствует")
-            advice = card.get("radvice", "Примите ситуацию как есть")
-            parts.append(
-                f"**{pos}** — {card_name}\n🔄 Перевернутое положение:\n{desc}\n💡 Совет: {advice}\n"
-            )
-        else:
-            desc = card.get("desc", "Описание отсутствует")
-            advice = card.get("advice", "Доверьтесь своей интуиции")
-            parts.append(
-                f"**{pos}** — {card_name}\n⬆️ Прямое положение:\n{desc}\n💡 Совет: {advice}\n"
-            )
-    interpretation += "\n".join(parts)
-    return interpretation
-
-def interpret_celtic_cross(cards, positions, is_reversed_list):
-    interpretation = "🏰 **Толкование расклада «Кельтский крест»**\n\n"
-    parts = []
-    for card, pos, rev in zip(cards, positions, is_reversed_list):
-        card_name = card.get("name", "Неизвестная карта")
-        if rev:
-            desc = card.get("rdesc", "Описание отсутствует")
-            advice = card.get("radvice", "Примите ситуацию как есть")
-            parts.append(
-                f"**{pos}** — {card_name}\n🔄 Перевернутое положение:\n{desc}\n💡 Совет: {advice}\n"
-            )
-        else:
-            desc = card.get("desc", "Описание отсутствует")
-            advice = card.get("advice", "Доверьтесь своей интуиции")
-            parts.append(
-                f"**{pos}** — {card_name}\n⬆️ Прямое положение:\n{desc}\n💡 Совет: {advice}\n"
-            )
-    interpretation += "\n".join(parts)
-    return interpretation
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+import metrics
+
+UNKNOWN_CARD = "Неизвестная карта"
+NO_DESCRIPTION = "Описание отсутствует"
+
+# Для каждого положения: подпись, поле описания, поле совета и совет по умолчанию
+ORIENTATIONS = {
+    False: ("⬆️ Прямое положение", "desc", "advice", "Доверьтесь своей интуиции"),
+    True: ("🔄 Перевернутое положение", "rdesc", "radvice", "Примите ситуацию как есть"),
+}
+
+# Готовые блоки толкования (карта, положение) для текущей версии колоды
+_deck_version: Optional[str] = None
+_blocks: Dict[Tuple[Hashable, bool], str] = {}
+
+
+def _card_key(card: Dict[str, Any]) -> Hashable:
+    return card.get("id", card.get("name"))
+
+
+def _compile_block(card: Dict[str, Any], is_reversed: bool) -> str:
+    """Собирает текст толкования одной карты в заданном положении"""
+    label, desc_field, advice_field, default_advice = ORIENTATIONS[is_reversed]
+    return (
+        f"{card.get('name') or UNKNOWN_CARD}\n"
+        f"{label}:\n"
+        f"{card.get(desc_field) or NO_DESCRIPTION}\n"
+        f"💡 Совет: {card.get(advice_field) or default_advice}\n"
+    )
+
+
+def precompile_blocks(cards: List[Dict[str, Any]], deck_version: Optional[str]) -> None:
+    """Собирает блоки для всех карт колоды один раз на версию колоды.
+
+    Только для полной колоды (оба положения): ответ расклада сюда не передаётся.
+    """
+    global _deck_version, _blocks
+    if deck_version is not None and deck_version == _deck_version:
+        return
+    _blocks = {
+        (_card_key(card), is_reversed): _compile_block(card, is_reversed)
+        for card in cards
+        for is_reversed in ORIENTATIONS
+    }
+    _deck_version = deck_version
+
+
+def get_block(card: Dict[str, Any], is_reversed: bool) -> str:
+    key = (_card_key(card), is_reversed)
+    block = _blocks.get(key)
+    metrics.count_cache("interpretation", block is not None)
+    if block is None:
+        block = _blocks[key] = _compile_block(card, is_reversed)
+    return block
+
+
+def interpret_spread(
+    title: str,
+    cards: List[Dict[str, Any]],
+    positions: List[str],
+    is_reversed_list: List[bool],
+) -> str:
+    """Толкование расклада: заголовок из шаблона и склейка готовых блоков.
+
+    В заголовке можно использовать {name} — название первой карты.
+    """
+    header = title.format(name=cards[0].get("name") or UNKNOWN_CARD if cards else "")
+    parts = [
+        f"**{position}** — {get_block(card, is_reversed)}"
+        for card, position, is_reversed in zip(cards, positions, is_reversed_list)
+    ]
+    return f"{header}\n\n" + "\n".join(parts)
@@ -1,11 +1,16 @@
+import asyncio
 import logging
-import random
+import time
 
 from aiogram import F, Router
+from aiogram.exceptions import TelegramBadRequest
 from aiogram.fsm.context import FSMContext
 from aiogram.types import CallbackQuery, Message
 from api_client import rate_limiter_instance, tarot_api_instance
+from daily import daily_cache, daily_seed
+from file_ids import file_id_cache, spread_image_key
 from handlers.states import SpreadStates
+from tracing import span
 from images import (
     generate_celtic_cross_image,
     generate_single_card_image,
@@ -20,13 +25,7 @@ from keyboards import (
 )
 from utils import format_card_message
 
-from .interpretation import (
-    interpret_celtic_cross,
-    interpret_daily_spread,
-    interpret_love_spread,
-    interpret_single_card,
-    interpret_work_spread,
-)
+from .interpretation import get_block, interpret_spread
 
 router = Router()
 logger = logging.getLogger(__name__)
@@ -54,6 +53,7 @@ SPREADS_CONFIG = {
         "image_func": generate_single_card_image,
         "title": "🎴 Одна карта",
         "request_text": "Запрос одной карты",
+        "interpretation_title": "📖 **Толкование карты {name}**",
     },
     "daily_spread": {
         "cards_count": 3,
@@ -61,6 +61,7 @@ SPREADS_CONFIG = {
         "image_func": generate_three_card_image,
         "title": "🌅 Расклад на день",
         "request_text": "Расклад на день",
+        "interpretation_title": "🌅 **Толкование расклада на день**",
     },
     "love_spread": {
         "cards_count": 2,
@@ -68,6 +69,7 @@ SPREADS_CONFIG = {
         "image_func": generate_two_card_image,
         "title": "💕 Расклад на любовь",
         "request_text": "Расклад на любовь",
+        "interpretation_title": "💕 **Толкование расклада на любовь**",
     },
     "work_spread": {
         "cards_count": 3,
@@ -75,6 +77,7 @@ SPREADS_CONFIG = {
         "image_func": generate_three_card_image,
         "title": "💼 Расклад на работу",
         "request_text": "Расклад на работу",
+        "interpretation_title": "💼 **Толкование расклада на работу**",
     },
     "celtic_cross_spread": {
         "cards_count": 10,
@@ -93,56 +96,110 @@ SPREADS_CONFIG = {
         "image_func": generate_celtic_cross_image,
         "title": "🏰 Расклад «Кельтский крест»",
         "request_text": "Расклад «Кельтский крест»",
+        "interpretation_title": "🏰 **Толкование расклада «Кельтский крест»**",
+    },
+    # Карты тянутся на сервере только из старших арканов
+    "major_arcana_spread": {
+        "cards_count": 3,
+        "positions": ["1. Прошлое", "2. Настоящее", "3. Будущее"],
+        "image_func": generate_three_card_image,
+        "title": "✨ Расклад на старших арканах",
+        "request_text": "Расклад на старших арканах",
+        "interpretation_title": "✨ **Толкование расклада на старших арканах**",
     },
 }
 
 
+def render_spread_image(spread_type: str, cards: list, is_reversed_list: list):
+    """Рисует картинку расклада; возвращает (файл или None, время рендера в мс).
+
+    Рендер на Pillow синхронный — из хендлеров вызывается через asyncio.to_thread.
+    """
+    image_func = SPREADS_CONFIG[spread_type]["image_func"]
+    start = time.perf_counter()
+    with span("render", spread_type=spread_type):
+        # Правильно передаём аргументы в генераторы изображений
+        if spread_type == "single_card":
+            image_file = image_func(cards[0], is_reversed_list[0])
+        else:
+            image_file = image_func(cards, is_reversed_list)
+    return image_file, (time.perf_counter() - start) * 1000
+
+
 async def send_spread(message: Message, spread_type: str, question: str = None):
+    start = time.perf_counter()
     try:
         config = SPREADS_CONFIG[spread_type]
+        # message может быть сообщением бота (из callback), поэтому берём id чата:
+        # в личном чате он совпадает с id пользователя
+        user_id = message.chat.id
         # progress можно не экранировать, но безопасно экранировать заголовок
         await_message = escape_md(f"{config['title']}...")
-        progress_msg = await message.answer(await_message, parse_mode="MarkdownV2")
-
-        await tarot_api_instance.save_user_request(
-            message.from_user.id,
-            f"{config['request_text']}{f': {question}' if question else ''}",
-        )
-
-        cards = await tarot_api_instance.get_cards()
-        if not cards or len(cards) < config["cards_count"]:
+        with span("telegram.send_progress"):
+            progress_msg = await message.answer(await_message, parse_mode="MarkdownV2")
+
+        # Расклад на день в детерминированном режиме уже мог быть вытянут сегодня
+        seed = daily_seed(spread_type, user_id)
+        daily = daily_cache.get(user_id, seed) if seed else None
+        if daily:
+            spread = daily["spread"]
+            # Карты не тянем заново, но запрос, как и при вытягивании, попадает в историю
+            request_text = config["request_text"] + (f": {question}" if question else "")
+            await tarot_api_instance.save_user_request(user_id, request_text, spread_type)
+        else:
+            # Карты вытягиваются на сервере, там же сохраняется запрос в историю
+            spread = await tarot_api_instance.draw_spread(
+                spread_type, user_id, question, seed=seed
+            )
+        if not spread or len(spread.get("cards") or []) < config["cards_count"]:
             await progress_msg.delete()
             await message.answer(
                 "😔 Недостаточно карт.", reply_markup=get_main_keyboard()
             )
             return
 
-        selected_cards = random.sample(cards, config["cards_count"])
-        is_reversed_list = [
-            random.choice([True, False]) for _ in range(config["cards_count"])
-        ]
+        selected_cards = spread["cards"]
+        is_reversed_list = [card["is_reversed"] for card in selected_cards]
+        # В ответе расклада только поля выпавшего положения, поэтому готовим блоки
+        # лишь для выпавших пар; вся колода собирается при прогреве и синхронизации
+        for card, is_reversed in zip(selected_cards, is_reversed_list):
+            get_block(card, is_reversed)
 
-        title = config["title"]
-        if question:
-            title += f"\n💭 Вопрос: {question}"
-
-        # format_card_message должен возвращать «сырый» текст (без экранирования)
-        text = format_card_message(
-            selected_cards, config["positions"], is_reversed_list, title
-        )
+        if daily and daily["question"] == question:
+            caption = daily["caption"]
+        else:
+            title = config["title"]
+            if question:
+                title += f"\n💭 Вопрос: {question}"
 
-        # Экранируем итоговый текст один раз перед отправкой (для MarkdownV2)
-        caption = escape_md(text)
+            # format_card_message должен возвращать «сырый» текст (без экранирования)
+            text = format_card_message(
+                selected_cards, config["positions"], is_reversed_list, title
+            )
 
-        # Правильно передаём аргументы в генераторы изображений
-        if spread_type == "single_card":
-            image_file = config["image_func"](selected_cards[0], is_reversed_list[0])
-        else:
-            image_file = config["image_func"](selected_cards, is_reversed_list)
+            # Экранируем итоговый текст один раз перед отправкой (для MarkdownV2)
+            caption = escape_md(text)
+            if seed:
+                daily_cache.put(user_id, seed, spread, question, caption)
+
+        # Те же карты в тех же позициях уже отправлялись — берём file_id без рендера
+        image_key = spread_image_key(
+            spread.get("deck_version"),
+            config["image_func"].__name__,
+            selected_cards,
+            is_reversed_list,
+        )
+        cached_file_id = file_id_cache.get(image_key)
+        image_file = None
+        render_ms = 0.0
+        if cached_file_id is None:
+            image_file, render_ms = await asyncio.to_thread(
+                render_spread_image, spread_type, selected_cards, is_reversed_list
+            )
 
         await progress_msg.delete()
 
-        user_spreads[message.from_user.id] = {
+        user_spreads[user_id] = {
             "type": spread_type,
             "cards": selected_cards,
             "positions": config["positions"],
@@ -150,22 +207,48 @@ async def send_spread(message: Message, spread_type: str, question: str = None):
             "question": question,
         }
 
-        logger.debug("Caption to send (escaped): %s", caption)
-
-        if image_file:
-            await message.answer_photo(
-                photo=image_file,
-                caption=caption,
-                parse_mode="MarkdownV2",
-                reply_markup=get_interpret_keyboard(),
-            )
-        else:
-            await message.answer(
-                caption, parse_mode="MarkdownV2", reply_markup=get_interpret_keyboard()
-            )
+        send_options = {
+            "caption": caption,
+            "parse_mode": "MarkdownV2",
+            "reply_markup": get_interpret_keyboard(),
+        }
+        with span("telegram.send_spread", cached=cached_file_id is not None) as attrs:
+            sent = None
+            if cached_file_id is not None:
+                try:
+                    sent = await message.answer_photo(photo=cached_file_id, **send_options)
+                except TelegramBadRequest as e:
+                    # file_id больше не принимается — рисуем и загружаем заново
+                    logger.warning("file_id расклада не принят: %s", e)
+                    file_id_cache.discard(image_key)
+                    image_file, render_ms = await asyncio.to_thread(
+                        render_spread_image, spread_type, selected_cards, is_reversed_list
+                    )
+            if sent is None and image_file:
+                sent = await message.answer_photo(photo=image_file, **send_options)
+                if image_key and sent.photo:
+                    file_id_cache.put(image_key, sent.photo[-1].file_id)
+            elif sent is None:
+                await message.answer(
+                    caption, parse_mode="MarkdownV2", reply_markup=get_interpret_keyboard()
+                )
+            attrs["photo"] = sent is not None
+
+        logger.info(
+            "Расклад %s отправлен",
+            spread_type,
+            extra={
+                "user_id": user_id,
+                "spread_type": spread_type,
+                "render_ms": round(render_ms, 1),
+                "file_id_cached": cached_file_id is not None,
+                "daily_cached": daily is not None,
+                "duration_ms": round((time.perf_counter() - start) * 1000, 1),
+            },
+        )
 
     except Exception as e:
-        logger.error(f"Ошибка в send_spread: {e}", exc_info=True)
+        logger.error("Ошибка в send_spread: %s", e, exc_info=True)
         await message.answer(
             "❌ Произошла ошибка при создании расклада",
             reply_markup=get_back_to_menu_keyboard(),
@@ -181,6 +264,7 @@ async def ask_for_question(
         "love_spread": "расклад на любовь",
         "work_spread": "расклад на работу",
         "celtic_cross_spread": "«Кельтский крест»",
+        "major_arcana_spread": "расклад на старших арканах",
     }
 
     await state.update_data(spread_type=spread_type)
@@ -277,21 +361,16 @@ async def process_back_to_menu(callback: CallbackQuery):
         except Exception as e:
             logger.debug("Не удалось убрать reply_markup при возврате в меню: %s", e, exc_info=True)
     except Exception as e:
-        logger.error(f"Ошибка при возврате в меню: {e}")
+        logger.error("Ошибка при возврате в меню: %s", e)
         await callback.answer("❌ Произошла ошибка")
     finally:
         await callback.answer()
 
 
 async def generate_interpretation(spread_type, cards, positions, is_reversed_list):
-    if spread_type == "single_card":
-        return interpret_single_card(cards[0], is_reversed_list[0])
-    elif spread_type == "daily_spread":
-        return interpret_daily_spread(cards, positions, is_reversed_list)
-    elif spread_type == "love_spread":
-        return interpret_love_spread(cards, positions, is_reversed_list)
-    elif spread_type == "work_spread":
-        return interpret_work_spread(cards, positions, is_reversed_list)
-    elif spread_type == "celtic_cross_spread":
-        return interpret_celtic_cross(cards, positions, is_reversed_list)
-    return "🔮 Толкование этого расклада пока недоступно."
+    config = SPREADS_CONFIG.get(spread_type)
+    if not config:
+        return "🔮 Толкование этого расклада пока недоступно."
+    return interpret_spread(
+        config["interpretation_title"], cards, positions, is_reversed_list
+    )
@@ -1,3 +1,5 @@
+from datetime import datetime
+
 from aiogram import Router
 from aiogram.types import Message
 from aiogram.filters import Command
@@ -36,8 +38,29 @@ async def help_command(message: Message):
         "🌅 *Расклад на день* - Утро, День, Вечер\n"
         "💕 *Расклад на любовь* - Отношения и чувства\n"
         "💼 *Расклад на работу* - Карьера и бизнес\n"
-        "🏰 *«Кельтский крест»* - Полный анализ ситуации\n\n"
+        "🏰 *«Кельтский крест»* - Полный анализ ситуации\n"
+        "✨ *Старшие арканы* - Прошлое, Настоящее, Будущее\n\n"
+        "📜 /history - ваши последние запросы\n\n"
         "Просто выберите нужный вариант из меню!"
     )
     
     await message.answer(escape_md(help_text), reply_markup=get_main_keyboard(), parse_mode="MarkdownV2")
+
+
+@router.message(Command("history"))
+async def history_command(message: Message):
+    history = await tarot_api_instance.get_user_history(message.from_user.id)
+    if history is None:
+        await message.answer("❌ Не удалось загрузить историю", reply_markup=get_main_keyboard())
+        return
+    if not history["results"]:
+        await message.answer("📜 История запросов пуста", reply_markup=get_main_keyboard())
+        return
+
+    lines = ["📜 Последние запросы:", ""]
+    for item in history["results"]:
+        # DRF отдаёт UTC с суффиксом Z, который fromisoformat до Python 3.11 не понимает
+        created_at = datetime.fromisoformat(item["created_at"].replace("Z", "+00:00"))
+        lines.append(f"{created_at.strftime('%d.%m.%Y %H:%M')} — {item['request_text']}")
+
+    await message.answer(escape_md("\n".join(lines)), reply_markup=get_main_keyboard(), parse_mode="MarkdownV2")
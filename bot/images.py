@@ -1,15 +1,26 @@
 import io
+import json
 import logging
 from typing import Dict, Any, List, Optional
 from pathlib import Path
 from PIL import Image, ImageDraw, ImageFont
 from aiogram.types import BufferedInputFile
 
+from config import config
+from metrics import count_cache, render_stage
+
 logger = logging.getLogger(__name__)
 
 # Кэширование фона и шрифтов
 _background_cache = None
 _font_cache = None
+_manifest_cache = {}
+_manifest_mtime = None
+# Декодированные изображения карт по (путь, mtime): повторный расклад не декодирует WebP заново
+_sprite_cache = {}
+_sprite_cache_bytes = 0
+# Копии, которые используют раскладки (full в боте не нужна)
+LAYOUT_RENDITIONS = ("single", "double", "triple", "celtic")
 
 
 def _load_background() -> Image.Image:
@@ -35,7 +46,79 @@ def _load_font(size: int = 40) -> ImageFont.FreeTypeFont:
     return _font_cache
 
 
-def _load_card_image(card: Dict[Any, Any], is_reversed: bool, target_size: tuple = None) -> Optional[Image.Image]:
+def _load_manifest() -> Dict[str, Any]:
+    """Загружает манифест уменьшенных копий (build_card_renditions), перечитывая его при изменении"""
+    global _manifest_cache, _manifest_mtime
+    manifest_path = Path(config.MEDIA_ROOT) / "renditions/manifest.json"
+    try:
+        mtime = manifest_path.stat().st_mtime_ns
+        if mtime != _manifest_mtime:
+            with open(manifest_path, encoding="utf-8") as f:
+                _manifest_cache = json.load(f).get("cards", {})
+            _manifest_mtime = mtime
+    except (OSError, ValueError) as e:
+        logger.debug("Манифест копий изображений недоступен: %s", e)
+    return _manifest_cache
+
+
+def _card_image_path(card_filename: str, rendition: Optional[str]) -> Path:
+    """Путь к готовой копии нужного размера, а если её нет — к оригиналу"""
+    media_root = Path(config.MEDIA_ROOT)
+    if rendition:
+        entry = _load_manifest().get(f"cards/{card_filename}")
+        if entry and rendition in entry["renditions"]:
+            return media_root / entry["renditions"][rendition]["path"]
+    return media_root / "cards" / card_filename
+
+
+def _load_sprite(path: Path) -> Image.Image:
+    """Декодированное RGBA-изображение карты; пока хватает SPRITE_CACHE_MB, хранится в памяти"""
+    global _sprite_cache_bytes
+    key = (str(path), path.stat().st_mtime_ns)
+    sprite = _sprite_cache.get(key)
+    count_cache("sprite", sprite is not None)
+    if sprite is not None:
+        # Генераторы меняют изображение на месте (thumbnail), поэтому отдаём копию
+        return sprite.copy()
+
+    with Image.open(path) as source:
+        sprite = source.convert("RGBA")
+    size = sprite.width * sprite.height * 4
+    if _sprite_cache_bytes + size > config.SPRITE_CACHE_MB * 1024 * 1024:
+        return sprite
+    _sprite_cache[key] = sprite
+    _sprite_cache_bytes += size
+    return sprite.copy()
+
+
+def warm_up() -> int:
+    """Готовит всё для первого рендера: кодеки, фон, шрифт, манифест и спрайты карт.
+
+    Спрайты загружаются от меньших копий к большим, пока позволяет SPRITE_CACHE_MB.
+    Возвращает число спрайтов в памяти.
+    """
+    Image.init()
+    _load_background()
+    _load_font(40)
+    media_root = Path(config.MEDIA_ROOT)
+    renditions = sorted(
+        (info["width"] * info["height"], info["path"])
+        for entry in _load_manifest().values()
+        for name, info in entry["renditions"].items()
+        if name in LAYOUT_RENDITIONS
+    )
+    budget = config.SPRITE_CACHE_MB * 1024 * 1024
+    for pixels, path in renditions:
+        if _sprite_cache_bytes + pixels * 4 > budget:
+            break
+        try:
+            _load_sprite(media_root / path)
+        except OSError as e:
+            logger.warning("Не удалось загрузить спрайт %s: %s", path, e)
+    return len(_sprite_cache)
+
+
+def _load_card_image(card: Dict[Any, Any], is_reversed: bool, target_size: tuple = None, rendition: str = None) -> Optional[Image.Image]:
     """Загружает и обрабатывает изображение карты"""
     try:
         card_url = card.get("image")
@@ -43,19 +126,22 @@ def _load_card_image(card: Dict[Any, Any], is_reversed: bool, target_size: tuple
             raise ValueError(f"У карты {card.get('name', '')} нет пути к изображению")
         
         card_filename = Path(card_url).name
-        card_image_path = Path("/var/www/mystratarotbot/web/media/cards") / card_filename
-        card_image = Image.open(card_image_path).convert("RGBA")
+        card_image_path = _card_image_path(card_filename, rendition)
+        with render_stage(rendition, "decode"):
+            card_image = _load_sprite(card_image_path)
 
-        if is_reversed:
-            card_image = card_image.transpose(Image.ROTATE_180)
+        with render_stage(rendition, "resize"):
+            if target_size and card_image.size != target_size:
+                card_image = card_image.resize(target_size, Image.Resampling.LANCZOS)
 
-        if target_size:
-            card_image = card_image.resize(target_size, Image.Resampling.LANCZOS)
+            # Поворачиваем уже уменьшенное изображение
+            if is_reversed:
+                card_image = card_image.transpose(Image.ROTATE_180)
         
         return card_image
         
     except Exception as e:
-        logger.error(f"Ошибка загрузки карты {card.get('name', '')}: {e}")
+        logger.error("Ошибка загрузки карты %s: %s", card.get('name', ''), e)
         return None
 
 
@@ -70,12 +156,12 @@ def _draw_number(draw: ImageDraw.Draw, x: int, y: int, number: int, font: ImageF
 def _validate_input(cards: list, is_reversed_list: list, expected_count: int) -> bool:
     """Проверяет корректность входных данных"""
     if len(cards) != expected_count or len(is_reversed_list) != expected_count:
-        logger.error(f"Ожидалось {expected_count} карт, получено {len(cards)}")
+        logger.error("Ожидалось %s карт, получено %s", expected_count, len(cards))
         return False
     
     for i, card in enumerate(cards):
         if not card.get('image'):
-            logger.error(f"Карта {i} не имеет изображения: {card.get('name')}")
+            logger.error("Карта %s не имеет изображения: %s", i, card.get('name'))
             return False
     
     return True
@@ -88,32 +174,40 @@ def _cleanup_images(*images):
             img.close()
 
 
+def _encode_png(background: Image.Image, layout: str, filename: str) -> BufferedInputFile:
+    """Кодирует готовую картинку в PNG для отправки в Telegram"""
+    with render_stage(layout, "encode"):
+        bio = io.BytesIO()
+        background.save(bio, format="PNG", optimize=True)
+    return BufferedInputFile(bio.getvalue(), filename=filename)
+
+
 def generate_single_card_image(card: Dict[Any, Any], is_reversed: bool = False) -> Optional[BufferedInputFile]:
     """Создаёт изображение с фоном и картой."""
     try:
-        background = _load_background()
-        card_image = _load_card_image(card, is_reversed)
+        with render_stage("single", "decode"):
+            background = _load_background()
+        card_image = _load_card_image(card, is_reversed, rendition="single")
         
         if not card_image:
             return None
 
         # Масштабируем карту
         max_width, max_height = 662, 1124
-        card_image.thumbnail((max_width, max_height), Image.Resampling.LANCZOS)
+        with render_stage("single", "resize"):
+            card_image.thumbnail((max_width, max_height), Image.Resampling.LANCZOS)
 
         # Центрируем
         x = (background.width - card_image.width) // 2
         y = (background.height - card_image.height) // 2
 
-        background.paste(card_image, (x, y), card_image)
+        with render_stage("single", "composite"):
+            background.paste(card_image, (x, y), card_image)
 
-        bio = io.BytesIO()
-        background.save(bio, format="PNG", optimize=True)
-        bio.seek(0)
-        return BufferedInputFile(bio.read(), filename="card.png")
+        return _encode_png(background, "single", "card.png")
         
     except Exception as e:
-        logger.error(f"Ошибка генерации картинки одной карты: {e}", exc_info=True)
+        logger.error("Ошибка генерации картинки одной карты: %s", e, exc_info=True)
         return None
     finally:
         if 'card_image' in locals():
@@ -127,46 +221,46 @@ def generate_two_card_image(cards: list[Dict[Any, Any]], is_reversed_list: list[
         if not _validate_input(cards, is_reversed_list, 2):
             return None
 
-        background = _load_background()
+        with render_stage("double", "decode"):
+            background = _load_background()
         
         for card, is_reversed in zip(cards, is_reversed_list):
-            card_image = _load_card_image(card, is_reversed)
+            card_image = _load_card_image(card, is_reversed, rendition="double")
             if not card_image:
                 return None
             card_images.append(card_image)
 
         # Масштабируем
         max_width, max_height = 492, 1124
-        for card_image in card_images:
-            card_image.thumbnail((max_width, max_height), Image.Resampling.LANCZOS)
+        with render_stage("double", "resize"):
+            for card_image in card_images:
+                card_image.thumbnail((max_width, max_height), Image.Resampling.LANCZOS)
 
         # Позиционируем
         spacing = (background.width - sum(ci.width for ci in card_images)) // 3
         x_positions = [spacing, spacing * 2 + card_images[0].width]
         y_position = (background.height - max(ci.height for ci in card_images)) // 2
 
-        # Вставляем карты
-        for x, ci in zip(x_positions, card_images):
-            background.paste(ci, (x, y_position), ci)
+        with render_stage("double", "composite"):
+            # Вставляем карты
+            for x, ci in zip(x_positions, card_images):
+                background.paste(ci, (x, y_position), ci)
 
-        # Добавляем номера
-        draw = ImageDraw.Draw(background)
-        font = _load_font(40)
+            # Добавляем номера
+            draw = ImageDraw.Draw(background)
+            font = _load_font(40)
         
-        for idx, (x, ci) in enumerate(zip(x_positions, card_images), start=1):
-            bbox = draw.textbbox((0, 0), str(idx), font=font)
-            text_width = bbox[2] - bbox[0]
-            text_x = x + (ci.width - text_width) // 2
-            text_y = y_position + ci.height + 10
-            _draw_number(draw, text_x, text_y, idx, font)
+            for idx, (x, ci) in enumerate(zip(x_positions, card_images), start=1):
+                bbox = draw.textbbox((0, 0), str(idx), font=font)
+                text_width = bbox[2] - bbox[0]
+                text_x = x + (ci.width - text_width) // 2
+                text_y = y_position + ci.height + 10
+                _draw_number(draw, text_x, text_y, idx, font)
 
-        bio = io.BytesIO()
-        background.save(bio, format="PNG", optimize=True)
-        bio.seek(0)
-        return BufferedInputFile(bio.read(), filename="two_cards.png")
+        return _encode_png(background, "double", "two_cards.png")
 
     except Exception as e:
-        logger.error(f"Ошибка генерации картинки двух карт: {e}", exc_info=True)
+        logger.error("Ошибка генерации картинки двух карт: %s", e, exc_info=True)
         return None
     finally:
         _cleanup_images(*card_images)
@@ -179,18 +273,20 @@ def generate_three_card_image(cards: list[Dict[Any, Any]], is_reversed_list: lis
         if not _validate_input(cards, is_reversed_list, 3):
             return None
 
-        background = _load_background()
+        with render_stage("triple", "decode"):
+            background = _load_background()
         
         for card, is_reversed in zip(cards, is_reversed_list):
-            card_image = _load_card_image(card, is_reversed)
+            card_image = _load_card_image(card, is_reversed, rendition="triple")
             if not card_image:
                 return None
             card_images.append(card_image)
 
         # Масштабируем
         max_width, max_height = 324, 564
-        for card_image in card_images:
-            card_image.thumbnail((max_width, max_height), Image.Resampling.LANCZOS)
+        with render_stage("triple", "resize"):
+            for card_image in card_images:
+                card_image.thumbnail((max_width, max_height), Image.Resampling.LANCZOS)
 
         # Позиционируем
         spacing = (background.width - sum(ci.width for ci in card_images)) // 4
@@ -201,28 +297,26 @@ def generate_three_card_image(cards: list[Dict[Any, Any]], is_reversed_list: lis
         ]
         y_position = (background.height - max(ci.height for ci in card_images)) // 2
 
-        # Вставляем карты
-        for x, ci in zip(x_positions, card_images):
-            background.paste(ci, (x, y_position), ci)
+        with render_stage("triple", "composite"):
+            # Вставляем карты
+            for x, ci in zip(x_positions, card_images):
+                background.paste(ci, (x, y_position), ci)
 
-        # Добавляем номера
-        draw = ImageDraw.Draw(background)
-        font = _load_font(40)
+            # Добавляем номера
+            draw = ImageDraw.Draw(background)
+            font = _load_font(40)
         
-        for idx, (x, ci) in enumerate(zip(x_positions, card_images), start=1):
-            bbox = draw.textbbox((0, 0), str(idx), font=font)
-            text_width = bbox[2] - bbox[0]
-            text_x = x + (ci.width - text_width) // 2
-            text_y = y_position + ci.height + 10
-            _draw_number(draw, text_x, text_y, idx, font)
+            for idx, (x, ci) in enumerate(zip(x_positions, card_images), start=1):
+                bbox = draw.textbbox((0, 0), str(idx), font=font)
+                text_width = bbox[2] - bbox[0]
+                text_x = x + (ci.width - text_width) // 2
+                text_y = y_position + ci.height + 10
+                _draw_number(draw, text_x, text_y, idx, font)
 
-        bio = io.BytesIO()
-        background.save(bio, format="PNG", optimize=True)
-        bio.seek(0)
-        return BufferedInputFile(bio.read(), filename="three_cards.png")
+        return _encode_png(background, "triple", "three_cards.png")
 
     except Exception as e:
-        logger.error(f"Ошибка генерации картинки трёх карт: {e}", exc_info=True)
+        logger.error("Ошибка генерации картинки трёх карт: %s", e, exc_info=True)
         return None
     finally:
         _cleanup_images(*card_images)
@@ -235,19 +329,21 @@ def generate_celtic_cross_image(cards: list[Dict[Any, Any]], is_reversed_list: l
         if not _validate_input(cards, is_reversed_list, 10):
             return None
 
-        background = _load_background()
+        with render_stage("celtic", "decode"):
+            background = _load_background()
         card_size = (174, 300)
 
         # Загружаем все карты
         for i, (card, is_reversed) in enumerate(zip(cards, is_reversed_list)):
-            card_image = _load_card_image(card, is_reversed, card_size)
+            card_image = _load_card_image(card, is_reversed, card_size, rendition="celtic")
             if not card_image:
                 return None
             card_images.append(card_image)
 
         # Вращаем вторую карту на 270 градусов
-        if len(card_images) > 1:
-            card_images[1] = card_images[1].transpose(Image.ROTATE_270)
+        with render_stage("celtic", "resize"):
+            if len(card_images) > 1:
+                card_images[1] = card_images[1].transpose(Image.ROTATE_270)
 
         # Позиции карт
         positions = [
@@ -255,30 +351,28 @@ def generate_celtic_cross_image(cards: list[Dict[Any, Any]], is_reversed_list: l
             (708, 490), (1066, 964), (1066, 648), (1066, 332), (1066, 16)
         ]
 
-        # Вставляем карты
-        for pos, card_image in zip(positions, card_images):
-            background.paste(card_image, pos, card_image)
+        with render_stage("celtic", "composite"):
+            # Вставляем карты
+            for pos, card_image in zip(positions, card_images):
+                background.paste(card_image, pos, card_image)
 
-        # Добавляем номера
-        draw = ImageDraw.Draw(background)
-        font = _load_font(40)
+            # Добавляем номера
+            draw = ImageDraw.Draw(background)
+            font = _load_font(40)
         
-        text_positions = [
-            (449, 440), (277, 610), (449, 840), (115, 440), (449, 40),
-            (783, 440), (1032, 1084), (1032, 768), (1032, 452), (1008, 136)
-        ]
+            text_positions = [
+                (449, 440), (277, 610), (449, 840), (115, 440), (449, 40),
+                (783, 440), (1032, 1084), (1032, 768), (1032, 452), (1008, 136)
+            ]
 
-        for idx, (x, y) in enumerate(text_positions, start=1):
-            _draw_number(draw, x, y, idx, font)
+            for idx, (x, y) in enumerate(text_positions, start=1):
+                _draw_number(draw, x, y, idx, font)
 
         # Сохраняем в буфер
-        bio = io.BytesIO()
-        background.save(bio, format="PNG", optimize=True)
-        bio.seek(0)
-        return BufferedInputFile(bio.read(), filename="celtic_cross.png")
+        return _encode_png(background, "celtic", "celtic_cross.png")
 
     except Exception as e:
-        logger.error(f"Ошибка генерации картинки Кельтского креста: {e}", exc_info=True)
+        logger.error("Ошибка генерации картинки Кельтского креста: %s", e, exc_info=True)
         return None
     finally:
         _cleanup_images(*card_images)
@@ -18,6 +18,11 @@ def get_main_keyboard() -> InlineKeyboardMarkup:
                     callback_data="celtic_cross_spread",
                 )
             ],
+            [
+                InlineKeyboardButton(
+                    text="✨ Старшие арканы (3)", callback_data="major_arcana_spread"
+                )
+            ],
             [InlineKeyboardButton(text="❓ Помощь", callback_data="help")],
         ]
     )
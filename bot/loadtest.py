@@ -0,0 +1,414 @@
+"""Нагрузочный тест бота без Telegram и Django.
+
+Запускает настоящий Dispatcher со всеми роутерами и middleware. Bot API
+заменён сессией-заглушкой, Django API — httpx.MockTransport с колодой из
+MEDIA_ROOT/cards/cards.json. Синтетические пользователи жмут кнопки раскладов,
+пишут вопросы и просят толкование. В конце выводятся пропускная способность,
+p50/p95/p99 по хендлерам, задержка event loop и пиковая память.
+
+    python loadtest.py --users 2000 --concurrency 200 --rounds 3
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict
+
+os.environ.setdefault("BOT_TOKEN", "123456:loadtest")
+
+import httpx
+from aiogram import BaseMiddleware, Bot
+from aiogram.client.session.base import BaseSession
+from aiogram.types import BufferedInputFile, TelegramObject, Update
+
+from api_client import DECK_FIELDS, tarot_api_instance
+from bot import create_dispatcher
+from config import config
+from file_ids import file_id_cache
+from handlers.spreads import SPREADS_CONFIG
+from logs import setup_logging
+from warmup import warm_up
+
+API_BASE_URL = "http://loadtest-api"
+BOT_USER = {"id": 123456, "is_bot": True, "first_name": "Tarot", "username": "loadtest_bot"}
+QUESTIONS = (
+    "Что меня ждёт на новой работе?",
+    "Стоит ли начинать отношения?",
+    "Как пройдёт эта неделя?",
+    "На что обратить внимание в ближайший месяц?",
+)
+
+
+def percentile(samples: list, p: float) -> float:
+    """Перцентиль по отсортированной выборке (метод ближайшего ранга)"""
+    if not samples:
+        return 0.0
+    return samples[max(math.ceil(p / 100 * len(samples)) - 1, 0)]
+
+
+class FakeTelegramSession(BaseSession):
+    """Сессия Bot API без сети: отвечает как Telegram с задержкой latency секунд.
+
+    Ответ проходит через check_response, поэтому разбор ответа стоит столько же,
+    сколько с настоящей сессией.
+    """
+
+    def __init__(self, latency: float):
+        super().__init__()
+        self.latency = latency
+        self.calls = defaultdict(int)
+        self.uploaded_bytes = 0
+        self._message_id = 0
+        self._file_id = 0
+
+    async def close(self) -> None:
+        pass
+
+    async def stream_content(self, *args, **kwargs):
+        # Бот файлы не скачивает; пустой поток вместо сети
+        self.calls["stream_content"] += 1
+        return
+        yield b""
+
+    async def make_request(self, bot: Bot, method, timeout=None) -> Any:
+        name = type(method).__name__
+        self.calls[name] += 1
+        if self.latency:
+            await asyncio.sleep(self.latency * random.uniform(0.5, 1.5))
+
+        photo = getattr(method, "photo", None)
+        if isinstance(photo, BufferedInputFile):
+            self.uploaded_bytes += len(photo.data)
+            self._file_id += 1
+            photo = f"loadtest-photo-{self._file_id}"
+
+        if name == "GetMe":
+            result = BOT_USER
+        elif name.startswith("Send"):
+            self._message_id += 1
+            result = {
+                "message_id": self._message_id,
+                "date": int(time.time()),
+                "chat": {"id": method.chat_id, "type": "private"},
+                "from": BOT_USER,
+            }
+            if photo:
+                # Как Telegram: у отправленного фото есть file_id для повторной отправки
+                result["photo"] = [
+                    {"file_id": photo, "file_unique_id": photo, "width": 1280, "height": 720}
+                ]
+        else:
+            result = True
+        content = json.dumps({"ok": True, "result": result})
+        return self.check_response(bot, method, 200, content).result
+
+
+class FakeTarotAPI:
+    """Ответы Django API для бота: колода, расклады, пользователи и история"""
+
+    def __init__(self, cards: list, latency: float):
+        self.cards = cards
+        self.latency = latency
+        self.calls = defaultdict(int)
+
+    async def handle(self, request: httpx.Request) -> httpx.Response:
+        path = request.url.path
+        params = request.url.params
+        self.calls[path if "/api/users/" not in path else "/api/users/..."] += 1
+        if self.latency:
+            await asyncio.sleep(self.latency * random.uniform(0.5, 1.5))
+
+        if path == "/api/cards/changes/":
+            full = "since" not in params
+            return httpx.Response(200, json={
+                "cursor": "loadtest",
+                "deck_version": "loadtest",
+                "full": full,
+                "changed": self.cards if full else [],
+                "deleted": [],
+            })
+        if path == "/api/spreads/draw/":
+            spread = SPREADS_CONFIG.get(params.get("type"))
+            if spread is None:
+                return httpx.Response(400, json={"error": "Неизвестный тип расклада"})
+            cards = random.sample(self.cards, spread["cards_count"])
+            return httpx.Response(200, json={
+                "type": params["type"],
+                "deck_version": "loadtest",
+                "recorded": "telegram_id" in params,
+                "cards": [{**card, "is_reversed": random.random() < 0.5} for card in cards],
+            })
+        if path in ("/api/users/register/", "/api/users/requests/"):
+            return httpx.Response(201, json={})
+        if path.startswith("/api/users/") and path.endswith("/requests/"):
+            return httpx.Response(200, json={
+                "results": [
+                    {"request_text": "Расклад на день", "created_at": "2025-01-01T12:00:00+00:00"}
+                ],
+                "next_cursor": None,
+            })
+        return httpx.Response(404, json={"error": "Не найдено"})
+
+
+def load_deck(media_root: str) -> list:
+    """Колода из исходного cards.json с изображениями из MEDIA_ROOT"""
+    with open(Path(media_root) / "cards" / "cards.json", "r", encoding="utf-8") as f:
+        source = json.load(f)
+    fields = DECK_FIELDS.split(",")
+    deck = []
+    for card_id, card in enumerate(source, start=1):
+        image = card.get("image")
+        exists = image and (Path(media_root) / image).exists()
+        deck.append({
+            **{field: card.get(field, "") for field in fields},
+            "id": card_id,
+            "image": f"{API_BASE_URL}/media/{image}" if exists else None,
+        })
+    return deck
+
+
+class LatencyRecorder(BaseMiddleware):
+    """Точное время каждого вызова хендлера (гистограммы метрик для перцентилей грубоваты)"""
+
+    def __init__(self):
+        self.samples = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        name = getattr(getattr(data.get("handler"), "callback", None), "__name__", "unknown")
+        start = time.perf_counter()
+        try:
+            return await handler(event, data)
+        except Exception:
+            self.errors[name] += 1
+            raise
+        finally:
+            self.samples[name].append(time.perf_counter() - start)
+
+
+class Simulation:
+    def __init__(self, dp, bot: Bot, args):
+        self.dp = dp
+        self.bot = bot
+        self.args = args
+        self.update_id = 0
+        self.update_latency = []
+        self.failed_updates = 0
+
+    def _message(self, user_id: int, **fields) -> dict:
+        self.update_id += 1
+        return {
+            "message_id": self.update_id,
+            "date": int(time.time()),
+            "chat": {"id": user_id, "type": "private"},
+            **fields,
+        }
+
+    def _user(self, user_id: int) -> dict:
+        return {"id": user_id, "is_bot": False, "first_name": f"User{user_id}"}
+
+    async def _feed(self, payload: dict) -> None:
+        update = Update.model_validate(
+            {"update_id": self.update_id, **payload}, context={"bot": self.bot}
+        )
+        start = time.perf_counter()
+        try:
+            await self.dp.feed_update(self.bot, update)
+        except Exception:
+            self.failed_updates += 1
+        finally:
+            self.update_latency.append(time.perf_counter() - start)
+        if self.args.think:
+            await asyncio.sleep(random.uniform(0, self.args.think))
+
+    async def text(self, user_id: int, text: str) -> None:
+        message = self._message(user_id, text=text, **{"from": self._user(user_id)})
+        await self._feed({"message": message})
+
+    async def click(self, user_id: int, data: str) -> None:
+        message = self._message(user_id, text="🔮", **{"from": BOT_USER})
+        await self._feed({"callback_query": {
+            "id": str(self.update_id),
+            "from": self._user(user_id),
+            "chat_instance": "loadtest",
+            "data": data,
+            "message": message,
+        }})
+
+    async def run_user(self, user_id: int) -> None:
+        await self.text(user_id, "/start")
+        for _ in range(self.args.rounds):
+            spread_type = random.choice(list(SPREADS_CONFIG))
+            await self.click(user_id, spread_type)
+            if spread_type == "single_card":
+                if random.random() < 0.5:
+                    await self.text(user_id, random.choice(QUESTIONS))
+                else:
+                    await self.click(user_id, "skip_question")
+            await self.click(user_id, "interpret_spread")
+            if random.random() < 0.2:
+                await self.click(user_id, "back_to_menu")
+            if random.random() < 0.1:
+                await self.text(user_id, random.choice(QUESTIONS))
+        if random.random() < 0.3:
+            await self.text(user_id, "/history")
+
+
+async def monitor_loop_lag(samples: list, interval: float = 0.01) -> None:
+    """Насколько позже запланированного просыпается event loop"""
+    loop = asyncio.get_running_loop()
+    while True:
+        start = loop.time()
+        await asyncio.sleep(interval)
+        samples.append(loop.time() - start - interval)
+
+
+def format_ms(samples: list) -> str:
+    samples = sorted(samples)
+    return "  ".join(
+        f"{percentile(samples, p) * 1000:8.1f}" for p in (50, 95, 99)
+    ) + f"  {samples[-1] * 1000 if samples else 0:8.1f}"
+
+
+async def run(args) -> dict:
+    tg_session = FakeTelegramSession(args.telegram_latency / 1000)
+    bot = Bot(token=config.TOKEN, session=tg_session)
+    dp = create_dispatcher()
+    recorder = LatencyRecorder()
+    dp.message.middleware(recorder)
+    dp.callback_query.middleware(recorder)
+
+    fake_api = FakeTarotAPI(load_deck(args.media_root), args.api_latency / 1000)
+    tarot_api_instance.base_url = API_BASE_URL
+    tarot_api_instance.session = httpx.AsyncClient(
+        transport=httpx.MockTransport(fake_api.handle), timeout=config.API_TIMEOUT
+    )
+    # Колода теста не должна затирать сохранённую колоду бота
+    tmp_dir = tempfile.mkdtemp()
+    tarot_api_instance.deck_cache_path = os.path.join(tmp_dir, "deck.json")
+    file_id_cache.path = os.path.join(tmp_dir, "file_ids.json")
+    await warm_up(bot)
+
+    simulation = Simulation(dp, bot, args)
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def user_session(user_id: int) -> None:
+        async with semaphore:
+            await simulation.run_user(user_id)
+
+    loop_lag = []
+    lag_task = asyncio.create_task(monitor_loop_lag(loop_lag))
+    start = time.perf_counter()
+    await asyncio.gather(*(user_session(1_000_000 + i) for i in range(args.users)))
+    elapsed = time.perf_counter() - start
+    lag_task.cancel()
+
+    await tarot_api_instance.close()
+    await bot.session.close()
+
+    return {
+        "users": args.users,
+        "concurrency": args.concurrency,
+        "updates": len(simulation.update_latency),
+        "failed_updates": simulation.failed_updates,
+        "elapsed": elapsed,
+        "throughput": len(simulation.update_latency) / elapsed,
+        "update_latency": sorted(simulation.update_latency),
+        "handlers": {name: sorted(samples) for name, samples in recorder.samples.items()},
+        "handler_errors": dict(recorder.errors),
+        "loop_lag": sorted(loop_lag),
+        # ru_maxrss в Linux — в килобайтах
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "telegram_calls": dict(tg_session.calls),
+        "uploaded_mb": tg_session.uploaded_bytes / 1024 / 1024,
+        "api_calls": dict(fake_api.calls),
+    }
+
+
+def print_report(report: dict) -> None:
+    print(
+        f"Пользователей: {report['users']} (одновременно до {report['concurrency']}), "
+        f"апдейтов: {report['updates']}, с ошибкой: {report['failed_updates']}"
+    )
+    print(
+        f"Время: {report['elapsed']:.1f} с, "
+        f"пропускная способность: {report['throughput']:.1f} апдейтов/с"
+    )
+    print(f"\n{'Хендлер':<28}{'вызовов':>8}  {'p50':>8}  {'p95':>8}  {'p99':>8}  {'max':>8}  (мс)")
+    print(f"{'[апдейт целиком]':<28}{report['updates']:>8}  {format_ms(report['update_latency'])}")
+    for name, samples in sorted(report["handlers"].items()):
+        errors = report["handler_errors"].get(name)
+        suffix = f"  ошибок: {errors}" if errors else ""
+        print(f"{name:<28}{len(samples):>8}  {format_ms(samples)}{suffix}")
+    print(f"{'[задержка event loop]':<28}{len(report['loop_lag']):>8}  {format_ms(report['loop_lag'])}")
+    print(f"\nПиковая память (RSS): {report['peak_rss_mb']:.1f} МБ")
+    print(f"Вызовы Bot API: {report['telegram_calls']}, картинок отправлено: {report['uploaded_mb']:.1f} МБ")
+    print(f"Запросы к API: {report['api_calls']}")
+
+
+def summarize(report: dict) -> dict:
+    """Отчёт для --output: перцентили вместо сырых выборок"""
+
+    def stats(samples):
+        return {
+            "count": len(samples),
+            **{f"p{p}_ms": round(percentile(samples, p) * 1000, 3) for p in (50, 95, 99)},
+            "max_ms": round(samples[-1] * 1000, 3) if samples else 0.0,
+        }
+
+    summary = {key: value for key, value in report.items()
+               if key not in ("update_latency", "handlers", "loop_lag")}
+    summary["update_latency"] = stats(report["update_latency"])
+    summary["handlers"] = {name: stats(samples) for name, samples in report["handlers"].items()}
+    summary["loop_lag"] = stats(report["loop_lag"])
+    return summary
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Нагрузочный тест бота с заглушками Telegram и API")
+    parser.add_argument("--users", type=int, default=1000, help="Всего синтетических пользователей")
+    parser.add_argument("--concurrency", type=int, default=100, help="Пользователей одновременно")
+    parser.add_argument("--rounds", type=int, default=3, help="Раскладов на пользователя")
+    parser.add_argument("--think", type=float, default=0.0, help="Пауза между действиями, до N секунд")
+    parser.add_argument("--telegram-latency", type=float, default=50, help="Задержка Bot API, мс")
+    parser.add_argument("--api-latency", type=float, default=20, help="Задержка Django API, мс")
+    parser.add_argument("--media-root", default=config.MEDIA_ROOT, help="Каталог с cards/cards.json и изображениями")
+    parser.add_argument("--seed", type=int, help="Зерно random для повторяемого прогона")
+    parser.add_argument("--log-level", default="WARNING", help="Уровень логов бота во время теста")
+    parser.add_argument("--output", help="Сохранить сводку в JSON")
+    args = parser.parse_args()
+
+    if args.seed is not None:
+        random.seed(args.seed)
+    if not (Path(args.media_root) / "cards" / "cards.json").exists():
+        sys.exit(f"Не найден {args.media_root}/cards/cards.json: укажите --media-root")
+
+    # Картинки раскладов читаются из того же каталога, что и колода
+    config.MEDIA_ROOT = args.media_root
+    log_listener = setup_logging(args.log_level, config.LOG_FORMAT)
+    try:
+        report = asyncio.run(run(args))
+    finally:
+        log_listener.stop()
+
+    print_report(report)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(summarize(report), f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+import json
+import logging
+import logging.handlers
+import queue
+from datetime import datetime, timezone
+
+from tracing import TraceIdFilter
+
+TEXT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - [%(trace_id)s] %(message)s"
+
+# Стандартные атрибуты LogRecord; всё остальное пришло через extra=
+_RECORD_FIELDS = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {
+    "message",
+    "asctime",
+    "trace_id",
+    "user_id",
+}
+
+
+class JsonFormatter(logging.Formatter):
+    """Одна JSON-строка на запись: время, уровень, trace id, пользователь и поля из extra"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(
+                timespec="milliseconds"
+            ),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "trace_id": getattr(record, "trace_id", "-"),
+        }
+        if getattr(record, "user_id", None) is not None:
+            entry["user_id"] = record.user_id
+        for key, value in vars(record).items():
+            if key not in _RECORD_FIELDS:
+                entry[key] = value
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """Готовит запись к передаче в поток записи: текст сообщения и трейсбек
+    вычисляются здесь, а форматирование в JSON или текст — уже в потоке"""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.message = record.getMessage()
+        if record.exc_info and not record.exc_text:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record.msg = record.message
+        record.args = None
+        record.exc_info = None
+        return record
+
+
+def setup_logging(level: str = "INFO", fmt: str = "json") -> logging.handlers.QueueListener:
+    """Логи через очередь: event loop только кладёт запись в очередь, вывод — в отдельном потоке.
+
+    Возвращает запущенный QueueListener; его нужно остановить при выходе,
+    чтобы дописать оставшиеся записи.
+    """
+    log_queue = queue.SimpleQueue()
+    queue_handler = _QueueHandler(log_queue)
+    # Фильтр работает в потоке апдейта, пока доступны trace id и пользователь
+    queue_handler.addFilter(TraceIdFilter())
+
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(
+        JsonFormatter() if fmt == "json" else logging.Formatter(TEXT_FORMAT)
+    )
+
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(level)
+
+    listener = logging.handlers.QueueListener(log_queue, stream_handler)
+    listener.start()
+    return listener
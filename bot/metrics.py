@@ -0,0 +1,168 @@
+import logging
+import time
+from contextlib import contextmanager
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware
+from aiogram.types import CallbackQuery, Message, TelegramObject
+from aiohttp import web
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+)
+
+logger = logging.getLogger(__name__)
+
+# Бакеты под задержки бота: от миллисекунд (кэш) до секунд (рендер и API)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+HANDLER_LATENCY = Histogram(
+    "bot_handler_seconds",
+    "Время обработки апдейта хендлером",
+    ["event", "handler", "spread_type"],
+    buckets=LATENCY_BUCKETS,
+)
+HANDLER_ERRORS = Counter(
+    "bot_handler_errors_total",
+    "Необработанные исключения в хендлерах",
+    ["event", "handler"],
+)
+UPDATES_IN_PROGRESS = Gauge(
+    "bot_updates_in_progress",
+    "Апдейты, которые обрабатываются прямо сейчас (глубина очереди обработки)",
+    ["event"],
+)
+RENDER_STAGE = Histogram(
+    "bot_render_stage_seconds",
+    "Время этапов генерации картинки расклада",
+    ["layout", "stage"],
+    buckets=LATENCY_BUCKETS,
+)
+API_LATENCY = Histogram(
+    "bot_api_request_seconds",
+    "Задержка запросов к Django API",
+    ["endpoint"],
+    buckets=LATENCY_BUCKETS,
+)
+API_ERRORS = Counter(
+    "bot_api_errors_total",
+    "Ошибки запросов к Django API (код ответа или тип исключения)",
+    ["endpoint", "reason"],
+)
+API_IN_PROGRESS = Gauge(
+    "bot_api_requests_in_progress",
+    "Запросы к Django API, ожидающие ответа",
+)
+CACHE_REQUESTS = Counter(
+    "bot_cache_requests_total",
+    "Обращения к кэшам бота; доля попаданий — hit / (hit + miss)",
+    ["cache", "result"],
+)
+READY = Gauge("bot_ready", "1 — прогрев завершён, бот принимает апдейты")
+WARMUP_PHASE = Gauge(
+    "bot_warmup_phase_seconds", "Длительность этапов прогрева при запуске", ["phase"]
+)
+
+# Состояние для /ready: готовность и длительность этапов прогрева (сек)
+_readiness = {"ready": False, "phases": {}}
+
+
+def set_ready(ready: bool, phases: Dict[str, float] = None) -> None:
+    _readiness["ready"] = ready
+    if phases is not None:
+        _readiness["phases"] = phases
+    READY.set(int(ready))
+
+
+def count_cache(cache: str, hit: bool) -> None:
+    CACHE_REQUESTS.labels(cache, "hit" if hit else "miss").inc()
+
+
+@contextmanager
+def render_stage(layout: str, stage: str):
+    """Замеряет этап рендера: decode, resize, composite или encode"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        RENDER_STAGE.labels(layout or "original", stage).observe(time.perf_counter() - start)
+
+
+class MetricsMiddleware(BaseMiddleware):
+    """Внутренний middleware: время работы хендлера по типу события, хендлеру и раскладу.
+
+    Регистрируется как inner, поэтому видит выбранный хендлер (data["handler"]) и
+    не учитывает апдейты, для которых хендлер не нашёлся.
+    """
+
+    def __init__(self, spread_types):
+        self.spread_types = set(spread_types)
+
+    async def _spread_type(self, event: TelegramObject, data: Dict[str, Any]) -> str:
+        if isinstance(event, CallbackQuery) and event.data in self.spread_types:
+            return event.data
+        # Вопрос к раскладу приходит сообщением, тип расклада хранится в FSM
+        state = data.get("state")
+        if state is not None:
+            spread_type = (await state.get_data()).get("spread_type")
+            if spread_type in self.spread_types:
+                return spread_type
+        return ""
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        event_type = "callback_query" if isinstance(event, CallbackQuery) else (
+            "message" if isinstance(event, Message) else type(event).__name__
+        )
+        handler_object = data.get("handler")
+        handler_name = getattr(getattr(handler_object, "callback", None), "__name__", "unknown")
+        spread_type = await self._spread_type(event, data)
+
+        in_progress = UPDATES_IN_PROGRESS.labels(event_type)
+        in_progress.inc()
+        start = time.perf_counter()
+        try:
+            return await handler(event, data)
+        except Exception:
+            HANDLER_ERRORS.labels(event_type, handler_name).inc()
+            raise
+        finally:
+            in_progress.dec()
+            elapsed = time.perf_counter() - start
+            HANDLER_LATENCY.labels(event_type, handler_name, spread_type).observe(elapsed)
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(
+                    "Хендлер %s: %.1f мс",
+                    handler_name,
+                    elapsed * 1000,
+                    extra={"handler": handler_name, "spread_type": spread_type},
+                )
+
+
+async def _metrics_view(request: web.Request) -> web.Response:
+    response = web.Response(body=generate_latest())
+    response.headers["Content-Type"] = CONTENT_TYPE_LATEST
+    return response
+
+
+async def _ready_view(request: web.Request) -> web.Response:
+    return web.json_response(_readiness, status=200 if _readiness["ready"] else 503)
+
+
+async def start_metrics_server(host: str, port: int) -> web.AppRunner:
+    """Поднимает HTTP-сервер с /metrics и /ready в том же event loop, что и бот"""
+    app = web.Application()
+    app.router.add_get("/metrics", _metrics_view)
+    app.router.add_get("/ready", _ready_view)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    logger.info("📈 Метрики доступны на http://%s:%s/metrics", host, port)
+    return runner
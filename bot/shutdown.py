@@ -0,0 +1,87 @@
+import asyncio
+import inspect
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class ShutdownCoordinator(BaseMiddleware):
+    """Плавная остановка: дожидается апдейтов в обработке и сохраняет состояние.
+
+    Регистрируется внешним middleware на апдейты (учёт обработки) и хуком
+    dp.shutdown, который aiogram вызывает после остановки polling, но до
+    закрытия сессии Bot API — рендеры и отправки успевают завершиться.
+    Апдейты, полученные, но не подтверждённые Telegram, достанутся следующему
+    процессу.
+    """
+
+    def __init__(self, timeout: float):
+        self.timeout = timeout
+        self._tasks = set()
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._flushes = []
+
+    def add_flush(self, name: str, func: Callable[[], Any]) -> None:
+        """Что сохранить после обработки последних апдейтов (функция или корутина)"""
+        self._flushes.append((name, func))
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        task = asyncio.current_task()
+        self._tasks.add(task)
+        self._idle.clear()
+        try:
+            return await handler(event, data)
+        finally:
+            self._tasks.discard(task)
+            if not self._tasks:
+                self._idle.set()
+
+    async def on_shutdown(self) -> None:
+        metrics.set_ready(False)
+        start = time.perf_counter()
+        in_flight = len(self._tasks)
+        if in_flight:
+            logger.info("Остановка: ждём %s апдейтов в обработке", in_flight)
+        cancelled = 0
+        try:
+            await asyncio.wait_for(self._idle.wait(), self.timeout)
+        except asyncio.TimeoutError:
+            pending = list(self._tasks)
+            cancelled = len(pending)
+            logger.warning(
+                "Остановка: %s апдейтов не завершились за %s с и прерваны",
+                cancelled,
+                self.timeout,
+            )
+            for task in pending:
+                task.cancel()
+            # Даём прерванным задачам выполнить finally до сохранения состояния
+            await asyncio.wait(pending, timeout=1)
+
+        for name, func in self._flushes:
+            try:
+                result = func()
+                if inspect.isawaitable(result):
+                    await result
+            except Exception as e:
+                logger.error("Остановка: не удалось сохранить %s: %s", name, e, exc_info=True)
+
+        logger.info(
+            "Остановка: апдейтов дождались %s, прервано %s, состояние сохранено за %.0f мс",
+            in_flight - cancelled,
+            cancelled,
+            (time.perf_counter() - start) * 1000,
+        )
@@ -0,0 +1,123 @@
+import asyncio
+import contextvars
+import json
+import logging
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject, Update
+
+logger = logging.getLogger(__name__)
+
+# Заголовок, в котором trace id уходит в Django API
+TRACE_HEADER = "X-Trace-Id"
+
+# Trace id и собранные спаны текущего апдейта; задачи, созданные внутри
+# хендлера, получают копию контекста и пишут в тот же список
+_trace_id = contextvars.ContextVar("trace_id", default=None)
+_user_id = contextvars.ContextVar("trace_user_id", default=None)
+_spans = contextvars.ContextVar("trace_spans", default=None)
+
+
+def new_trace_id() -> str:
+    return uuid.uuid4().hex[:16]
+
+
+def current_trace_id():
+    return _trace_id.get()
+
+
+class TraceIdFilter(logging.Filter):
+    """Добавляет в записи лога trace_id («-» вне апдейта) и id пользователя апдейта.
+
+    Должен стоять на обработчике в потоке, который пишет лог: контекст апдейта
+    в потоке QueueListener уже недоступен.
+    """
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.trace_id = _trace_id.get() or "-"
+        if getattr(record, "user_id", None) is None:
+            record.user_id = _user_id.get()
+        return True
+
+
+@contextmanager
+def span(name: str, **attrs):
+    """Замеряет этап обработки апдейта; вне апдейта ничего не записывает.
+
+    Дополнительные поля можно дописать в возвращаемый словарь внутри блока.
+    """
+    spans = _spans.get()
+    started = time.time()
+    start = time.perf_counter()
+    try:
+        yield attrs
+    except Exception as e:
+        attrs["error"] = type(e).__name__
+        raise
+    finally:
+        if spans is not None:
+            spans.append({
+                "name": name,
+                "start": round(started, 6),
+                "duration_ms": round((time.perf_counter() - start) * 1000, 3),
+                **attrs,
+            })
+
+
+def write_spans(path: str, service: str, trace_id: str, spans: list) -> None:
+    """Дописывает спаны в JSONL-файл; Django пишет в тот же файл, строки не перемешиваются"""
+    lines = "".join(
+        json.dumps({"trace_id": trace_id, "service": service, **item}, ensure_ascii=False) + "\n"
+        for item in spans
+    )
+    try:
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(lines)
+    except OSError as e:
+        logger.warning("Не удалось записать спаны в %s: %s", path, e)
+
+
+class TracingMiddleware(BaseMiddleware):
+    """Внешний middleware на апдейты: выдаёт trace id и собирает спаны обработки.
+
+    Trace id попадает в логи (TraceIdFilter) и в запросы к API (TarotAPI),
+    спаны при заданном trace_file дописываются в него после обработки апдейта
+    в отдельном потоке, чтобы запись на диск не блокировала event loop.
+    """
+
+    def __init__(self, trace_file: str = None):
+        self.trace_file = trace_file
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        trace_id = new_trace_id()
+        spans = []
+        trace_token = _trace_id.set(trace_id)
+        spans_token = _spans.set(spans)
+        attrs = {}
+        user_token = None
+        if isinstance(event, Update):
+            attrs["update_id"] = event.update_id
+            attrs["event"] = event.event_type
+            user = getattr(event.event, "from_user", None)
+            if user is not None:
+                attrs["user_id"] = user.id
+                user_token = _user_id.set(user.id)
+        try:
+            with span("update", **attrs):
+                return await handler(event, data)
+        finally:
+            _spans.reset(spans_token)
+            if user_token is not None:
+                _user_id.reset(user_token)
+            _trace_id.reset(trace_token)
+            if self.trace_file:
+                await asyncio.to_thread(write_spans, self.trace_file, "bot", trace_id, spans)
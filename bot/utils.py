@@ -7,7 +7,7 @@ def validate_cards_count(cards: Optional[list], required: int) -> bool:
     if not cards:
         return False
     if len(cards) < required:
-        logger.warning(f"Недостаточно карт: требуется {required}, доступно {len(cards)}")
+        logger.warning("Недостаточно карт: требуется %s, доступно %s", required, len(cards))
         return False
     return True
 
@@ -0,0 +1,87 @@
+import asyncio
+import logging
+import os
+import time
+from typing import Dict
+
+from aiogram import Bot
+
+import images
+import metrics
+from api_client import tarot_api_instance
+from file_ids import file_id_cache
+from handlers.interpretation import precompile_blocks
+
+logger = logging.getLogger(__name__)
+
+
+def process_uptime() -> float:
+    """Сколько секунд назад запущен процесс (по /proc), без /proc — процессорное время"""
+    try:
+        with open("/proc/self/stat", "r") as f:
+            # Поле 22 — время запуска в тиках после загрузки; имя процесса в скобках может содержать пробелы
+            start_ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/uptime", "r") as f:
+            uptime = float(f.read().split()[0])
+        return max(uptime - start_ticks / os.sysconf("SC_CLK_TCK"), 0.0)
+    except (OSError, ValueError, IndexError):
+        return time.process_time()
+
+
+async def _load_deck() -> int:
+    """Колода с диска, затем изменения с сервера (открывает пул соединений к API)"""
+    cards = await tarot_api_instance.get_cards()
+    if cards:
+        precompile_blocks(cards, tarot_api_instance.deck_version)
+    return len(cards) if cards else 0
+
+
+async def _timed(phase: str, awaitable, phases: Dict[str, float]):
+    start = time.perf_counter()
+    try:
+        return await awaitable
+    finally:
+        phases[phase] = time.perf_counter() - start
+        metrics.WARMUP_PHASE.labels(phase).set(phases[phase])
+
+
+async def warm_up(bot: Bot, imports_seconds: float = None) -> Dict[str, float]:
+    """Прогрев перед приёмом апдейтов: колода, картинки, file_id и соединение с Telegram параллельно.
+
+    Первый пользователь после деплоя не платит за загрузку фона, шрифтов,
+    декодирование карт и установку соединений. Ошибки этапов не останавливают
+    запуск: бот работает, как работал бы без прогрева.
+    """
+    phases = {}
+    if imports_seconds is not None:
+        phases["imports"] = imports_seconds
+        metrics.WARMUP_PHASE.labels("imports").set(imports_seconds)
+
+    start = time.perf_counter()
+    names = ("deck", "images", "telegram", "file_ids")
+    results = await asyncio.gather(
+        _timed("deck", _load_deck(), phases),
+        # Декодирование картинок — в потоке, чтобы не мешать сетевым этапам
+        _timed("images", asyncio.to_thread(images.warm_up), phases),
+        _timed("telegram", bot.get_me(), phases),
+        _timed("file_ids", asyncio.to_thread(file_id_cache.load), phases),
+        return_exceptions=True,
+    )
+    phases["total"] = time.perf_counter() - start
+
+    for name, result in zip(names, results):
+        if isinstance(result, Exception):
+            logger.warning("Прогрев: этап %s не удался: %s", name, result)
+    deck_size, sprites, _, file_ids = (
+        None if isinstance(result, Exception) else result for result in results
+    )
+    logger.info(
+        "Прогрев завершён за %.0f мс: карт %s, спрайтов %s, file_id %s",
+        phases["total"] * 1000,
+        deck_size,
+        sprites,
+        file_ids,
+        extra={"phases_ms": {name: round(value * 1000, 1) for name, value in phases.items()}},
+    )
+    metrics.set_ready(True, {name: round(value, 4) for name, value in phases.items()})
+    return phases
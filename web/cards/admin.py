@@ -3,4 +3,9 @@ from .models import Card
 
 @admin.register(Card)
 class CardAdmin(admin.ModelAdmin):
-    list_display = ('name',)
+    list_display = ('name', 'updated_at')
+
+    def save_model(self, request, obj, form, change):
+        # Карта изменена вручную — следующий import_cards перезапишет её из JSON
+        obj.content_hash = ''
+        super().save_model(request, obj, form, change)
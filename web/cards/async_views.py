@@ -0,0 +1,65 @@
+from django.http import HttpResponse
+from django.views.decorators.http import require_GET
+from rest_framework.renderers import JSONRenderer
+
+from mystratarotbot.compression import accepted_encoding
+from .cache import adraw_cards, aget_card_list_content, aget_deck_version
+from .renderers import select_renderer
+from .views import (
+    card_list_response,
+    changes_data,
+    changes_queryset,
+    parse_changes_params,
+    parse_list_params,
+    parse_random_request,
+    random_card_data,
+)
+
+# Асинхронные варианты card_list и random_card для запуска под ASGI (ASYNC_API=True)
+
+
+def json_response(data, status=200, renderer=None):
+    """Ответ в том же виде, что отдаёт DRF (по умолчанию JSON в UTF-8 без экранирования)"""
+    renderer = renderer or JSONRenderer()
+    return HttpResponse(renderer.render(data), status=status, content_type=renderer.media_type)
+
+
+@require_GET
+async def card_list(request):
+    """Возвращает все карты (fields — только указанные поля, cardtype/suit — фильтры)"""
+    renderer = select_renderer(request)
+    fields, filters, error = parse_list_params(request.GET)
+    if error:
+        return json_response({"error": error}, status=400, renderer=renderer)
+
+    deck_version = await aget_deck_version()
+    encoding = accepted_encoding(request)
+    content = await aget_card_list_content(request, renderer, fields, filters, encoding)
+    return card_list_response(content, renderer, deck_version, encoding)
+
+
+@require_GET
+async def random_card(request):
+    """Возвращает случайную карту или список из count карт (distinct=false — с повторами)"""
+    renderer = select_renderer(request)
+    count, distinct, fields, filters, error = parse_random_request(request.GET)
+    if error:
+        return json_response({"error": error}, status=400, renderer=renderer)
+
+    cards = await adraw_cards(count or 1, distinct=distinct, only=fields, filters=filters)
+    data, status = random_card_data(request, cards, count, fields)
+    return json_response(data, status=status, renderer=renderer)
+
+
+@require_GET
+async def card_changes(request):
+    """Карты, изменённые или удалённые после курсора since, и новый курсор"""
+    renderer = select_renderer(request)
+    position, fields, error = parse_changes_params(request.GET)
+    if error:
+        return json_response({"error": error}, status=400, renderer=renderer)
+
+    deck_version = await aget_deck_version()
+    cards = [card async for card in changes_queryset(position, fields)]
+    since = request.GET.get('since') or None
+    return json_response(changes_data(request, cards, since, fields, deck_version), renderer=renderer)
@@ -0,0 +1,176 @@
+import hashlib
+import random
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Max
+
+from mystratarotbot.compression import compress
+
+from .models import Card
+from .serializers import CardSerializer
+
+# Версия колоды: все производные ключи кэша содержат её, поэтому
+# для сброса кэша достаточно сменить версию
+DECK_VERSION_KEY = 'cards:deck-version'
+
+
+def _deck_version(stats):
+    """Версия по базе — время последнего изменения и число карт (с удалёнными).
+
+    Одинакова во всех процессах, поэтому не зависит от того, общий ли кэш у воркеров.
+    """
+    updated = stats['updated'].isoformat() if stats['updated'] else ''
+    raw = f"{updated}|{stats['count']}"
+    return hashlib.md5(raw.encode(), usedforsecurity=False).hexdigest()
+
+
+def get_deck_version():
+    """Возвращает текущую версию колоды; в кэше она живёт DECK_VERSION_TTL секунд"""
+    version = cache.get(DECK_VERSION_KEY)
+    if version is None:
+        version = _deck_version(
+            Card.all_objects.aggregate(updated=Max('updated_at'), count=Count('id'))
+        )
+        cache.set(DECK_VERSION_KEY, version, settings.DECK_VERSION_TTL)
+    return version
+
+
+async def aget_deck_version():
+    version = await cache.aget(DECK_VERSION_KEY)
+    if version is None:
+        version = _deck_version(
+            await Card.all_objects.aaggregate(updated=Max('updated_at'), count=Count('id'))
+        )
+        await cache.aset(DECK_VERSION_KEY, version, settings.DECK_VERSION_TTL)
+    return version
+
+
+def invalidate_cards_cache():
+    """Сбрасывает все закэшированные данные колоды.
+
+    Версия пересчитывается по базе сразу в этом процессе; воркеры с отдельным
+    (локальным) кэшем увидят изменения не позже чем через DECK_VERSION_TTL.
+    """
+    cache.delete(DECK_VERSION_KEY)
+
+
+async def ainvalidate_cards_cache():
+    await cache.adelete(DECK_VERSION_KEY)
+
+
+def _filters_key(filters):
+    return ','.join(f'{name}={value}' for name, value in sorted((filters or {}).items()))
+
+
+def get_card_ids(filters=None):
+    """Возвращает список id карт (с фильтрами cardtype/suit — подмножества) из кэша"""
+    key = f'cards:ids:{get_deck_version()}:{_filters_key(filters)}'
+    ids = cache.get(key)
+    if ids is None:
+        ids = list(Card.objects.filter(**(filters or {})).values_list('id', flat=True))
+        cache.set(key, ids, settings.DECK_CACHE_TIMEOUT)
+    return ids
+
+
+async def aget_card_ids(filters=None):
+    key = f'cards:ids:{await aget_deck_version()}:{_filters_key(filters)}'
+    ids = await cache.aget(key)
+    if ids is None:
+        queryset = Card.objects.filter(**(filters or {})).values_list('id', flat=True)
+        ids = [card_id async for card_id in queryset]
+        await cache.aset(key, ids, settings.DECK_CACHE_TIMEOUT)
+    return ids
+
+
+def _pick_ids(card_ids, count, distinct, rng=random):
+    if not card_ids or (distinct and len(card_ids) < count):
+        return None
+    if distinct:
+        return rng.sample(card_ids, count)
+    return rng.choices(card_ids, k=count)
+
+
+def draw_cards(count, distinct=True, only=None, filters=None, rng=random):
+    """Выбирает count случайных карт по закэшированному списку id одним запросом.
+
+    С rng=random.Random(seed) выбор повторяем для той же колоды. Возвращает None,
+    если карт недостаточно.
+    """
+    for _ in range(2):
+        drawn_ids = _pick_ids(get_card_ids(filters), count, distinct, rng)
+        if drawn_ids is None:
+            return None
+        queryset = Card.objects.only(*only) if only else Card.objects.all()
+        cards = queryset.in_bulk(set(drawn_ids))
+        if len(cards) == len(set(drawn_ids)):
+            return [cards[card_id] for card_id in drawn_ids]
+        # Список id устарел (карту удалили в обход сигналов) — пересобираем
+        invalidate_cards_cache()
+    return None
+
+
+async def adraw_cards(count, distinct=True, only=None, filters=None, rng=random):
+    for _ in range(2):
+        drawn_ids = _pick_ids(await aget_card_ids(filters), count, distinct, rng)
+        if drawn_ids is None:
+            return None
+        queryset = Card.objects.only(*only) if only else Card.objects.all()
+        cards = await queryset.ain_bulk(set(drawn_ids))
+        if len(cards) == len(set(drawn_ids)):
+            return [cards[card_id] for card_id in drawn_ids]
+        await ainvalidate_cards_cache()
+    return None
+
+
+def _card_list_key(request, fields, filters, renderer, deck_version):
+    return ':'.join([
+        'cards:list', deck_version, request.scheme, request.get_host(),
+        ','.join(fields), _filters_key(filters), renderer.format,
+    ])
+
+
+def _render_card_list(request, fields, renderer, cards):
+    serializer = CardSerializer(cards, many=True, fields=fields, context={'request': request})
+    return renderer.render(serializer.data)
+
+
+def get_card_list_content(request, renderer, fields=None, filters=None, encoding=None):
+    """Возвращает готовое тело ответа со списком карт.
+
+    Ответ зависит от хоста (абсолютные ссылки на изображения), набора полей,
+    фильтров, формата и сжатия, поэтому кэшируется отдельно для каждого
+    сочетания — колода сериализуется и сжимается один раз на версию.
+    """
+    fields = tuple(fields or CardSerializer.Meta.fields)
+    key = _card_list_key(request, fields, filters, renderer, get_deck_version())
+    encoded_key = f'{key}:{encoding}' if encoding else key
+    content = cache.get(encoded_key)
+    if content is None:
+        content = cache.get(key)
+        if content is None:
+            cards = Card.objects.filter(**(filters or {})).only(*fields)
+            content = _render_card_list(request, fields, renderer, cards)
+            cache.set(key, content, settings.DECK_CACHE_TIMEOUT)
+        if encoding:
+            content = compress(content, encoding)
+            cache.set(encoded_key, content, settings.DECK_CACHE_TIMEOUT)
+    return content
+
+
+async def aget_card_list_content(request, renderer, fields=None, filters=None, encoding=None):
+    fields = tuple(fields or CardSerializer.Meta.fields)
+    key = _card_list_key(request, fields, filters, renderer, await aget_deck_version())
+    encoded_key = f'{key}:{encoding}' if encoding else key
+    content = await cache.aget(encoded_key)
+    if content is None:
+        content = await cache.aget(key)
+        if content is None:
+            queryset = Card.objects.filter(**(filters or {})).only(*fields)
+            cards = [card async for card in queryset]
+            content = _render_card_list(request, fields, renderer, cards)
+            await cache.aset(key, content, settings.DECK_CACHE_TIMEOUT)
+        if encoding:
+            content = compress(content, encoding)
+            await cache.aset(encoded_key, content, settings.DECK_CACHE_TIMEOUT)
+    return content
@@ -0,0 +1,136 @@
+import hashlib
+import io
+import os
+import threading
+import time
+
+from django.conf import settings
+from PIL import Image
+
+from .renditions import RENDITIONS, get_manifest, get_rendition
+
+# Форматы, в которые можно перекодировать изображение карты
+FORMATS = {
+    'webp': ('WEBP', 'image/webp', {'quality': 90, 'method': 4}),
+    'png': ('PNG', 'image/png', {'optimize': True}),
+    'jpeg': ('JPEG', 'image/jpeg', {'quality': 90}),
+}
+
+# Как часто пересчитывать размер кэша обходом каталога, секунды
+RESCAN_INTERVAL = 300
+# До какой доли лимита очищать кэш, чтобы следующие записи не вызывали обход сразу
+EVICT_TO = 0.9
+
+_size_lock = threading.Lock()
+# Размер кэша по последнему обходу плюс записанное с тех пор этим процессом
+_cache_bytes = None
+_scanned_at = 0.0
+
+
+def _cache_path(key, fmt):
+    return os.path.join(settings.CARD_IMAGE_CACHE_DIR, key[:2], f'{key}.{fmt}')
+
+
+def _scan():
+    """Все файлы кэша: список (mtime, размер, путь) и общий размер"""
+    files = []
+    total = 0
+    for root, _, names in os.walk(settings.CARD_IMAGE_CACHE_DIR):
+        for name in names:
+            path = os.path.join(root, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+    return files, total
+
+
+def _evict(files, total, max_bytes, keep):
+    """Удаляет давно не использованные файлы, пока кэш не уложится в лимит; возвращает новый размер"""
+    for _, size, path in sorted(files):
+        if total <= max_bytes:
+            break
+        if path == keep:
+            continue
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total -= size
+    return total
+
+
+def _account(added, max_bytes, keep):
+    """Учитывает записанный файл; каталог обходится, только если кэш мог превысить лимит.
+
+    Размер, известный процессу, не включает файлы других процессов, поэтому
+    каталог всё равно пересчитывается не реже раза в RESCAN_INTERVAL.
+    """
+    global _cache_bytes, _scanned_at
+    with _size_lock:
+        if _cache_bytes is not None and time.monotonic() - _scanned_at < RESCAN_INTERVAL:
+            _cache_bytes += added
+            if _cache_bytes <= max_bytes:
+                return
+        files, total = _scan()
+        if total > max_bytes:
+            total = _evict(files, total, int(max_bytes * EVICT_TO), keep)
+        _cache_bytes = total
+        _scanned_at = time.monotonic()
+
+
+def _render(source_path, width, fmt):
+    pil_format, _, save_options = FORMATS[fmt]
+    with Image.open(source_path) as image:
+        image = image.convert('RGB' if fmt == 'jpeg' else 'RGBA')
+        if width and width < image.width:
+            height = round(image.height * width / image.width)
+            image = image.resize((width, height), Image.Resampling.LANCZOS)
+        bio = io.BytesIO()
+        image.save(bio, format=pil_format, **save_options)
+    return bio.getvalue()
+
+
+def get_card_image(card, width, fmt):
+    """Возвращает (путь к файлу, ETag) изображения карты нужной ширины и формата.
+
+    Готовые копии из манифеста отдаются как есть, остальные создаются при
+    первом запросе и хранятся в дисковом кэше с адресацией по содержимому.
+    """
+    image_name = card.image.name
+    source_path = card.image.path
+    stat = os.stat(source_path)
+
+    if fmt == 'webp':
+        manifest = get_manifest()
+        entry = manifest['cards'].get(image_name)
+        if entry and entry['source_mtime'] == stat.st_mtime_ns:
+            for name, (_, mode) in RENDITIONS.items():
+                info = get_rendition(manifest, image_name, name)
+                if mode != 'fit' or info is None:
+                    continue
+                if info['width'] == width or (not width and name == 'full'):
+                    return os.path.join(settings.MEDIA_ROOT, info['path']), info['hash']
+
+    key = hashlib.sha256(
+        f'{image_name}:{stat.st_mtime_ns}:{stat.st_size}:{width or 0}:{fmt}'.encode()
+    ).hexdigest()
+    path = _cache_path(key, fmt)
+
+    try:
+        # Отмечаем использование файла для вытеснения по LRU
+        os.utime(path)
+        return path, key
+    except FileNotFoundError:
+        pass
+
+    content = _render(source_path, width, fmt)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(content)
+    os.replace(tmp_path, path)
+    _account(len(content), settings.CARD_IMAGE_CACHE_MAX_BYTES, keep=path)
+    return path, key
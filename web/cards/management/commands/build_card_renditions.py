@@ -0,0 +1,81 @@
+import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from cards.models import Card
+from cards.renditions import (
+    RENDITIONS,
+    RENDITIONS_DIR,
+    build_renditions,
+    file_hash,
+    load_manifest,
+    save_manifest,
+)
+
+
+def _is_fresh(entry, mtime):
+    """Запись манифеста актуальна, если все копии на месте и исходник не менялся"""
+    if entry is None or set(entry['renditions']) != set(RENDITIONS):
+        return False
+    if any(
+        not os.path.exists(os.path.join(settings.MEDIA_ROOT, rendition['path']))
+        for rendition in entry['renditions'].values()
+    ):
+        return False
+    return entry['source_mtime'] == mtime
+
+
+class Command(BaseCommand):
+    help = 'Создаёт уменьшенные копии изображений карт (WebP) и манифест с размерами и хэшами'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='Пересоздать все копии')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Потоков для обработки')
+
+    def handle(self, *args, **options):
+        manifest = load_manifest()
+        entries = manifest['cards']
+        image_names = set(Card.objects.exclude(image='').values_list('image', flat=True))
+
+        to_build = []
+        for image_name in sorted(image_names):
+            source_path = os.path.join(settings.MEDIA_ROOT, image_name)
+            if not os.path.exists(source_path):
+                self.stdout.write(self.style.WARNING(f"Файл изображения не найден: {source_path}"))
+                entries.pop(image_name, None)
+                continue
+
+            entry = entries.get(image_name)
+            mtime = os.stat(source_path).st_mtime_ns
+            if not options['force'] and _is_fresh(entry, mtime):
+                continue
+
+            source_hash = file_hash(source_path)
+            if not options['force'] and entry and entry['source_hash'] == source_hash:
+                # Файл «тронули», но содержимое то же — копии пересоздавать не нужно
+                entry['source_mtime'] = mtime
+                if _is_fresh(entry, mtime):
+                    continue
+            to_build.append((image_name, source_hash))
+
+        with ThreadPoolExecutor(max_workers=options['workers']) as executor:
+            results = executor.map(lambda args: build_renditions(*args), to_build)
+            for (image_name, _), entry in zip(to_build, results):
+                entries[image_name] = entry
+                self.stdout.write(f"Обработано: {image_name}")
+
+        # Удаляем копии изображений, которые больше не используются картами
+        removed = set(entries) - image_names
+        for image_name in removed:
+            stem = os.path.splitext(os.path.basename(image_name))[0]
+            shutil.rmtree(os.path.join(settings.MEDIA_ROOT, RENDITIONS_DIR, stem), ignore_errors=True)
+            del entries[image_name]
+
+        save_manifest(manifest)
+        self.stdout.write(self.style.SUCCESS(
+            f"Создано копий для {len(to_build)} изображений, удалено: {len(removed)}, "
+            f"всего в манифесте: {len(entries)}"
+        ))
@@ -1,54 +1,117 @@
-import os
+import hashlib
 import json
-from django.core.management.base import BaseCommand
+import os
+from concurrent.futures import ThreadPoolExecutor
+
 from django.conf import settings
-from cards.models import Card
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from cards.cache import invalidate_cards_cache
+from cards.models import SUITS, Card
+
+# Поля карты, которые заполняются из JSON (кроме url — ключа карты)
+IMPORT_FIELDS = [
+    'name', 'desc', 'rdesc', 'message', 'advice', 'radvice',
+    'sequence', 'qabalah', 'hebrew_letter', 'cardtype', 'suit', 'image',
+]
+
+
+def _image_path(card_data):
+    # Преобразуем путь к изображению в относительный относительно MEDIA_ROOT
+    image_path = card_data.get('image', '')
+    if image_path.startswith('./media/'):
+        image_path = image_path[len('./media/'):]  # 'cards/major_arcana_fool.png'
+    return image_path
+
+
+def _suit(card_data):
+    # Масть есть только у младших арканов; если в JSON её нет, берём из url ('ace_of_cups')
+    if card_data.get('cardtype') != 'minor':
+        return None
+    suit = card_data.get('suit') or card_data['url'].rpartition('_of_')[2]
+    return suit if suit in dict(SUITS) else None
+
+
+def _card_fields(card_data, image_path):
+    return {
+        'name': card_data['name'],
+        'desc': card_data.get('desc', ''),
+        'rdesc': card_data.get('rdesc', ''),
+        'message': card_data.get('message', ''),
+        # Если отдельного совета нет, используем краткое послание карты
+        'advice': card_data.get('advice') or card_data.get('message', ''),
+        'radvice': card_data.get('radvice', ''),
+        'sequence': card_data.get('sequence', 0),
+        'qabalah': card_data.get('qabalah', ''),
+        'hebrew_letter': card_data.get('hebrew_letter', ''),
+        'cardtype': card_data.get('cardtype', ''),
+        'suit': _suit(card_data),
+        'image': image_path,  # сохраняем относительный путь
+    }
+
+
+def _content_hash(url, fields):
+    payload = json.dumps({'url': url, **fields}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
 
 class Command(BaseCommand):
-    help = 'Импорт карт из JSON файла'
+    help = 'Импорт карт из JSON файлов (записываются только изменившиеся карты)'
 
     def add_arguments(self, parser):
-        parser.add_argument('json_file', type=str, help='Путь к JSON файлу с картами')
+        parser.add_argument('json_files', nargs='+', type=str, help='Пути к JSON файлам с картами')
+        parser.add_argument('--force', action='store_true', help='Перезаписать все карты, даже без изменений')
+        parser.add_argument('--workers', type=int, default=8, help='Потоков для проверки изображений')
 
     def handle(self, *args, **options):
-        json_file = options['json_file']
-        if not os.path.exists(json_file):
-            self.stdout.write(self.style.ERROR(f"Файл JSON не найден: {json_file}"))
-            return
-
-        with open(json_file, 'r', encoding='utf-8') as f:
-            cards_data = json.load(f)
-
-        for card_data in cards_data:
-            # Преобразуем путь к изображению в относительный относительно MEDIA_ROOT
-            image_path = card_data.get('image', '')
-            if image_path.startswith('./media/'):
-                image_path = image_path[len('./media/'):]  # 'cards/major_arcana_fool.png'
-
-            full_path = os.path.join(settings.MEDIA_ROOT, image_path)
-            if image_path and not os.path.exists(full_path):
+        cards_data = []
+        for json_file in options['json_files']:
+            if not os.path.exists(json_file):
+                self.stdout.write(self.style.ERROR(f"Файл JSON не найден: {json_file}"))
+                return
+            with open(json_file, 'r', encoding='utf-8') as f:
+                cards_data.extend(json.load(f))
+
+        # Проверяем наличие изображений параллельно
+        image_paths = [_image_path(card_data) for card_data in cards_data]
+        full_paths = {path: os.path.join(settings.MEDIA_ROOT, path) for path in image_paths if path}
+        with ThreadPoolExecutor(max_workers=options['workers']) as executor:
+            exists = dict(zip(full_paths, executor.map(os.path.exists, full_paths.values())))
+
+        stored_hashes = dict(Card.objects.values_list('url', 'content_hash'))
+        # По url: при повторе карты в нескольких файлах побеждает последняя запись
+        changed = {}
+        for card_data, image_path in zip(cards_data, image_paths):
+            if image_path and not exists[image_path]:
                 self.stdout.write(self.style.WARNING(
-                    f"Файл изображения не найден: {full_path}. Карта '{card_data['name']}' будет создана без изображения."
+                    f"Файл изображения не найден: {full_paths[image_path]}. Карта '{card_data['name']}' будет создана без изображения."
                 ))
                 image_path = ''  # сбрасываем путь, если файла нет
 
-            # Создаём или обновляем карту
-            card, created = Card.objects.update_or_create(
-                url=card_data['url'],
-                defaults={
-                    'name': card_data['name'],
-                    'desc': card_data.get('desc', ''),
-                    'rdesc': card_data.get('rdesc', ''),
-                    'message': card_data.get('message', ''),
-                    'sequence': card_data.get('sequence', 0),
-                    'qabalah': card_data.get('qabalah', ''),
-                    'hebrew_letter': card_data.get('hebrew_letter', ''),
-                    'cardtype': card_data.get('cardtype', ''),
-                    'image': image_path,  # сохраняем относительный путь
-                }
-            )
-
-            if created:
-                self.stdout.write(self.style.SUCCESS(f"Создана карта: {card.name}"))
-            else:
-                self.stdout.write(self.style.SUCCESS(f"Обновлена карта: {card.name}"))
+            url = card_data['url']
+            fields = _card_fields(card_data, image_path)
+            content_hash = _content_hash(url, fields)
+            if not options['force'] and stored_hashes.get(url) == content_hash:
+                changed.pop(url, None)
+                continue
+            changed[url] = Card(url=url, content_hash=content_hash, **fields)
+
+        if changed:
+            # Одна вставка с обновлением при конфликте по url вместо запроса на каждую карту
+            with transaction.atomic():
+                Card.objects.bulk_create(
+                    list(changed.values()),
+                    update_conflicts=True,
+                    unique_fields=['url'],
+                    # updated_at — для /api/cards/changes/, is_deleted=False восстанавливает удалённую карту
+                    update_fields=IMPORT_FIELDS + ['content_hash', 'updated_at', 'is_deleted'],
+                )
+            # bulk_create не вызывает сигналы, поэтому сбрасываем кэш явно
+            invalidate_cards_cache()
+
+        created_count = len(changed.keys() - stored_hashes.keys())
+        self.stdout.write(self.style.SUCCESS(
+            f"Создано карт: {created_count}, обновлено: {len(changed) - created_count}, "
+            f"без изменений: {len(cards_data) - len(changed)}"
+        ))
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.5 on 2026-10-19 14:20
+
+from django.db import migrations, models
+
+
+def fill_advice_from_message(apps, schema_editor):
+    Card = apps.get_model('cards', 'Card')
+    Card.objects.filter(advice__isnull=True).exclude(message__isnull=True).update(
+        advice=models.F('message')
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cards', '0002_alter_card_options_remove_card_description_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='card',
+            name='advice',
+            field=models.TextField(blank=True, null=True, verbose_name='Совет (прямое положение)'),
+        ),
+        migrations.AddField(
+            model_name='card',
+            name='radvice',
+            field=models.TextField(blank=True, null=True, verbose_name='Совет (перевёрнутое положение)'),
+        ),
+        migrations.RunPython(fill_advice_from_message, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-19 14:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cards', '0003_card_advice_card_radvice'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='card',
+            name='content_hash',
+            field=models.CharField(blank=True, editable=False, max_length=64, verbose_name='Хэш импортированных данных'),
+        ),
+    ]
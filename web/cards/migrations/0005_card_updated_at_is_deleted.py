@@ -0,0 +1,23 @@
+# Generated by Django 5.2.5 on 2026-10-19 14:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cards', '0004_card_content_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='card',
+            name='is_deleted',
+            field=models.BooleanField(default=False, editable=False, verbose_name='Удалена'),
+        ),
+        migrations.AddField(
+            model_name='card',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True, verbose_name='Изменена'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.5 on 2026-10-19 14:46
+
+from django.db import migrations, models
+
+
+def fill_suit_from_url(apps, schema_editor):
+    # url младших арканов имеет вид 'ace_of_cups'
+    Card = apps.get_model('cards', 'Card')
+    for suit in ('wands', 'cups', 'swords', 'pentacles'):
+        Card.objects.filter(cardtype='minor', suit__isnull=True, url__endswith=f'_of_{suit}').update(
+            suit=suit
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cards', '0005_card_updated_at_is_deleted'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='card',
+            index=models.Index(fields=['cardtype', 'suit'], name='cards_cardtype_suit'),
+        ),
+        migrations.AddIndex(
+            model_name='card',
+            index=models.Index(fields=['suit'], name='cards_suit'),
+        ),
+        migrations.RunPython(fill_suit_from_url, migrations.RunPython.noop),
+    ]
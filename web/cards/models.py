@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 
 CARD_TYPES = [
     ('major', 'Старший аркан'),
@@ -12,6 +13,24 @@ SUITS = [
     ('pentacles', 'Пентакли'),
 ]
 
+class CardQuerySet(models.QuerySet):
+    def delete(self):
+        """Мягкое удаление: карта остаётся в базе как отметка для /api/cards/changes/"""
+        from .cache import invalidate_cards_cache
+
+        updated = self.update(is_deleted=True, updated_at=timezone.now())
+        # update() не вызывает сигналы
+        invalidate_cards_cache()
+        return updated, {self.model._meta.label: updated}
+
+
+class CardManager(models.Manager.from_queryset(CardQuerySet)):
+    """Только действующие карты"""
+
+    def get_queryset(self):
+        return super().get_queryset().filter(is_deleted=False)
+
+
 class Card(models.Model):
     name = models.CharField("Название карты", max_length=100)
     url = models.SlugField("URL", unique=True)
@@ -19,16 +38,35 @@ class Card(models.Model):
     desc = models.TextField("Описание прямого значения")
     message = models.CharField("Краткое послание", max_length=255, blank=True, null=True)
     rdesc = models.TextField("Описание перевёрнутого значения", blank=True, null=True)
+    advice = models.TextField("Совет (прямое положение)", blank=True, null=True)
+    radvice = models.TextField("Совет (перевёрнутое положение)", blank=True, null=True)
     sequence = models.PositiveIntegerField("Номер карты в колоде")
     qabalah = models.CharField("Каббала", max_length=255, blank=True, null=True)
     hebrew_letter = models.CharField("Буква иврита", max_length=10, blank=True, null=True)
     cardtype = models.CharField("Тип карты", max_length=10, choices=CARD_TYPES)
     suit = models.CharField("Масть", max_length=10, choices=SUITS, blank=True, null=True)
+    content_hash = models.CharField("Хэш импортированных данных", max_length=64, blank=True, editable=False)
+    updated_at = models.DateTimeField("Изменена", auto_now=True, db_index=True)
+    is_deleted = models.BooleanField("Удалена", default=False, editable=False)
+
+    objects = CardManager()
+    # Все карты, включая удалённые (для синхронизации колоды)
+    all_objects = models.Manager()
 
     class Meta:
         ordering = ['sequence']
+        indexes = [
+            # Фильтры /api/cards/?cardtype=&suit= и выборка карт для раскладов по арканам
+            models.Index(fields=['cardtype', 'suit'], name='cards_cardtype_suit'),
+            models.Index(fields=['suit'], name='cards_suit'),
+        ]
         verbose_name = "Карта Таро"
         verbose_name_plural = "Карты Таро"
 
     def __str__(self):
-        return f"{self.name} ({self.cardtype})"
\ No newline at end of file
+        return f"{self.name} ({self.cardtype})"
+
+    def delete(self, using=None, keep_parents=False):
+        self.is_deleted = True
+        self.save(update_fields=['is_deleted', 'updated_at'])
+        return 1, {self._meta.label: 1}
\ No newline at end of file
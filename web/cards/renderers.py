@@ -0,0 +1,49 @@
+from rest_framework.negotiation import DefaultContentNegotiation
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+from mystratarotbot.compression import parse_quality_list
+
+try:
+    import msgpack
+except ImportError:  # без пакета msgpack доступен только JSON
+    msgpack = None
+
+
+class MessagePackRenderer(BaseRenderer):
+    """Компактный бинарный формат для бота (Accept: application/msgpack)"""
+
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return msgpack.packb(data, use_bin_type=True)
+
+
+# Форматы ответов API карт; JSON остаётся форматом по умолчанию
+API_RENDERERS = [JSONRenderer] + ([MessagePackRenderer] if msgpack is not None else [])
+
+
+class QualityContentNegotiation(DefaultContentNegotiation):
+    """Стандартный выбор DRF, но с учётом q из Accept.
+
+    DRF сравнивает только специфичность типов, и на "application/msgpack,
+    application/json;q=0.9" выбрал бы JSON как первый в списке рендереров.
+    """
+
+    def select_renderer(self, request, renderers, format_suffix=None):
+        accepted = parse_quality_list(request.headers.get('Accept', ''))
+        renderers = sorted(renderers, key=lambda renderer: -accepted.get(renderer.media_type, 0))
+        return super().select_renderer(request, renderers, format_suffix)
+
+
+def select_renderer(request):
+    """Выбор формата ответа для представлений без DRF (async_views)"""
+    accepted = parse_quality_list(request.headers.get('Accept', ''))
+    quality = accepted.get(MessagePackRenderer.media_type, 0)
+    if msgpack is not None and quality and quality >= accepted.get(JSONRenderer.media_type, 0):
+        return MessagePackRenderer()
+    return JSONRenderer()
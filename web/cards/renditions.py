@@ -0,0 +1,122 @@
+import hashlib
+import json
+import os
+
+from django.conf import settings
+from PIL import Image
+
+# Каталог с уменьшенными копиями изображений относительно MEDIA_ROOT
+RENDITIONS_DIR = 'renditions'
+MANIFEST_NAME = 'manifest.json'
+
+# Размеры совпадают с раскладкой карт в боте (bot/images.py):
+# 'fit' — вписать с сохранением пропорций, 'exact' — привести к точному размеру
+RENDITIONS = {
+    'full': (None, 'fit'),
+    'single': ((662, 1124), 'fit'),
+    'double': ((492, 1124), 'fit'),
+    'triple': ((324, 564), 'fit'),
+    'celtic': ((174, 300), 'exact'),
+}
+
+
+def manifest_path():
+    return os.path.join(settings.MEDIA_ROOT, RENDITIONS_DIR, MANIFEST_NAME)
+
+
+def load_manifest():
+    """Читает манифест; если его нет — возвращает пустой"""
+    try:
+        with open(manifest_path(), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {'cards': {}}
+
+
+_manifest_cache = {'cards': {}}
+_manifest_key = None
+
+
+def get_manifest():
+    """Манифест для отдачи изображений: держится в памяти и перечитывается при изменении файла.
+
+    Возвращаемый словарь общий — изменять его нельзя (для правки есть load_manifest).
+    """
+    global _manifest_cache, _manifest_key
+    path = manifest_path()
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return {'cards': {}}
+    key = (path, stat.st_mtime_ns, stat.st_size)
+    if key != _manifest_key:
+        _manifest_cache = load_manifest()
+        _manifest_key = key
+    return _manifest_cache
+
+
+def save_manifest(manifest):
+    """Записывает манифест атомарно, чтобы читатели не увидели половину файла"""
+    path = manifest_path()
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def get_rendition(manifest, image_name, rendition):
+    """Возвращает описание копии изображения из манифеста или None"""
+    entry = manifest['cards'].get(image_name)
+    if entry is None:
+        return None
+    return entry['renditions'].get(rendition)
+
+
+def build_renditions(image_name, source_hash):
+    """Создаёт все копии изображения карты в формате WebP без потерь.
+
+    Возвращает запись манифеста для изображения.
+    """
+    source_path = os.path.join(settings.MEDIA_ROOT, image_name)
+    stem = os.path.splitext(os.path.basename(image_name))[0]
+    target_dir = os.path.join(settings.MEDIA_ROOT, RENDITIONS_DIR, stem)
+    os.makedirs(target_dir, exist_ok=True)
+
+    renditions = {}
+    with Image.open(source_path) as source:
+        source = source.convert('RGBA')
+        source_size = source.size
+        for name, (size, mode) in RENDITIONS.items():
+            if size is None:
+                image = source
+            elif mode == 'exact':
+                image = source.resize(size, Image.Resampling.LANCZOS)
+            else:
+                image = source.copy()
+                image.thumbnail(size, Image.Resampling.LANCZOS)
+
+            relative_path = os.path.join(RENDITIONS_DIR, stem, f'{name}.webp')
+            full_path = os.path.join(settings.MEDIA_ROOT, relative_path)
+            image.save(full_path, format='WEBP', lossless=True)
+            renditions[name] = {
+                'path': relative_path,
+                'width': image.width,
+                'height': image.height,
+                'hash': file_hash(full_path),
+            }
+
+    return {
+        'source_hash': source_hash,
+        'source_size': list(source_size),
+        'source_mtime': os.stat(source_path).st_mtime_ns,
+        'renditions': renditions,
+    }
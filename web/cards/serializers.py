@@ -6,7 +6,14 @@ class CardSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Card
-        fields = ['id', 'name', 'desc', 'message', 'rdesc', 'image']
+        fields = ['id', 'name', 'desc', 'message', 'rdesc', 'advice', 'radvice', 'image']
+
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Оставляем только запрошенные поля
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
 
     def get_image(self, obj):
         request = self.context.get('request')
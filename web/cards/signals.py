@@ -0,0 +1,11 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .cache import invalidate_cards_cache
+from .models import Card
+
+
+@receiver(post_save, sender=Card)
+@receiver(post_delete, sender=Card)
+def card_changed(sender, **kwargs):
+    invalidate_cards_cache()
@@ -1,3 +1,389 @@
-from django.test import TestCase
+import gzip
+import io
+import json
+import os
+import shutil
+import tempfile
+import time
+from unittest import mock
 
-# Create your tests here.
+import brotli
+import msgpack
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import RequestFactory, TestCase
+from PIL import Image
+
+from mystratarotbot.compression import accepted_encoding, parse_quality_list
+from . import image_cache
+from .cache import get_card_ids, get_deck_version
+from .models import Card
+from .renderers import select_renderer
+from .renditions import build_renditions, get_manifest, save_manifest
+from .views import decode_change_cursor, encode_change_cursor
+
+
+def create_card(sequence, cardtype='major', suit=None, **fields):
+    fields = {
+        'name': f'Карта {sequence}', 'url': f'card-{sequence}', 'image': f'cards/card-{sequence}.jpg',
+        'desc': 'desc', **fields,
+    }
+    return Card.objects.create(sequence=sequence, cardtype=cardtype, suit=suit, **fields)
+
+
+class CardsTestCase(TestCase):
+    def setUp(self):
+        # Кэш колоды живёт между тестами, а база откатывается
+        cache.clear()
+
+    def card_names(self, **params):
+        response = self.client.get('/api/cards/', params, HTTP_ACCEPT='application/json')
+        self.assertEqual(response.status_code, 200)
+        return [card['name'] for card in response.json()]
+
+
+class ImportCardsMixin:
+    def import_cards(self, cards, *args):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'cards.json')
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(cards, f, ensure_ascii=False)
+            out = io.StringIO()
+            call_command('import_cards', path, *args, stdout=out)
+        return out.getvalue()
+
+
+class CardCacheTests(ImportCardsMixin, CardsTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        for sequence in range(3):
+            create_card(sequence)
+
+    def test_save_invalidates(self):
+        version = get_deck_version()
+        self.assertEqual(self.card_names(), ['Карта 0', 'Карта 1', 'Карта 2'])
+
+        card = Card.objects.get(sequence=1)
+        card.name = 'Новое имя'
+        card.save()
+        self.assertNotEqual(get_deck_version(), version)
+        self.assertEqual(self.card_names(), ['Карта 0', 'Новое имя', 'Карта 2'])
+
+    def test_soft_delete_invalidates(self):
+        ids = get_card_ids()
+        self.assertEqual(len(self.card_names()), 3)
+
+        Card.objects.get(sequence=0).delete()
+        self.assertEqual(self.card_names(), ['Карта 1', 'Карта 2'])
+        # Массовое удаление идёт в обход сигналов
+        Card.objects.filter(sequence=1).delete()
+        self.assertEqual(self.card_names(), ['Карта 2'])
+        self.assertEqual(get_card_ids(), ids[2:])
+
+    def test_import_invalidates(self):
+        ids = get_card_ids()
+        self.assertEqual(len(self.card_names()), 3)
+
+        self.import_cards([{'url': 'new-card', 'name': 'Новая', 'sequence': 3, 'cardtype': 'major'}])
+        self.assertEqual(self.card_names(), ['Карта 0', 'Карта 1', 'Карта 2', 'Новая'])
+        self.assertEqual(len(get_card_ids()), len(ids) + 1)
+
+
+class ImportCardsTests(ImportCardsMixin, TestCase):
+    cards = [
+        {'url': 'the_fool', 'name': 'Шут', 'sequence': 0, 'cardtype': 'major', 'desc': 'desc'},
+        {'url': 'ace_of_cups', 'name': 'Туз Кубков', 'sequence': 1, 'cardtype': 'minor', 'desc': 'desc'},
+    ]
+
+    def test_reimport_skips_unchanged(self):
+        self.assertIn('Создано карт: 2, обновлено: 0, без изменений: 0', self.import_cards(self.cards))
+        hashes = dict(Card.objects.values_list('url', 'content_hash'))
+        updated = dict(Card.objects.values_list('url', 'updated_at'))
+
+        self.assertIn('Создано карт: 0, обновлено: 0, без изменений: 2', self.import_cards(self.cards))
+        self.assertEqual(dict(Card.objects.values_list('url', 'updated_at')), updated)
+        self.assertEqual(dict(Card.objects.values_list('url', 'content_hash')), hashes)
+
+        output = self.import_cards(self.cards, '--force')
+        self.assertIn('Создано карт: 0, обновлено: 2, без изменений: 0', output)
+
+    def test_reimport_upserts_changed(self):
+        self.import_cards(self.cards)
+        fool = Card.objects.get(url='the_fool')
+        ace = Card.objects.get(url='ace_of_cups')
+        self.assertEqual(ace.suit, 'cups')
+
+        changed = [{**self.cards[0], 'desc': 'новое описание'}, self.cards[1]]
+        self.assertIn('Создано карт: 0, обновлено: 1, без изменений: 1', self.import_cards(changed))
+        updated = Card.objects.get(url='the_fool')
+        self.assertEqual((updated.id, updated.desc), (fool.id, 'новое описание'))
+        self.assertNotEqual(updated.content_hash, fool.content_hash)
+        self.assertGreater(updated.updated_at, fool.updated_at)
+        self.assertEqual(Card.objects.get(url='ace_of_cups').updated_at, ace.updated_at)
+
+    def test_reimport_restores_deleted(self):
+        self.import_cards(self.cards)
+        Card.objects.get(url='the_fool').delete()
+        # Удалённая карта с теми же данными не пропускается: её нужно вернуть
+        self.import_cards(self.cards)
+        self.assertTrue(Card.objects.filter(url='the_fool').exists())
+        self.assertEqual(Card.all_objects.count(), 2)
+
+
+class CardImageTests(TestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.cache_dir = os.path.join(directory, 'image_cache')
+        override = self.settings(
+            MEDIA_ROOT=os.path.join(directory, 'media'), CARD_IMAGE_CACHE_DIR=self.cache_dir
+        )
+        override.enable()
+        self.addCleanup(override.disable)
+        # Размер дискового кэша процесс держит в памяти
+        image_cache._cache_bytes = None
+
+        os.makedirs(os.path.join(directory, 'media', 'cards'))
+        Image.new('RGB', (200, 340), 'purple').save(os.path.join(directory, 'media', 'cards', 'card.png'))
+        self.card = create_card(0, image='cards/card.png')
+        self.url = f'/api/cards/{self.card.id}/image/'
+
+    def cached_files(self):
+        return sorted(
+            os.path.join(root, name) for root, _, names in os.walk(self.cache_dir) for name in names
+        )
+
+    def test_image(self):
+        response = self.client.get(self.url, {'w': 100, 'fmt': 'png'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'image/png')
+        with Image.open(io.BytesIO(b''.join(response.streaming_content))) as image:
+            self.assertEqual(image.size, (100, 170))
+
+        # Повторный запрос отдаётся из кэша с тем же ETag
+        self.assertEqual(self.client.get(self.url, {'w': 100, 'fmt': 'png'})['ETag'], response['ETag'])
+        self.assertEqual(len(self.cached_files()), 1)
+
+    def test_not_modified(self):
+        etag = self.client.get(self.url, {'fmt': 'png'})['ETag']
+        response = self.client.get(self.url, {'fmt': 'png'}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+    def test_range(self):
+        full = b''.join(self.client.get(self.url, {'fmt': 'png'}).streaming_content)
+
+        response = self.client.get(self.url, {'fmt': 'png'}, HTTP_RANGE='bytes=10-19')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response.content, full[10:20])
+        self.assertEqual(response['Content-Range'], f'bytes 10-19/{len(full)}')
+
+        response = self.client.get(self.url, {'fmt': 'png'}, HTTP_RANGE='bytes=-5')
+        self.assertEqual(response.content, full[-5:])
+
+        response = self.client.get(self.url, {'fmt': 'png'}, HTTP_RANGE=f'bytes={len(full)}-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], f'bytes */{len(full)}')
+
+        # Устаревший If-Range — диапазон игнорируется
+        response = self.client.get(self.url, {'fmt': 'png'}, HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE='"old"')
+        self.assertEqual(response.status_code, 200)
+
+    def test_bad_params(self):
+        self.assertEqual(self.client.get(self.url, {'fmt': 'gif'}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'w': 0}).status_code, 400)
+        self.assertEqual(self.client.get(f'/api/cards/{self.card.id + 1}/image/').status_code, 404)
+
+    def test_manifest_rendition(self):
+        manifest = {'cards': {'cards/card.png': build_renditions('cards/card.png', 'hash')}}
+        save_manifest(manifest)
+        full = manifest['cards']['cards/card.png']['renditions']['full']
+
+        response = self.client.get(self.url)
+        self.assertEqual(response['ETag'], f'"{full["hash"]}"')
+        self.assertEqual(self.cached_files(), [])
+
+    def test_manifest_reloaded_on_change(self):
+        save_manifest({'cards': {'a': 1}})
+        self.assertEqual(get_manifest(), {'cards': {'a': 1}})
+        self.assertIs(get_manifest(), get_manifest())
+
+        save_manifest({'cards': {'b': 2}})
+        path = os.path.join(settings.MEDIA_ROOT, 'renditions', 'manifest.json')
+        stat = os.stat(path)
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+        self.assertEqual(get_manifest(), {'cards': {'b': 2}})
+
+    def test_hit_refreshes_mtime(self):
+        self.client.get(self.url, {'w': 50, 'fmt': 'png'})
+        [path] = self.cached_files()
+        os.utime(path, (0, 0))
+        self.client.get(self.url, {'w': 50, 'fmt': 'png'})
+        self.assertGreater(os.stat(path).st_mtime, 0)
+
+    def test_lru_eviction(self):
+        paths = []
+        now = time.time()
+        for number in range(10):
+            path = os.path.join(self.cache_dir, f'{number:02}', f'{number:02}.png')
+            os.makedirs(os.path.dirname(path))
+            with open(path, 'wb') as f:
+                f.write(b'x' * 1000)
+            os.utime(path, (now - 100 + number, now - 100 + number))
+            paths.append(path)
+        # Первый файл недавно отдавался
+        os.utime(paths[0], (now, now))
+
+        with mock.patch.object(image_cache.os, 'walk', wraps=os.walk) as walk:
+            image_cache._account(1000, 9500, keep=paths[9])
+            # Пока размер в пределах лимита, каталог не обходится
+            image_cache._account(1000, 9500, keep=paths[9])
+        self.assertEqual(walk.call_count, 1)
+
+        # Кэш очищен до 90% лимита, начиная с давно не использованных
+        self.assertEqual(self.cached_files(), [paths[0]] + paths[3:])
+        self.assertEqual(image_cache._cache_bytes, 9000)
+
+
+class CardFormatTests(CardsTestCase):
+    url = '/api/cards/'
+
+    @classmethod
+    def setUpTestData(cls):
+        for sequence in range(4):
+            create_card(sequence, cardtype='minor', suit='cups' if sequence % 2 else 'wands')
+
+    def get(self, url=None, params=None, **headers):
+        return self.client.get(url or self.url, params, headers={'Accept': 'application/json', **headers})
+
+    def test_fields(self):
+        response = self.get(params={'fields': 'name,id'})
+        self.assertEqual(response.json()[0], {'id': Card.objects.first().id, 'name': 'Карта 0'})
+        # Порядок полей в запросе не важен
+        self.assertEqual(self.get(params={'fields': 'id,name'}).content, response.content)
+
+        cards = self.get('/api/cards/random/', {'count': 2, 'fields': 'id'}).json()
+        self.assertEqual([set(card) for card in cards], [{'id'}, {'id'}])
+
+        response = self.get(params={'fields': 'id,secret'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {'error': 'Неизвестные поля: secret'})
+
+    def test_filters(self):
+        self.assertEqual(self.card_names(suit='cups'), ['Карта 1', 'Карта 3'])
+        self.assertEqual(self.card_names(cardtype='major'), [])
+        self.assertEqual(self.get(params={'suit': 'clubs'}).status_code, 400)
+
+        # Подмножества колоды кэшируются отдельно
+        cups = set(Card.objects.filter(suit='cups').values_list('id', flat=True))
+        self.assertEqual(set(get_card_ids({'suit': 'cups'})), cups)
+        self.assertEqual(len(get_card_ids()), 4)
+        cards = self.get('/api/cards/random/', {'count': 2, 'suit': 'cups', 'fields': 'id'}).json()
+        self.assertEqual({card['id'] for card in cards}, cups)
+        self.assertEqual(self.get('/api/cards/random/', {'count': 3, 'suit': 'cups'}).status_code, 404)
+
+    def test_quality_list(self):
+        self.assertEqual(parse_quality_list('gzip, br;q=0.8, deflate;q=0'), {'gzip': 1.0, 'br': 0.8})
+        self.assertEqual(parse_quality_list('br;q=x, GZIP'), {'gzip': 1.0})
+        self.assertEqual(parse_quality_list(''), {})
+
+    def test_accepted_encoding(self):
+        factory = RequestFactory()
+        for header, expected in [
+            ('gzip, br', 'br'),
+            ('gzip', 'gzip'),
+            ('br;q=0, gzip', 'gzip'),
+            ('deflate', None),
+            ('', None),
+        ]:
+            request = factory.get('/', headers={'Accept-Encoding': header})
+            self.assertEqual(accepted_encoding(request), expected, header)
+
+    def test_compression(self):
+        plain = self.get()
+        self.assertNotIn('Content-Encoding', plain)
+        self.assertIn('Accept-Encoding', plain['Vary'])
+
+        response = self.get(**{'Accept-Encoding': 'gzip'})
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(response.content), plain.content)
+        self.assertEqual(response['Content-Length'], str(len(response.content)))
+
+        response = self.get(**{'Accept-Encoding': 'gzip, br'})
+        self.assertEqual(response['Content-Encoding'], 'br')
+        self.assertEqual(brotli.decompress(response.content), plain.content)
+
+        # Остальные ответы API сжимает middleware
+        response = self.get('/api/cards/changes/', **{'Accept-Encoding': 'gzip'})
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(json.loads(gzip.decompress(response.content))['full'], True)
+
+    def test_messagepack(self):
+        data = self.get().json()
+        response = self.get(Accept='application/msgpack')
+        self.assertEqual(response['Content-Type'], 'application/msgpack')
+        self.assertEqual(msgpack.unpackb(response.content), data)
+
+        # Предпочтение по q: MessagePack, JSON как запасной вариант — и наоборот
+        response = self.get(Accept='application/msgpack, application/json;q=0.9')
+        self.assertEqual(response['Content-Type'], 'application/msgpack')
+        response = self.get(Accept='application/json, application/msgpack;q=0.5')
+        self.assertEqual(response['Content-Type'], 'application/json')
+
+        response = self.get(Accept='application/msgpack', **{'Accept-Encoding': 'gzip'})
+        self.assertEqual(msgpack.unpackb(gzip.decompress(response.content)), data)
+
+    def test_async_renderer_selection(self):
+        factory = RequestFactory()
+        for header, expected in [
+            ('application/msgpack', 'msgpack'),
+            ('application/msgpack, application/json;q=0.9', 'msgpack'),
+            ('application/json, application/msgpack;q=0.5', 'json'),
+            ('*/*', 'json'),
+        ]:
+            request = factory.get('/', headers={'Accept': header})
+            self.assertEqual(select_renderer(request).format, expected, header)
+
+
+class CardChangesTests(CardsTestCase):
+    url = '/api/cards/changes/'
+
+    @classmethod
+    def setUpTestData(cls):
+        for sequence in range(5):
+            create_card(sequence)
+
+    def test_cursor_round_trip(self):
+        card = Card.objects.first()
+        self.assertEqual(decode_change_cursor(encode_change_cursor(card)), (card.updated_at, card.id))
+        self.assertIsNone(decode_change_cursor('broken'))
+
+    def test_changes_since_cursor(self):
+        data = self.client.get(self.url).json()
+        self.assertTrue(data['full'])
+        self.assertEqual(len(data['changed']), 5)
+        self.assertEqual(data['deck_version'], get_deck_version())
+
+        # После курсора приходят только изменения, включая удалённые карты
+        first, second = Card.objects.all()[:2]
+        first.desc = 'new desc'
+        first.save()
+        second.delete()
+        data = self.client.get(self.url, {'since': data['cursor']}).json()
+        self.assertFalse(data['full'])
+        self.assertEqual([card['id'] for card in data['changed']], [first.id])
+        self.assertEqual(data['changed'][0]['desc'], 'new desc')
+        self.assertEqual(data['deleted'], [second.id])
+
+        data = self.client.get(self.url, {'since': data['cursor']}).json()
+        self.assertEqual((data['changed'], data['deleted']), ([], []))
+
+    def test_full_sync_skips_deleted(self):
+        Card.objects.filter(sequence=0).delete()
+        data = self.client.get(self.url, {'fields': 'id,name'}).json()
+        self.assertEqual([card['name'] for card in data['changed']], [f'Карта {n}' for n in range(1, 5)])
+        self.assertEqual(data['deleted'], [])
+
+    def test_bad_cursor(self):
+        self.assertEqual(self.client.get(self.url, {'since': 'broken'}).status_code, 400)
@@ -1,7 +1,13 @@
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import async_views, views
+
+# Под ASGI (ASYNC_API=True) списки и случайные карты отдают асинхронные представления
+api_views = async_views if settings.ASYNC_API else views
 
 urlpatterns = [
-    path('', views.card_list, name='card-list'),
-    path('random/', views.random_card, name='random-card'),
+    path('', api_views.card_list, name='card-list'),
+    path('random/', api_views.random_card, name='random-card'),
+    path('changes/', api_views.card_changes, name='card-changes'),
+    path('<int:pk>/image/', views.card_image, name='card-image'),
 ]
@@ -1,22 +1,258 @@
-from rest_framework.decorators import api_view
+import base64
+import os
+from datetime import datetime
+
+from django.conf import settings
+from django.http import FileResponse, Http404, HttpResponse, JsonResponse
+from django.db.models import Q
+from django.shortcuts import get_object_or_404
+from django.views.decorators.http import require_safe
+from rest_framework.decorators import api_view, renderer_classes
 from rest_framework.response import Response
-from .models import Card
+from mystratarotbot.compression import accepted_encoding, set_content_encoding
+from .cache import draw_cards, get_card_list_content, get_deck_version
+from .image_cache import FORMATS, get_card_image
+from .models import CARD_TYPES, SUITS, Card
+from .renderers import API_RENDERERS
 from .serializers import CardSerializer
-import random
+
+# Максимум карт за один запрос random_card
+MAX_RANDOM_CARDS = 78
+
+def parse_fields(params):
+    """Разбирает ?fields=id,name; возвращает (кортеж полей или None, ошибка)"""
+    value = params.get('fields')
+    if not value:
+        return None, None
+    requested = {name.strip() for name in value.split(',') if name.strip()}
+    unknown = requested - set(CardSerializer.Meta.fields)
+    if unknown:
+        return None, f"Неизвестные поля: {', '.join(sorted(unknown))}"
+    # Порядок как в сериализаторе — одинаковые наборы полей дают один ключ кэша
+    return tuple(name for name in CardSerializer.Meta.fields if name in requested), None
+
+
+def parse_card_filters(params):
+    """Разбирает фильтры cardtype и suit; возвращает (словарь фильтров, ошибка)"""
+    filters = {}
+    for name, choices in (('cardtype', CARD_TYPES), ('suit', SUITS)):
+        value = params.get(name)
+        if not value:
+            continue
+        if value not in dict(choices):
+            return None, f"{name} должен быть одним из: {', '.join(dict(choices))}"
+        filters[name] = value
+    return filters, None
+
+
+def parse_list_params(params):
+    """Разбирает fields и фильтры; возвращает (поля, фильтры, ошибка)"""
+    fields, error = parse_fields(params)
+    if error:
+        return None, None, error
+    filters, error = parse_card_filters(params)
+    return fields, filters, error
+
+
+def card_list_response(content, renderer, deck_version, encoding):
+    response = HttpResponse(content, content_type=renderer.media_type)
+    response['X-Deck-Version'] = deck_version
+    set_content_encoding(response, encoding)
+    return response
+
 
 @api_view(['GET'])
+@renderer_classes(API_RENDERERS)
 def card_list(request):
-    """Возвращает все карты"""
-    cards = Card.objects.all()
-    serializer = CardSerializer(cards, many=True, context={'request': request})
-    return Response(serializer.data)
+    """Возвращает все карты (fields — только указанные поля, cardtype/suit — фильтры)"""
+    fields, filters, error = parse_list_params(request.query_params)
+    if error:
+        return Response({"error": error}, status=400)
+
+    deck_version = get_deck_version()
+    renderer = request.accepted_renderer
+    encoding = accepted_encoding(request)
+    content = get_card_list_content(request, renderer, fields, filters, encoding)
+    return card_list_response(content, renderer, deck_version, encoding)
+
+def encode_change_cursor(card):
+    """Курсор изменений указывает на последнюю отданную карту: (updated_at, id)"""
+    raw = f'{card.updated_at.isoformat()}|{card.id}'
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_change_cursor(cursor):
+    try:
+        updated_at, card_id = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+        return datetime.fromisoformat(updated_at), int(card_id)
+    except (ValueError, UnicodeError):
+        return None
+
+
+def parse_changes_params(params):
+    """Разбирает since и fields; возвращает (позиция или None, поля, ошибка)"""
+    fields, error = parse_fields(params)
+    if error:
+        return None, None, error
+    position = None
+    if params.get('since'):
+        position = decode_change_cursor(params['since'])
+        if position is None:
+            return None, None, "Некорректный since"
+    return position, fields, None
+
+
+def changes_queryset(position, fields):
+    queryset = Card.all_objects.order_by('updated_at', 'id')
+    if fields:
+        # Курсору и отметкам об удалении эти поля нужны независимо от fields
+        queryset = queryset.only(*fields, 'updated_at', 'is_deleted')
+    if position is not None:
+        updated_at, card_id = position
+        queryset = queryset.filter(
+            Q(updated_at__gt=updated_at) | Q(updated_at=updated_at, id__gt=card_id)
+        )
+    return queryset
+
+
+def changes_data(request, cards, since, fields, deck_version):
+    """Изменённые и удалённые карты после курсора since; без since — вся колода"""
+    changed = [card for card in cards if not card.is_deleted]
+    return {
+        'cursor': encode_change_cursor(cards[-1]) if cards else since,
+        'deck_version': deck_version,
+        'full': since is None,
+        'changed': CardSerializer(changed, many=True, fields=fields, context={'request': request}).data,
+        # При полной выгрузке удалённые карты клиенту не нужны
+        'deleted': [card.id for card in cards if card.is_deleted] if since else [],
+    }
+
+
+def parse_random_params(params):
+    """Разбирает count и distinct для random_card; возвращает (count, distinct, ошибка)"""
+    count = params.get('count')
+    distinct = params.get('distinct', 'true').lower() not in ('false', '0')
+    if count is not None and not (count.isdigit() and 1 <= int(count) <= MAX_RANDOM_CARDS):
+        return None, distinct, f"count должен быть числом от 1 до {MAX_RANDOM_CARDS}"
+    return count and int(count), distinct, None
+
+
+def parse_random_request(params):
+    """Все параметры random_card; возвращает (count, distinct, поля, фильтры, ошибка)"""
+    count, distinct, error = parse_random_params(params)
+    if error:
+        return None, None, None, None, error
+    fields, filters, error = parse_list_params(params)
+    return count, distinct, fields, filters, error
+
+
+def random_card_data(request, cards, count, fields):
+    """Тело и статус ответа random_card; cards=None — карт не хватило"""
+    if cards is None:
+        return {"error": "Нет карт в базе" if count is None else "Недостаточно карт"}, 404
+    context = {'request': request}
+    if count is None:
+        return CardSerializer(cards[0], fields=fields, context=context).data, 200
+    return CardSerializer(cards, many=True, fields=fields, context=context).data, 200
+
 
 @api_view(['GET'])
+@renderer_classes(API_RENDERERS)
 def random_card(request):
-    """Возвращает случайную карту"""
-    cards = Card.objects.all()
-    if not cards.exists():
-        return Response({"error": "Нет карт в базе"}, status=404)
-    card = random.choice(cards)
-    serializer = CardSerializer(card, context={'request': request})
-    return Response(serializer.data)
+    """Возвращает случайную карту или список из count карт (distinct=false — с повторами)"""
+    count, distinct, fields, filters, error = parse_random_request(request.query_params)
+    if error:
+        return Response({"error": error}, status=400)
+
+    cards = draw_cards(count or 1, distinct=distinct, only=fields, filters=filters)
+    data, status = random_card_data(request, cards, count, fields)
+    return Response(data, status=status)
+
+
+def _parse_range(header, size):
+    """Разбирает заголовок Range с одним диапазоном.
+
+    Возвращает (start, end), None — если заголовок нужно проигнорировать,
+    False — если диапазон невыполним.
+    """
+    unit, _, spec = header.partition('=')
+    if unit.strip() != 'bytes' or ',' in spec:
+        return None
+    start, _, end = spec.strip().partition('-')
+    try:
+        if not start:
+            length = int(end)
+            if length <= 0:
+                return False
+            return max(size - length, 0), size - 1
+        start = int(start)
+        end = min(int(end), size - 1) if end else size - 1
+    except ValueError:
+        return None
+    if start >= size or start > end:
+        return False
+    return start, end
+
+
+@api_view(['GET'])
+@renderer_classes(API_RENDERERS)
+def card_changes(request):
+    """Карты, изменённые или удалённые после курсора since, и новый курсор"""
+    position, fields, error = parse_changes_params(request.query_params)
+    if error:
+        return Response({"error": error}, status=400)
+
+    deck_version = get_deck_version()
+    cards = list(changes_queryset(position, fields))
+    since = request.query_params.get('since') or None
+    return Response(changes_data(request, cards, since, fields, deck_version))
+
+
+@require_safe
+def card_image(request, pk):
+    """Возвращает изображение карты нужной ширины (w) и формата (fmt)"""
+    fmt = request.GET.get('fmt', 'webp')
+    width = request.GET.get('w')
+    if fmt not in FORMATS:
+        return JsonResponse({"error": f"fmt должен быть одним из: {', '.join(FORMATS)}"}, status=400)
+    if width is not None and not (width.isdigit() and 1 <= int(width) <= settings.CARD_IMAGE_MAX_WIDTH):
+        return JsonResponse(
+            {"error": f"w должен быть числом от 1 до {settings.CARD_IMAGE_MAX_WIDTH}"}, status=400
+        )
+
+    card = get_object_or_404(Card.objects.only('image'), pk=pk)
+    if not card.image:
+        raise Http404("У карты нет изображения")
+    try:
+        path, content_hash = get_card_image(card, int(width) if width else None, fmt)
+    except FileNotFoundError:
+        raise Http404("Файл изображения не найден")
+
+    content_type = FORMATS[fmt][1]
+    etag = f'"{content_hash}"'
+    headers = {
+        'ETag': etag,
+        'Cache-Control': 'public, max-age=86400',
+        'Accept-Ranges': 'bytes',
+    }
+    if etag in request.headers.get('If-None-Match', ''):
+        return HttpResponse(status=304, headers=headers)
+
+    size = os.path.getsize(path)
+    byte_range = None
+    if 'Range' in request.headers and request.headers.get('If-Range', etag) == etag:
+        byte_range = _parse_range(request.headers['Range'], size)
+    if byte_range is False:
+        return HttpResponse(status=416, headers={**headers, 'Content-Range': f'bytes */{size}'})
+    if byte_range:
+        start, end = byte_range
+        with open(path, 'rb') as f:
+            f.seek(start)
+            content = f.read(end - start + 1)
+        return HttpResponse(
+            content,
+            status=206,
+            content_type=content_type,
+            headers={**headers, 'Content-Range': f'bytes {start}-{end}/{size}'},
+        )
+    return FileResponse(open(path, 'rb'), content_type=content_type, headers=headers)
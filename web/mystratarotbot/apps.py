@@ -0,0 +1,13 @@
+from django.apps import AppConfig
+
+
+class MystratarotbotConfig(AppConfig):
+    name = 'mystratarotbot'
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+        from .db import configure_connection
+        from .profiling import install_query_recorder
+
+        connection_created.connect(configure_connection)
+        connection_created.connect(install_query_recorder)
@@ -0,0 +1,85 @@
+import gzip
+
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+
+try:
+    import brotli
+except ImportError:  # без пакета brotli отдаём только gzip
+    brotli = None
+
+# Сжимаем только ответы API; изображения уже сжаты
+COMPRESSIBLE_TYPES = ('application/json', 'application/msgpack')
+MIN_COMPRESS_LENGTH = 200
+
+
+def parse_quality_list(value):
+    """Разбирает заголовок вида "gzip, br;q=0.8" в {значение: q}; значения с q=0 отбрасываются"""
+    result = {}
+    for part in value.split(','):
+        token, *params = part.split(';')
+        token = token.strip().lower()
+        if not token:
+            continue
+        quality = 1.0
+        for param in params:
+            name, _, raw = param.strip().partition('=')
+            if name == 'q':
+                try:
+                    quality = float(raw)
+                except ValueError:
+                    quality = 0.0
+        if quality > 0:
+            result[token] = quality
+    return result
+
+
+def accepted_encoding(request):
+    """Выбирает сжатие по Accept-Encoding: br, если доступен, иначе gzip; None — без сжатия"""
+    accepted = parse_quality_list(request.headers.get('Accept-Encoding', ''))
+    if brotli is not None and 'br' in accepted:
+        return 'br'
+    if 'gzip' in accepted:
+        return 'gzip'
+    return None
+
+
+def compress(content, encoding):
+    if encoding == 'br':
+        return brotli.compress(content, quality=5)
+    return gzip.compress(content, compresslevel=6, mtime=0)
+
+
+def set_content_encoding(response, encoding):
+    """Проставляет заголовки для уже сжатого содержимого ответа"""
+    patch_vary_headers(response, ('Accept-Encoding',))
+    if encoding:
+        response['Content-Encoding'] = encoding
+        response['Content-Length'] = str(len(response.content))
+
+
+class CompressionMiddleware(MiddlewareMixin):
+    """Сжимает JSON и MessagePack ответы API (brotli или gzip)"""
+
+    def process_response(self, request, response):
+        if response.streaming or response.has_header('Content-Encoding'):
+            return response
+        content_type = response.get('Content-Type', '').split(';')[0].strip()
+        if content_type not in COMPRESSIBLE_TYPES:
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = accepted_encoding(request)
+        if encoding is None or len(response.content) < MIN_COMPRESS_LENGTH:
+            return response
+
+        compressed = compress(response.content, encoding)
+        if len(compressed) >= len(response.content):
+            return response
+        response.content = compressed
+        set_content_encoding(response, encoding)
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            # Сжатое представление не совпадает побайтно с исходным
+            response['ETag'] = 'W/' + etag
+        return response
@@ -0,0 +1,10 @@
+from django.conf import settings
+
+
+def configure_connection(sender, connection, **kwargs):
+    """Применяет PRAGMA из SQLITE_PRAGMAS к каждому новому соединению SQLite"""
+    if connection.vendor != 'sqlite' or settings.DB_PROFILE != 'tuned':
+        return
+    with connection.cursor() as cursor:
+        for name, value in settings.SQLITE_PRAGMAS.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
@@ -0,0 +1,106 @@
+import json
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Спаны, из которых складывается время расклада: API (вместе с сетью), рендер, Telegram
+STAGES = (
+    ('api', 'api.'),
+    ('django', 'view.'),
+    ('render', 'render'),
+    ('telegram', 'telegram.'),
+)
+
+
+def load_traces(path):
+    traces = defaultdict(list)
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                span = json.loads(line)
+            except ValueError:
+                # Строка, недописанная при остановке процесса
+                continue
+            traces[span['trace_id']].append(span)
+    return traces
+
+
+def breakdown(spans):
+    """Сумма времени по этапам; network — время запросов к API сверх работы Django"""
+    totals = {stage: 0.0 for stage, _ in STAGES}
+    total = None
+    for span in spans:
+        if span['service'] == 'bot' and span['name'] == 'update':
+            total = span['duration_ms']
+            continue
+        for stage, prefix in STAGES:
+            if span['name'].startswith(prefix):
+                totals[stage] += span['duration_ms']
+                break
+    totals['network'] = max(totals['api'] - totals['django'], 0.0)
+    if total is not None:
+        totals['other'] = max(total - totals['api'] - totals['render'] - totals['telegram'], 0.0)
+    return total, totals
+
+
+class Command(BaseCommand):
+    help = (
+        'Собирает спаны бота и API из TRACE_FILE: без аргументов показывает самые медленные '
+        'апдейты, с trace id — полную хронологию одного расклада.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('trace_id', nargs='?', help='Trace id из логов бота или заголовка X-Trace-Id')
+        parser.add_argument('--file', default=settings.TRACE_FILE, help='JSONL-файл со спанами')
+        parser.add_argument('--slowest', type=int, default=10, help='Сколько медленных апдейтов показать')
+
+    def handle(self, *args, **options):
+        if not options['file']:
+            raise CommandError('Файл спанов не задан: укажите --file или TRACE_FILE')
+        try:
+            traces = load_traces(options['file'])
+        except OSError as e:
+            raise CommandError(f'Не удалось прочитать {options["file"]}: {e}')
+
+        if options['trace_id']:
+            spans = traces.get(options['trace_id'])
+            if not spans:
+                raise CommandError(f'Trace {options["trace_id"]} не найден')
+            self.show_trace(spans)
+        else:
+            self.show_slowest(traces, options['slowest'])
+
+    def show_trace(self, spans):
+        spans = sorted(spans, key=lambda span: span['start'])
+        origin = spans[0]['start']
+        for span in spans:
+            extra = {
+                key: value for key, value in span.items()
+                if key not in ('trace_id', 'service', 'name', 'start', 'duration_ms')
+            }
+            offset = (span['start'] - origin) * 1000
+            self.stdout.write(
+                f"+{offset:9.1f} ms {span['duration_ms']:9.1f} ms  {span['service']:<6} "
+                f"{span['name']:<28} {json.dumps(extra, ensure_ascii=False) if extra else ''}"
+            )
+
+        total, totals = breakdown(spans)
+        if total is not None:
+            self.stdout.write(f'Всего: {total:.1f} ms')
+        self.stdout.write(', '.join(f'{stage}: {value:.1f} ms' for stage, value in totals.items()))
+
+    def show_slowest(self, traces, limit):
+        rows = []
+        for trace_id, spans in traces.items():
+            total, totals = breakdown(spans)
+            if total is not None:
+                rows.append((total, trace_id, totals))
+        rows.sort(reverse=True)
+
+        self.stdout.write(f'Апдейтов в файле: {len(rows)}')
+        for total, trace_id, totals in rows[:limit]:
+            self.stdout.write(
+                f'{trace_id}  {total:9.1f} ms  '
+                + '  '.join(f'{stage} {value:.1f}' for stage, value in totals.items())
+            )
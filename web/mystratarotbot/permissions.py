@@ -0,0 +1,20 @@
+import hmac
+
+from django.conf import settings
+
+# Заголовок с общим секретом бота (BOT_API_TOKEN в настройках Django и бота)
+BOT_TOKEN_HEADER = 'HTTP_X_BOT_TOKEN'
+# Ответ закрытых эндпоинтов (личные данные пользователей и рассылки) на чужой запрос
+BOT_ONLY_ERROR = {"error": "Доступ только для бота"}
+
+
+def is_bot_request(request):
+    """Запрос пришёл от бота: X-Bot-Token совпадает с BOT_API_TOKEN.
+
+    Без BOT_API_TOKEN закрытые эндпоинты доступны только при DEBUG.
+    """
+    if not settings.BOT_API_TOKEN:
+        return settings.DEBUG
+    token = request.META.get(BOT_TOKEN_HEADER, '')
+    return hmac.compare_digest(token.encode(), settings.BOT_API_TOKEN.encode())
+
@@ -0,0 +1,150 @@
+import contextvars
+import cProfile
+import os
+import random
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from prometheus_client import Counter, Histogram
+
+# Статистика текущего запроса; contextvar переходит и в потоки sync_to_async,
+# поэтому запросы async-представлений тоже учитываются
+_request_stats = contextvars.ContextVar('request_stats', default=None)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+VIEW_LATENCY = Histogram(
+    'django_view_seconds', 'Время обработки запроса', ['view', 'method'], buckets=LATENCY_BUCKETS,
+)
+VIEW_DB_QUERIES = Histogram(
+    'django_view_db_queries', 'SQL-запросов на один запрос к API', ['view'], buckets=QUERY_BUCKETS,
+)
+VIEW_DB_SECONDS = Histogram(
+    'django_view_db_seconds', 'Время SQL-запросов на один запрос к API', ['view'], buckets=LATENCY_BUCKETS,
+)
+VIEW_RESPONSES = Counter(
+    'django_view_responses_total', 'Ответы по коду статуса', ['view', 'method', 'status'],
+)
+
+
+class RequestStats:
+    __slots__ = ('queries', 'db_time')
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+
+
+def record_query(execute, sql, params, many, context):
+    """execute_wrapper для всех соединений: считает запросы и их время в текущем запросе"""
+    stats = _request_stats.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.queries += 1
+        stats.db_time += time.perf_counter() - start
+
+
+def install_query_recorder(sender, connection, **kwargs):
+    """Подключает record_query к каждому новому соединению с БД"""
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, record_query)
+
+
+def _view_name(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unmatched'
+    return match.view_name or match.route
+
+
+class _Profile:
+    """Профиль выборки запросов: cProfile или pyinstrument (если установлен)"""
+
+    def __init__(self):
+        self.profiler = None
+        if settings.PROFILE_SAMPLE_RATE <= 0 or random.random() >= settings.PROFILE_SAMPLE_RATE:
+            return
+        if settings.PROFILER == 'pyinstrument':
+            from pyinstrument import Profiler
+
+            self.profiler = Profiler(async_mode='enabled')
+            self.profiler.start()
+        else:
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+
+    def stop(self, request, elapsed):
+        if self.profiler is None:
+            return
+        name = f"{_view_name(request).replace('/', '_')}-{time.strftime('%Y%m%d%H%M%S')}-{elapsed * 1000:.0f}ms"
+        os.makedirs(settings.PROFILE_DIR, exist_ok=True)
+        path = os.path.join(settings.PROFILE_DIR, name)
+        if settings.PROFILER == 'pyinstrument':
+            self.profiler.stop()
+            with open(f'{path}.html', 'w', encoding='utf-8') as f:
+                f.write(self.profiler.output_html())
+        else:
+            self.profiler.disable()
+            self.profiler.dump_stats(f'{path}.prof')
+
+
+class ProfilingMiddleware:
+    """Время запроса, число и время SQL-запросов по представлениям.
+
+    Пишет метрики для /metrics, добавляет заголовок Server-Timing и при
+    PROFILE_SAMPLE_RATE > 0 сохраняет профиль доли запросов в PROFILE_DIR.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        stats, token, profile, start = self._start()
+        try:
+            response = self.get_response(request)
+        finally:
+            _request_stats.reset(token)
+        return self._finish(request, response, stats, profile, start)
+
+    async def __acall__(self, request):
+        stats, token, profile, start = self._start()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _request_stats.reset(token)
+        return self._finish(request, response, stats, profile, start)
+
+    def _start(self):
+        stats = RequestStats()
+        token = _request_stats.set(stats)
+        return stats, token, _Profile(), time.perf_counter()
+
+    def _finish(self, request, response, stats, profile, start):
+        elapsed = time.perf_counter() - start
+        profile.stop(request, elapsed)
+
+        view = _view_name(request)
+        if view != 'metrics':
+            VIEW_LATENCY.labels(view, request.method).observe(elapsed)
+            VIEW_DB_QUERIES.labels(view).observe(stats.queries)
+            VIEW_DB_SECONDS.labels(view).observe(stats.db_time)
+            VIEW_RESPONSES.labels(view, request.method, str(response.status_code)).inc()
+
+        response['Server-Timing'] = (
+            f'app;dur={elapsed * 1000:.1f}, '
+            f'db;dur={stats.db_time * 1000:.1f};desc="{stats.queries} queries"'
+        )
+        return response
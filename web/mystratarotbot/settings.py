@@ -33,8 +33,8 @@ if DEBUG:
     # локальная разработка
     ALLOWED_HOSTS = ["*"]
 else:
-    # продакшен
-    ALLOWED_HOSTS = ["103.71.20.245"]
+    # продакшен; ALLOWED_HOSTS через запятую, например для локального benchmark_api
+    ALLOWED_HOSTS = os.getenv("ALLOWED_HOSTS", "103.71.20.245").split(",")
 
 # Application definition
 
@@ -48,10 +48,19 @@ INSTALLED_APPS = [
     'rest_framework',
     'cards',
     'users',
+    'spreads',
+    'stats',
+    'mystratarotbot',
 ]
 
 MIDDLEWARE = [
+    # Время, число SQL-запросов и Server-Timing по представлениям (см. /metrics)
+    'mystratarotbot.profiling.ProfilingMiddleware',
+    # Trace id от бота (X-Trace-Id) в логах и спанах TRACE_FILE
+    'mystratarotbot.tracing.TraceMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    # Сжатие ответов API (brotli/gzip) — раньше остальных, чтобы видеть готовый ответ
+    'mystratarotbot.compression.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -79,6 +88,52 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'mystratarotbot.wsgi.application'
 
+# Асинхронные представления API (async ORM) вместо DRF — только при запуске под ASGI:
+# uvicorn mystratarotbot.asgi:application --workers 2
+ASYNC_API = os.getenv("ASYNC_API") == "True"
+
+# Общий секрет бота (заголовок X-Bot-Token) для эндпоинтов с личными данными
+# пользователей; без него они доступны только при DEBUG
+BOT_API_TOKEN = os.getenv("BOT_API_TOKEN", "")
+
+# /metrics отдаётся запросам с X-Bot-Token (в Prometheus — http_headers) и адресам
+# из этого списка через запятую. За обратным прокси REMOTE_ADDR — адрес прокси,
+# поэтому тогда /metrics не стоит проксировать наружу
+METRICS_ALLOWED_IPS = [ip.strip() for ip in os.getenv("METRICS_ALLOWED_IPS", "").split(",") if ip.strip()]
+
+# Обновлять сводку использования раскладов при каждом запросе; при False —
+# только командой compact_usage_stats (например, из cron раз в час)
+STATS_INCREMENTAL = os.getenv("STATS_INCREMENTAL", "True") == "True"
+
+# Профилирование доли запросов (0.01 — каждый сотый) в PROFILE_DIR:
+# cprofile — файлы .prof для snakeviz/pstats, pyinstrument — HTML (пакет ставится отдельно)
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILER = os.getenv("PROFILER", "cprofile")
+PROFILE_DIR = os.getenv("PROFILE_DIR", BASE_DIR / "profiles")
+
+# Спаны запросов к API в JSONL (общий файл с ботом, см. manage.py show_trace);
+# пусто — не пишутся
+TRACE_FILE = os.getenv("TRACE_FILE", "")
+
+# Логи с trace id запроса, чтобы их можно было сопоставить с логами бота
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'filters': {
+        'trace_id': {'()': 'mystratarotbot.tracing.TraceIdFilter'},
+    },
+    'formatters': {
+        'trace': {'format': '%(asctime)s - %(name)s - %(levelname)s - [%(trace_id)s] %(message)s'},
+    },
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler', 'filters': ['trace_id'], 'formatter': 'trace'},
+    },
+    'loggers': {
+        'django.request': {'handlers': ['console'], 'level': 'WARNING', 'propagate': False},
+        'mystratarotbot': {'handlers': ['console'], 'level': os.getenv('LOG_LEVEL', 'INFO')},
+    },
+}
+
 
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
@@ -94,6 +149,59 @@ DATABASES = {
     }
 }
 
+# Профиль производительности БД: 'tuned' (по умолчанию) или 'default' — без настроек.
+# SQLite: WAL и PRAGMA из SQLITE_PRAGMAS (применяются в mystratarotbot.db при подключении).
+# PostgreSQL: постоянные соединения с проверкой перед использованием; DB_POOL=True
+# включает пул соединений psycopg 3 (psycopg[pool] в requirements.txt).
+DB_PROFILE = os.getenv('DB_PROFILE', 'tuned')
+
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'mmap_size': 256 * 1024 * 1024,
+    'busy_timeout': 5000,
+}
+
+if DB_PROFILE == 'tuned':
+    if DATABASES['default']['ENGINE'] == 'django.db.backends.sqlite3':
+        # Запись сразу берёт блокировку, вместо взаимной блокировки при повышении
+        DATABASES['default']['OPTIONS'] = {'transaction_mode': 'IMMEDIATE'}
+    elif os.getenv('DB_POOL') == 'True':
+        DATABASES['default']['OPTIONS'] = {
+            'pool': {'min_size': 2, 'max_size': int(os.getenv('DB_POOL_MAX_SIZE', '10'))},
+        }
+        DATABASES['default']['CONN_HEALTH_CHECKS'] = True
+    else:
+        DATABASES['default']['CONN_MAX_AGE'] = int(os.getenv('DB_CONN_MAX_AGE', '60'))
+        DATABASES['default']['CONN_HEALTH_CHECKS'] = True
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# Локальная память быстрее, но у каждого процесса свой кэш. Версия колоды
+# выводится из базы и живёт в кэше DECK_VERSION_TTL секунд, поэтому правки из
+# админки и import_cards доходят до всех воркеров не позже чем через это время.
+# Общий кэш (файловый, Redis, база) делит между воркерами и сами данные колоды:
+# CACHE_BACKEND=django.core.cache.backends.filebased.FileBasedCache
+# CACHE_LOCATION=/var/tmp/mystratarotbot_cache
+
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', 'mystratarotbot'),
+    }
+}
+
+DECK_VERSION_TTL = int(os.getenv('DECK_VERSION_TTL', '5'))
+# Сколько живут данные колоды (списки id, тело списка карт): ключи содержат
+# версию, и записи старых версий иначе копились бы в кэше
+DECK_CACHE_TIMEOUT = int(os.getenv('DECK_CACHE_TIMEOUT', str(DECK_VERSION_TTL * 720)))
+
+REST_FRAMEWORK = {
+    # Учитывать q в Accept (бот просит MessagePack с JSON как запасным вариантом)
+    'DEFAULT_CONTENT_NEGOTIATION_CLASS': 'cards.renderers.QualityContentNegotiation',
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -138,4 +246,9 @@ STATIC_ROOT = os.path.join(BASE_DIR, "staticfiles")
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 MEDIA_URL = "/media/"
-MEDIA_ROOT = os.path.join(BASE_DIR, "media")
\ No newline at end of file
+MEDIA_ROOT = os.path.join(BASE_DIR, "media")
+
+# Дисковый кэш уменьшенных изображений карт (/api/cards/<id>/image/)
+CARD_IMAGE_CACHE_DIR = os.getenv("CARD_IMAGE_CACHE_DIR", os.path.join(BASE_DIR, "image_cache"))
+CARD_IMAGE_CACHE_MAX_BYTES = int(os.getenv("CARD_IMAGE_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+CARD_IMAGE_MAX_WIDTH = 2048
\ No newline at end of file
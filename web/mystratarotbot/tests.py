@@ -0,0 +1,148 @@
+import importlib
+import inspect
+import json
+import random
+import sys
+
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.test import TestCase, override_settings
+from django.urls import clear_url_caches
+
+from cards.models import Card
+from users.models import User, UserRequestHistory
+
+TOKEN = 'test-token'
+# Модули, выбирающие представления по ASYNC_API при импорте
+URL_MODULES = ('cards.urls', 'spreads.urls', 'users.urls')
+
+
+def reload_urls():
+    for module in URL_MODULES + (settings.ROOT_URLCONF,):
+        importlib.reload(sys.modules[module])
+    clear_url_caches()
+
+
+def _without_created_at(data):
+    if isinstance(data, dict):
+        return {key: _without_created_at(value) for key, value in data.items() if key != 'created_at'}
+    if isinstance(data, list):
+        return [_without_created_at(item) for item in data]
+    return data
+
+
+@override_settings(BOT_API_TOKEN=TOKEN)
+class AsyncApiParityTests(TestCase):
+    """Асинхронные представления (ASYNC_API=True) отвечают так же, как представления DRF"""
+
+    @classmethod
+    def setUpTestData(cls):
+        for sequence in range(12):
+            Card.objects.create(
+                name=f'Карта {sequence}', url=f'card-{sequence}', image=f'cards/card-{sequence}.jpg',
+                desc='desc', rdesc='rdesc', sequence=sequence,
+                cardtype='major' if sequence < 8 else 'minor', suit=None if sequence < 8 else 'cups',
+            )
+        user = User.objects.create(telegram_id=1, username='first')
+        User.objects.bulk_create(User(telegram_id=telegram_id) for telegram_id in range(2, 8))
+        UserRequestHistory.objects.bulk_create(
+            UserRequestHistory(user=user, request_text=f'Вопрос {number}') for number in range(5)
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(reload_urls)
+
+    def request(self, async_api, method, url, data=None, rollback=True, **extra):
+        extra.setdefault('headers', {'X-Bot-Token': TOKEN, 'Accept': 'application/json'})
+        if method == 'post':
+            data = json.dumps(data)
+            extra['content_type'] = 'application/json'
+        # Каждый режим видит одно и то же состояние базы и тянет те же карты
+        with override_settings(ASYNC_API=async_api), transaction.atomic():
+            reload_urls()
+            random.seed(0)
+            if async_api:
+                response = async_to_sync(getattr(self.async_client, method))(url, data, **extra)
+            else:
+                response = getattr(self.client, method)(url, data, **extra)
+            transaction.set_rollback(rollback)
+        self.assertEqual(inspect.iscoroutinefunction(response.resolver_match.func), async_api, url)
+        return response
+
+    def assertSameResponse(self, method, url, data=None, **extra):
+        responses = [self.request(async_api, method, url, data, **extra) for async_api in (False, True)]
+        sync_response, async_response = responses
+        self.assertEqual(sync_response.status_code, async_response.status_code, url)
+        self.assertEqual(
+            _without_created_at(json.loads(sync_response.content)),
+            _without_created_at(json.loads(async_response.content)),
+            url,
+        )
+        return sync_response
+
+    def test_cards(self):
+        self.assertSameResponse('get', '/api/cards/')
+        self.assertSameResponse('get', '/api/cards/', {'fields': 'id,name', 'suit': 'cups'})
+        self.assertSameResponse('get', '/api/cards/', {'fields': 'nope'})
+        self.assertSameResponse('get', '/api/cards/', {'cardtype': 'x'})
+        self.assertSameResponse('get', '/api/cards/random/', {'count': 99})
+        self.assertSameResponse('get', '/api/cards/random/', {'count': 5, 'suit': 'cups'})
+        self.assertSameResponse('get', '/api/cards/random/', {'count': 12, 'fields': 'id'})
+        response = self.assertSameResponse('get', '/api/cards/changes/')
+        self.assertSameResponse('get', '/api/cards/changes/', {'since': response.json()['cursor']})
+        self.assertSameResponse('get', '/api/cards/changes/', {'since': 'broken'})
+
+    def test_spreads(self):
+        self.assertSameResponse('get', '/api/spreads/draw/', {'type': 'celtic_cross_spread', 'seed': 'x'})
+        self.assertSameResponse(
+            'get', '/api/spreads/draw/', {'type': 'daily_spread', 'seed': 'x', 'telegram_id': 1, 'question': 'Как?'}
+        )
+        self.assertSameResponse('get', '/api/spreads/draw/', {'type': 'major_arcana_spread', 'suit': 'cups'})
+        self.assertSameResponse('get', '/api/spreads/draw/', {'type': 'celtic_cross_spread', 'suit': 'cups'})
+        self.assertSameResponse('get', '/api/spreads/draw/', {'type': 'love_spread'})
+        self.assertSameResponse('get', '/api/spreads/draw/', {'type': 'unknown'})
+
+    def test_users(self):
+        self.assertSameResponse('post', '/api/users/register/', {'telegram_id': 100, 'username': 'new'})
+        self.assertSameResponse('post', '/api/users/register/', {'telegram_id': 1})
+        self.assertSameResponse('post', '/api/users/register/', {'telegram_id': 'x'})
+        self.assertSameResponse('post', '/api/users/requests/', {'telegram_id': 1, 'request_text': 'Вопрос'})
+        self.assertSameResponse('post', '/api/users/requests/', {'telegram_id': 100, 'request_text': 'Вопрос'})
+        self.assertSameResponse('post', '/api/users/requests/', {'request_text': 'Вопрос'})
+        self.assertSameResponse('post', '/api/users/requests/', {'telegram_id': 1})
+
+        response = self.assertSameResponse('get', '/api/users/1/requests/', {'limit': 2})
+        self.assertSameResponse('get', '/api/users/1/requests/', {'cursor': response.json()['next_cursor']})
+        self.assertSameResponse('get', '/api/users/1/requests/', {'limit': 0})
+        self.assertSameResponse('get', '/api/users/100/requests/')
+        self.assertSameResponse('get', '/api/users/1/requests/', headers={'X-Bot-Token': 'wrong'})
+
+        self.assertSameResponse('get', '/api/users/recipients/', {'limit': 3})
+        self.assertSameResponse('get', '/api/users/recipients/', {'after': 3, 'limit': 3})
+        self.assertSameResponse('get', '/api/users/recipients/', {'after': 'x'})
+        self.assertSameResponse('post', '/api/users/blocked/', {'telegram_ids': [2, 3, 100]})
+        self.assertSameResponse('post', '/api/users/blocked/', {'telegram_ids': ['2']})
+        self.assertSameResponse('post', '/api/users/blocked/', {'telegram_ids': [2]}, headers={})
+
+    def test_reregister_unblocks(self):
+        for async_api in (False, True):
+            with self.subTest(async_api=async_api), transaction.atomic():
+                User.objects.filter(telegram_id=1).update(blocked_at='2026-01-01T00:00:00Z')
+                self.request(async_api, 'post', '/api/users/register/', {'telegram_id': 1}, rollback=False)
+                self.assertIsNone(User.objects.get(telegram_id=1).blocked_at)
+                transaction.set_rollback(True)
+
+
+@override_settings(BOT_API_TOKEN=TOKEN, METRICS_ALLOWED_IPS=['10.0.0.5'])
+class MetricsAccessTests(TestCase):
+    def test_requires_token_or_allowed_address(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 403)
+        self.assertEqual(self.client.get('/metrics', headers={'X-Bot-Token': 'wrong'}).status_code, 403)
+
+        response = self.client.get('/metrics', headers={'X-Bot-Token': TOKEN})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'# TYPE', response.content)
+        self.assertEqual(self.client.get('/metrics', REMOTE_ADDR='10.0.0.5').status_code, 200)
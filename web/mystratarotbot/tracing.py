@@ -0,0 +1,102 @@
+import contextvars
+import json
+import logging
+import re
+import time
+import uuid
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+from .profiling import _request_stats, _view_name
+
+logger = logging.getLogger(__name__)
+
+# Trace id приходит от бота в заголовке X-Trace-Id
+TRACE_HEADER = 'HTTP_X_TRACE_ID'
+TRACE_ID_RE = re.compile(r'^[0-9a-f]{8,32}$')
+
+_trace_id = contextvars.ContextVar('trace_id', default=None)
+
+
+def current_trace_id():
+    return _trace_id.get()
+
+
+class TraceIdFilter(logging.Filter):
+    """Добавляет trace_id текущего запроса в записи лога (или «-» вне запроса)"""
+
+    def filter(self, record):
+        record.trace_id = _trace_id.get() or '-'
+        return True
+
+
+def write_span(path, span):
+    """Дописывает спан одной строкой в общий с ботом JSONL-файл"""
+    try:
+        with open(path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(span, ensure_ascii=False) + '\n')
+    except OSError as e:
+        logger.warning('Не удалось записать спан в %s: %s', path, e)
+
+
+class TraceMiddleware:
+    """Привязывает trace id бота к запросу: к логам, ответу и спану в TRACE_FILE.
+
+    Стоит после ProfilingMiddleware и берёт у него число и время SQL-запросов.
+    Без заголовка X-Trace-Id запросу выдаётся собственный trace id.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token, started, start = self._start(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            _trace_id.reset(token)
+        return self._finish(request, response, started, start)
+
+    async def __acall__(self, request):
+        token, started, start = self._start(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _trace_id.reset(token)
+        return self._finish(request, response, started, start)
+
+    def _start(self, request):
+        trace_id = request.META.get(TRACE_HEADER, '').lower()
+        if not TRACE_ID_RE.match(trace_id):
+            trace_id = uuid.uuid4().hex[:16]
+        request.trace_id = trace_id
+        return _trace_id.set(trace_id), time.time(), time.perf_counter()
+
+    def _finish(self, request, response, started, start):
+        response['X-Trace-Id'] = request.trace_id
+        if not settings.TRACE_FILE:
+            return response
+
+        span = {
+            'trace_id': request.trace_id,
+            'service': 'django',
+            'name': f'view.{_view_name(request)}',
+            'start': round(started, 6),
+            'duration_ms': round((time.perf_counter() - start) * 1000, 3),
+            'method': request.method,
+            'status': response.status_code,
+        }
+        stats = _request_stats.get()
+        if stats is not None:
+            span['db_queries'] = stats.queries
+            span['db_ms'] = round(stats.db_time * 1000, 3)
+        write_span(settings.TRACE_FILE, span)
+        return response
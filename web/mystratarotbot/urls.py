@@ -3,10 +3,15 @@ from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
 
+from . import views
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/users/', include('users.urls')),
     path('api/cards/', include('cards.urls')),
+    path('api/spreads/', include('spreads.urls')),
+    path('api/stats/', include('stats.urls')),
+    path('metrics', views.metrics, name='metrics'),
 ]
 
 if settings.DEBUG:
@@ -0,0 +1,24 @@
+import os
+
+from django.conf import settings
+from django.http import HttpResponse, JsonResponse
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, generate_latest, multiprocess
+
+from .permissions import BOT_ONLY_ERROR, is_bot_request
+
+
+def metrics(request):
+    """Метрики в формате Prometheus.
+
+    При нескольких воркерах gunicorn/uvicorn задайте PROMETHEUS_MULTIPROC_DIR —
+    тогда метрики собираются со всех процессов, а не только с ответившего.
+    Доступны только с X-Bot-Token или с адресов из METRICS_ALLOWED_IPS.
+    """
+    if request.META.get('REMOTE_ADDR') not in settings.METRICS_ALLOWED_IPS and not is_bot_request(request):
+        return JsonResponse(BOT_ONLY_ERROR, status=403)
+    if 'PROMETHEUS_MULTIPROC_DIR' in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return HttpResponse(generate_latest(registry), content_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,29 @@
+from django.views.decorators.http import require_GET
+
+from cards.async_views import json_response
+from cards.cache import adraw_cards, aget_deck_version
+from users.models import UserRequestHistory
+from .views import draw_response_data, parse_draw_request, request_text
+
+# Асинхронный вариант draw_spread для запуска под ASGI (ASYNC_API=True)
+
+
+@require_GET
+async def draw_spread(request):
+    """Вытягивает карты для расклада и (опционально) сохраняет запрос пользователя"""
+    spread_type, spread, telegram_id, draw, error = parse_draw_request(request.GET)
+    if error:
+        return json_response({"error": error}, status=400)
+
+    cards = await adraw_cards(spread['cards_count'], **draw)
+    if cards is None:
+        return json_response({"error": "Недостаточно карт"}, status=404)
+    deck_version = await aget_deck_version()
+
+    recorded = False
+    if telegram_id:
+        recorded = await UserRequestHistory.objects.arecord(
+            telegram_id, spread_type=spread_type, request_text=request_text(spread, request.GET)
+        ) is not None
+
+    return json_response(draw_response_data(request, spread_type, deck_version, recorded, cards, draw['rng']))
@@ -0,0 +1,38 @@
+# Описание раскладов: ключи совпадают с callback_data бота
+SPREADS = {
+    'single_card': {
+        'cards_count': 1,
+        'request_text': 'Запрос одной карты',
+    },
+    'daily_spread': {
+        'cards_count': 3,
+        'request_text': 'Расклад на день',
+    },
+    'love_spread': {
+        'cards_count': 2,
+        'request_text': 'Расклад на любовь',
+    },
+    'work_spread': {
+        'cards_count': 3,
+        'request_text': 'Расклад на работу',
+    },
+    'celtic_cross_spread': {
+        'cards_count': 10,
+        'request_text': 'Расклад «Кельтский крест»',
+    },
+    'major_arcana_spread': {
+        'cards_count': 3,
+        'request_text': 'Расклад на старших арканах',
+        # Карты тянутся только из подмножества колоды (см. cards.views.parse_card_filters)
+        'filters': {'cardtype': 'major'},
+    },
+}
+
+# Поля карты, нужные для расклада, в зависимости от положения
+DRAW_FIELDS = {
+    False: ('id', 'name', 'image', 'desc', 'advice'),
+    True: ('id', 'name', 'image', 'rdesc', 'radvice'),
+}
+
+# Ограничение длины seed в запросе расклада (повторяемый расклад, например «на день»)
+MAX_SEED_LENGTH = 64
@@ -0,0 +1,96 @@
+from django.core.cache import cache
+from django.test import TestCase
+
+from cards.models import Card
+from users.models import User, UserRequestHistory
+from .config import MAX_SEED_LENGTH
+
+
+class DrawSpreadTests(TestCase):
+    url = '/api/spreads/draw/'
+
+    @classmethod
+    def setUpTestData(cls):
+        for sequence in range(22):
+            Card.objects.create(
+                name=f'Старший {sequence}', url=f'major-{sequence}', image=f'cards/major-{sequence}.jpg',
+                desc='desc', rdesc='rdesc', sequence=sequence, cardtype='major',
+            )
+        for sequence in range(22, 36):
+            Card.objects.create(
+                name=f'Кубки {sequence}', url=f'cups-{sequence}', image=f'cards/cups-{sequence}.jpg',
+                desc='desc', rdesc='rdesc', sequence=sequence, cardtype='minor', suit='cups',
+            )
+
+    def setUp(self):
+        # Список id карт кэшируется между тестами, а база откатывается
+        cache.clear()
+
+    def draw(self, **params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def spread(self, data):
+        return [(card['id'], card['is_reversed']) for card in data['cards']]
+
+    def test_same_seed_same_spread(self):
+        first = self.draw(type='celtic_cross_spread', seed='42:2026-10-19')
+        second = self.draw(type='celtic_cross_spread', seed='42:2026-10-19')
+        self.assertEqual(self.spread(first), self.spread(second))
+
+    def test_other_seed_other_spread(self):
+        first = self.draw(type='celtic_cross_spread', seed='42:2026-10-19')
+        second = self.draw(type='celtic_cross_spread', seed='42:2026-10-20')
+        self.assertNotEqual(self.spread(first), self.spread(second))
+
+    def test_seed_too_long(self):
+        response = self.client.get(self.url, {'type': 'daily_spread', 'seed': 'x' * (MAX_SEED_LENGTH + 1)})
+        self.assertEqual(response.status_code, 400)
+
+    def test_draw(self):
+        data = self.draw(type='celtic_cross_spread')
+        self.assertEqual(data['type'], 'celtic_cross_spread')
+        self.assertFalse(data['recorded'])
+        self.assertEqual(len(data['cards']), 10)
+        self.assertEqual(len({card['id'] for card in data['cards']}), 10)
+        for card in data['cards']:
+            description = 'rdesc' if card['is_reversed'] else 'desc'
+            self.assertEqual(card[description], description)
+
+    def test_bad_params(self):
+        self.assertEqual(self.client.get(self.url, {'type': 'unknown'}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'type': 'daily_spread', 'telegram_id': 'x'}).status_code, 400)
+
+    def test_not_enough_cards(self):
+        Card.objects.filter(cardtype='major').delete()
+        response = self.client.get(self.url, {'type': 'major_arcana_spread'})
+        self.assertEqual(response.status_code, 404)
+
+    def test_records_request(self):
+        user = User.objects.create(telegram_id=100)
+        data = self.draw(type='daily_spread', telegram_id=100, question='Что ждёт?')
+        self.assertTrue(data['recorded'])
+        history = UserRequestHistory.objects.get(user=user)
+        self.assertEqual(history.spread_type, 'daily_spread')
+        self.assertEqual(history.request_text, 'Расклад на день: Что ждёт?')
+
+        self.assertFalse(self.draw(type='daily_spread', telegram_id=101)['recorded'])
+
+    def test_spread_filters(self):
+        majors = set(Card.objects.filter(cardtype='major').values_list('id', flat=True))
+        data = self.draw(type='major_arcana_spread', seed='1')
+        self.assertTrue({card_id for card_id, _ in self.spread(data)} <= majors)
+        # Совпадающий с раскладом фильтр допустим
+        data = self.draw(type='major_arcana_spread', cardtype='major')
+        self.assertTrue({card_id for card_id, _ in self.spread(data)} <= majors)
+
+    def test_request_filters(self):
+        cups = set(Card.objects.filter(suit='cups').values_list('id', flat=True))
+        data = self.draw(type='celtic_cross_spread', suit='cups')
+        self.assertTrue({card_id for card_id, _ in self.spread(data)} <= cups)
+
+    def test_conflicting_filters(self):
+        for params in ({'cardtype': 'minor'}, {'suit': 'x'}):
+            response = self.client.get(self.url, {'type': 'major_arcana_spread', **params})
+            self.assertEqual(response.status_code, 400, params)
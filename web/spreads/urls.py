@@ -0,0 +1,9 @@
+from django.conf import settings
+from django.urls import path
+from . import async_views, views
+
+api_views = async_views if settings.ASYNC_API else views
+
+urlpatterns = [
+    path('draw/', api_views.draw_spread, name='spread-draw'),
+]
@@ -0,0 +1,108 @@
+import random
+
+from rest_framework.decorators import api_view
+from rest_framework.response import Response
+
+from cards.cache import draw_cards, get_deck_version
+from cards.views import parse_card_filters
+from users.models import UserRequestHistory
+from .config import DRAW_FIELDS, MAX_SEED_LENGTH, SPREADS
+
+
+def _card_data(card, is_reversed, request):
+    data = {'is_reversed': is_reversed}
+    for field in DRAW_FIELDS[is_reversed]:
+        if field == 'image':
+            data['image'] = request.build_absolute_uri(card.image.url) if card.image else None
+        else:
+            data[field] = getattr(card, field)
+    return data
+
+
+def parse_draw_params(params):
+    """Разбирает параметры запроса расклада; возвращает (тип, описание расклада, telegram_id, ошибка)"""
+    spread_type = params.get('type')
+    spread = SPREADS.get(spread_type)
+    if spread is None:
+        return spread_type, None, None, "Неизвестный тип расклада"
+    telegram_id = params.get('telegram_id')
+    if telegram_id and not telegram_id.lstrip('-').isdigit():
+        return spread_type, spread, None, "telegram_id должен быть числом"
+    return spread_type, spread, telegram_id, None
+
+
+def draw_rng(params):
+    """Генератор для выбора карт; с seed тот же расклад выпадает повторно (для той же колоды)"""
+    seed = params.get('seed')
+    if not seed:
+        return random, None
+    if len(seed) > MAX_SEED_LENGTH:
+        return None, f"seed должен быть не длиннее {MAX_SEED_LENGTH} символов"
+    return random.Random(seed), None
+
+
+def spread_filters(spread, params):
+    """Фильтры колоды для расклада: заданные в SPREADS, уточнённые cardtype/suit из запроса.
+
+    Фильтры расклада запрос изменить не может: противоречащий им запрос — ошибка.
+    """
+    filters, error = parse_card_filters(params)
+    if error:
+        return None, error
+    fixed = spread.get('filters', {})
+    for name, value in filters.items():
+        if name in fixed and fixed[name] != value:
+            return None, f"Для этого расклада {name} может быть только {fixed[name]}"
+    return {**filters, **fixed}, None
+
+
+def parse_draw_request(params):
+    """Все параметры расклада; возвращает (тип, описание расклада, telegram_id, аргументы draw_cards, ошибка)"""
+    spread_type, spread, telegram_id, error = parse_draw_params(params)
+    if not error:
+        filters, error = spread_filters(spread, params)
+    if not error:
+        rng, error = draw_rng(params)
+    if error:
+        return spread_type, None, None, None, error
+    draw = {'only': DRAW_FIELDS[False] + DRAW_FIELDS[True], 'filters': filters, 'rng': rng}
+    return spread_type, spread, telegram_id, draw, None
+
+
+def request_text(spread, params):
+    question = params.get('question')
+    return spread['request_text'] + (f": {question}" if question else "")
+
+
+def draw_response_data(request, spread_type, deck_version, recorded, cards, rng=random):
+    is_reversed_list = [rng.choice([True, False]) for _ in cards]
+    return {
+        'type': spread_type,
+        'deck_version': deck_version,
+        'recorded': recorded,
+        'cards': [
+            _card_data(card, is_reversed, request)
+            for card, is_reversed in zip(cards, is_reversed_list)
+        ],
+    }
+
+
+@api_view(['GET'])
+def draw_spread(request):
+    """Вытягивает карты для расклада и (опционально) сохраняет запрос пользователя"""
+    spread_type, spread, telegram_id, draw, error = parse_draw_request(request.query_params)
+    if error:
+        return Response({"error": error}, status=400)
+
+    cards = draw_cards(spread['cards_count'], **draw)
+    if cards is None:
+        return Response({"error": "Недостаточно карт"}, status=404)
+    deck_version = get_deck_version()
+
+    recorded = False
+    if telegram_id:
+        recorded = UserRequestHistory.objects.record(
+            telegram_id, spread_type=spread_type, request_text=request_text(spread, request.query_params)
+        ) is not None
+
+    return Response(draw_response_data(request, spread_type, deck_version, recorded, cards, draw['rng']))
@@ -0,0 +1,9 @@
+from django.contrib import admin
+from .models import SpreadUsageDaily
+
+
+@admin.register(SpreadUsageDaily)
+class SpreadUsageDailyAdmin(admin.ModelAdmin):
+    list_display = ('day', 'spread_type', 'requests', 'users')
+    list_filter = ('spread_type',)
+    date_hierarchy = 'day'
@@ -0,0 +1,41 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from django.utils import timezone
+
+from spreads.config import SPREADS
+from users.models import UserRequestHistory
+from stats.rollup import rebuild_days
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает дневную сводку использования раскладов за последние дни. '
+        'Выравнивает счётчики после инкрементальных обновлений или заполняет сводку, '
+        'если STATS_INCREMENTAL выключен.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=2, help='Сколько последних дней пересчитать')
+        parser.add_argument('--backfill-types', action='store_true',
+                            help='Заполнить тип расклада у старых записей по тексту запроса')
+
+    def handle(self, *args, **options):
+        if options['backfill_types']:
+            for spread_type, spread in SPREADS.items():
+                text = spread['request_text']
+                updated = (
+                    UserRequestHistory.objects
+                    .filter(spread_type='')
+                    .filter(Q(request_text=text) | Q(request_text__startswith=f'{text}: '))
+                    .update(spread_type=spread_type)
+                )
+                self.stdout.write(f"{spread_type}: заполнено {updated}")
+
+        until = timezone.localdate()
+        since = until - timedelta(days=options['days'] - 1)
+        rows = rebuild_days(since, until)
+        self.stdout.write(self.style.SUCCESS(
+            f"Сводка за {since:%Y-%m-%d} — {until:%Y-%m-%d} пересчитана: {rows} строк"
+        ))
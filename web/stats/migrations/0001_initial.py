@@ -0,0 +1,30 @@
+# Generated by Django 5.2.5 on 2026-10-19 14:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SpreadUsageDaily',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(verbose_name='День')),
+                ('spread_type', models.CharField(max_length=32, verbose_name='Тип расклада')),
+                ('requests', models.PositiveIntegerField(default=0, verbose_name='Запросов')),
+                ('users', models.PositiveIntegerField(default=0, verbose_name='Уникальных пользователей')),
+            ],
+            options={
+                'verbose_name': 'Использование раскладов за день',
+                'verbose_name_plural': 'Использование раскладов по дням',
+                'ordering': ['-day', 'spread_type'],
+                'constraints': [models.UniqueConstraint(fields=('day', 'spread_type'), name='stats_usage_day_spread')],
+            },
+        ),
+    ]
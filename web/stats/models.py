@@ -0,0 +1,21 @@
+from django.db import models
+
+
+class SpreadUsageDaily(models.Model):
+    """Сводка использования раскладов: день × тип расклада"""
+
+    day = models.DateField("День")
+    spread_type = models.CharField("Тип расклада", max_length=32)
+    requests = models.PositiveIntegerField("Запросов", default=0)
+    users = models.PositiveIntegerField("Уникальных пользователей", default=0)
+
+    class Meta:
+        ordering = ['-day', 'spread_type']
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'spread_type'], name='stats_usage_day_spread'),
+        ]
+        verbose_name = "Использование раскладов за день"
+        verbose_name_plural = "Использование раскладов по дням"
+
+    def __str__(self):
+        return f"{self.day} {self.spread_type}: {self.requests}"
@@ -0,0 +1,74 @@
+from datetime import datetime, time, timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from users.models import UserRequestHistory
+from .models import SpreadUsageDaily
+
+
+def _day_bounds(day):
+    start = timezone.make_aware(datetime.combine(day, time.min))
+    return start, start + timedelta(days=1)
+
+
+def record_request(history):
+    """Учитывает один новый запрос в дневной сводке.
+
+    Уникальность пользователя проверяется по индексу (user, created_at); при
+    одновременных вставках одного пользователя счётчик users может разойтись
+    на единицу — его выравнивает compact_usage_stats.
+    """
+    day = timezone.localdate(history.created_at)
+    start, end = _day_bounds(day)
+    is_first = not (
+        UserRequestHistory.objects
+        .filter(user_id=history.user_id, spread_type=history.spread_type,
+                created_at__gte=start, created_at__lt=end)
+        .exclude(pk=history.pk)
+        .exists()
+    )
+
+    rollup = SpreadUsageDaily.objects.filter(day=day, spread_type=history.spread_type)
+    updates = {'requests': F('requests') + 1}
+    if is_first:
+        updates['users'] = F('users') + 1
+    if rollup.update(**updates):
+        return
+    try:
+        with transaction.atomic():
+            SpreadUsageDaily.objects.create(
+                day=day, spread_type=history.spread_type, requests=1, users=int(is_first)
+            )
+    except IntegrityError:
+        # Строку уже создал параллельный запрос
+        rollup.update(**updates)
+
+
+def rebuild_days(since, until):
+    """Пересчитывает сводку за дни [since, until] по истории запросов; возвращает число строк.
+
+    Дни должны быть моложе срока архивации истории (archive_requests), иначе
+    счётчики уменьшатся до оставшихся в таблице записей.
+    """
+    start, _ = _day_bounds(since)
+    _, end = _day_bounds(until)
+    rows = (
+        UserRequestHistory.objects
+        .filter(created_at__gte=start, created_at__lt=end)
+        .exclude(spread_type='')
+        .annotate(day=TruncDate('created_at', tzinfo=timezone.get_current_timezone()))
+        .values('day', 'spread_type')
+        .annotate(requests=Count('id'), users=Count('user', distinct=True))
+        .order_by()
+    )
+    rollups = [SpreadUsageDaily(**row) for row in rows]
+
+    # Только upsert: строки за дни, история которых уже архивирована, сохраняются
+    SpreadUsageDaily.objects.bulk_create(
+        rollups, update_conflicts=True,
+        unique_fields=['day', 'spread_type'], update_fields=['requests', 'users'],
+    )
+    return len(rollups)
@@ -0,0 +1,8 @@
+from rest_framework import serializers
+from .models import SpreadUsageDaily
+
+
+class SpreadUsageDailySerializer(serializers.ModelSerializer):
+    class Meta:
+        model = SpreadUsageDaily
+        fields = ['day', 'spread_type', 'requests', 'users']
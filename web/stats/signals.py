@@ -0,0 +1,13 @@
+from django.conf import settings
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from users.models import UserRequestHistory
+from .rollup import record_request
+
+
+@receiver(post_save, sender=UserRequestHistory)
+def request_created(sender, instance, created, raw=False, **kwargs):
+    # При STATS_INCREMENTAL=False сводку обновляет только compact_usage_stats по расписанию
+    if created and not raw and instance.spread_type and settings.STATS_INCREMENTAL:
+        record_request(instance)
@@ -0,0 +1,73 @@
+from datetime import timedelta
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from users.models import User, UserRequestHistory
+from .models import SpreadUsageDaily
+from .rollup import rebuild_days
+
+
+def usage():
+    return {
+        (row.day, row.spread_type): (row.requests, row.users)
+        for row in SpreadUsageDaily.objects.all()
+    }
+
+
+class SpreadUsageTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.first = User.objects.create(telegram_id=1)
+        cls.second = User.objects.create(telegram_id=2)
+
+    def add(self, user, spread_type, text='Запрос'):
+        return UserRequestHistory.objects.create(user=user, spread_type=spread_type, request_text=text)
+
+    @override_settings(STATS_INCREMENTAL=True)
+    def test_incremental_counts(self):
+        self.add(self.first, 'daily_spread')
+        self.add(self.first, 'daily_spread')
+        self.add(self.second, 'daily_spread')
+        self.add(self.first, 'love_spread')
+        # Обычные сообщения в сводку не попадают
+        self.add(self.first, '')
+
+        today = timezone.localdate()
+        self.assertEqual(usage(), {
+            (today, 'daily_spread'): (3, 2),
+            (today, 'love_spread'): (1, 1),
+        })
+
+    @override_settings(STATS_INCREMENTAL=False)
+    def test_rebuild_counts_per_day(self):
+        history = [
+            self.add(self.first, 'daily_spread'),
+            self.add(self.first, 'daily_spread'),
+            self.add(self.second, 'daily_spread'),
+            self.add(self.second, 'work_spread'),
+        ]
+        self.assertEqual(usage(), {})
+
+        # Первые два запроса — вчерашние
+        today = timezone.localdate()
+        yesterday = today - timedelta(days=1)
+        UserRequestHistory.objects.filter(id__in=[item.id for item in history[:2]]).update(
+            created_at=timezone.now() - timedelta(days=1)
+        )
+        self.assertEqual(rebuild_days(yesterday, today), 3)
+        self.assertEqual(usage(), {
+            (yesterday, 'daily_spread'): (2, 1),
+            (today, 'daily_spread'): (1, 1),
+            (today, 'work_spread'): (1, 1),
+        })
+
+    @override_settings(STATS_INCREMENTAL=True)
+    def test_rebuild_matches_incremental(self):
+        for user in (self.first, self.second, self.first):
+            self.add(user, 'celtic_cross_spread')
+        incremental = usage()
+        today = timezone.localdate()
+        rebuild_days(today, today)
+        self.assertEqual(usage(), incremental)
+        self.assertEqual(incremental, {(today, 'celtic_cross_spread'): (3, 2)})
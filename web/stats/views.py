@@ -0,0 +1,47 @@
+from datetime import date, timedelta
+
+from django.utils import timezone
+from rest_framework.decorators import api_view
+from rest_framework.response import Response
+
+from .models import SpreadUsageDaily
+from .serializers import SpreadUsageDailySerializer
+
+DEFAULT_DAYS = 30
+MAX_DAYS = 366
+
+
+def parse_stats_params(params):
+    """Разбирает период отчёта; возвращает (since, until, ошибка)"""
+    try:
+        until = date.fromisoformat(params['until']) if params.get('until') else timezone.localdate()
+        since = (
+            date.fromisoformat(params['since']) if params.get('since')
+            else until - timedelta(days=DEFAULT_DAYS - 1)
+        )
+    except ValueError:
+        return None, None, "Даты должны быть в формате ГГГГ-ММ-ДД"
+    if since > until:
+        return None, None, "since не может быть позже until"
+    if (until - since).days >= MAX_DAYS:
+        return None, None, f"Период не может быть длиннее {MAX_DAYS} дней"
+    return since, until, None
+
+
+@api_view(['GET'])
+def usage_stats(request):
+    """Дневная сводка использования раскладов за период (по умолчанию — 30 дней)"""
+    since, until, error = parse_stats_params(request.query_params)
+    if error:
+        return Response({"error": error}, status=400)
+
+    rollups = SpreadUsageDaily.objects.filter(day__gte=since, day__lte=until)
+    spread_type = request.query_params.get('spread_type')
+    if spread_type:
+        rollups = rollups.filter(spread_type=spread_type)
+
+    return Response({
+        'since': since,
+        'until': until,
+        'results': SpreadUsageDailySerializer(rollups, many=True).data,
+    })
@@ -0,0 +1,96 @@
+import json
+
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_POST
+from rest_framework import status
+
+from cards.async_views import json_response
+from mystratarotbot.permissions import BOT_ONLY_ERROR, is_bot_request
+from .models import User, UserRequestHistory
+from .pagination import (
+    keyset_page,
+    page_data,
+    parse_blocked_ids,
+    parse_page_params,
+    parse_recipient_params,
+    recipients_data,
+    recipients_page,
+)
+from .serializers import UserRequestHistorySerializer
+from .views import history_entry_data, parse_history_entry, parse_registration, registration_data
+
+# Асинхронные варианты представлений пользователей для запуска под ASGI (ASYNC_API=True).
+# Как и представления DRF, не требуют CSRF-токена.
+
+
+def _parse_json(request):
+    try:
+        data = json.loads(request.body or b"{}")
+    except ValueError:
+        return None
+    return data if isinstance(data, dict) else None
+
+
+@csrf_exempt
+@require_POST
+async def register_user(request):
+    data = _parse_json(request)
+    if data is None:
+        return json_response({"error": "Invalid JSON"}, status=status.HTTP_400_BAD_REQUEST)
+    telegram_id, fields, errors = parse_registration(data)
+    if errors:
+        return json_response(errors, status=status.HTTP_400_BAD_REQUEST)
+    data, code = registration_data(*await User.objects.aregister(telegram_id, **fields))
+    return json_response(data, status=code)
+
+
+@csrf_exempt
+@require_POST
+async def create_user_request(request):
+    data = _parse_json(request)
+    if data is None:
+        return json_response({"error": "Invalid JSON"}, status=status.HTTP_400_BAD_REQUEST)
+    telegram_id, fields, errors = parse_history_entry(data)
+    if errors:
+        return json_response(errors, status=status.HTTP_400_BAD_REQUEST)
+    data, code = history_entry_data(await UserRequestHistory.objects.arecord(telegram_id, **fields))
+    return json_response(data, status=code)
+
+
+@require_GET
+async def list_user_requests(request, telegram_id):
+    if not is_bot_request(request):
+        return json_response(BOT_ONLY_ERROR, status=status.HTTP_403_FORBIDDEN)
+    position, limit, error = parse_page_params(request.GET)
+    if error:
+        return json_response({"error": error}, status=status.HTTP_400_BAD_REQUEST)
+
+    user_id = await User.objects.filter(telegram_id=telegram_id).values_list("id", flat=True).afirst()
+    if user_id is None:
+        return json_response({"error": "User not found"}, status=status.HTTP_404_NOT_FOUND)
+
+    queryset = keyset_page(UserRequestHistory.objects.filter(user_id=user_id), position, limit)
+    items = [item async for item in queryset]
+    return json_response(page_data(items, limit, UserRequestHistorySerializer))
+
+
+@require_GET
+async def list_recipients(request):
+    if not is_bot_request(request):
+        return json_response(BOT_ONLY_ERROR, status=status.HTTP_403_FORBIDDEN)
+    after, limit, error = parse_recipient_params(request.GET)
+    if error:
+        return json_response({"error": error}, status=status.HTTP_400_BAD_REQUEST)
+    telegram_ids = [telegram_id async for telegram_id in recipients_page(User.objects.all(), after, limit)]
+    return json_response(recipients_data(telegram_ids, limit))
+
+
+@csrf_exempt
+@require_POST
+async def mark_blocked(request):
+    if not is_bot_request(request):
+        return json_response(BOT_ONLY_ERROR, status=status.HTTP_403_FORBIDDEN)
+    telegram_ids, error = parse_blocked_ids(_parse_json(request))
+    if error:
+        return json_response({"error": error}, status=status.HTTP_400_BAD_REQUEST)
+    return json_response({"updated": await User.objects.amark_blocked(telegram_ids)})
@@ -0,0 +1,124 @@
+import gzip
+import itertools
+import json
+import os
+import time
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from users.models import UserRequestHistory
+
+ARCHIVE_FIELDS = ('id', 'user_id', 'request_text', 'created_at')
+
+
+class Command(BaseCommand):
+    help = (
+        'Переносит историю запросов старше заданного срока в сжатые JSONL-файлы и удаляет её '
+        'небольшими пачками. При прерывании продолжает с сохранённой контрольной точки.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=180, help='Архивировать записи старше N дней')
+        parser.add_argument('--output-dir', default=os.path.join(settings.BASE_DIR, 'archive'),
+                            help='Каталог для архивов и контрольной точки')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Записей в одной пачке удаления')
+        parser.add_argument('--chunk-size', type=int, default=500, help='Размер выборки iterator()')
+        parser.add_argument('--sleep', type=float, default=0.1, help='Пауза между пачками, секунд')
+        parser.add_argument('--restart', action='store_true', help='Игнорировать контрольную точку')
+
+    def handle(self, *args, **options):
+        os.makedirs(options['output_dir'], exist_ok=True)
+        checkpoint_path = os.path.join(options['output_dir'], 'checkpoint.json')
+
+        checkpoint = None
+        if os.path.exists(checkpoint_path) and not options['restart']:
+            with open(checkpoint_path, 'r', encoding='utf-8') as f:
+                checkpoint = json.load(f)
+            self.stdout.write(f"Продолжаем архивацию с id > {checkpoint['deleted_through']}")
+
+        if checkpoint is None:
+            cutoff = timezone.now() - timedelta(days=options['days'])
+            checkpoint = {
+                'cutoff': cutoff.isoformat(),
+                'file': f"requests-{cutoff:%Y%m%d}-{timezone.now():%Y%m%d%H%M%S}.jsonl.gz",
+                'archived_through': 0,
+                'deleted_through': 0,
+                'archive_size': 0,
+            }
+
+        cutoff = datetime.fromisoformat(checkpoint['cutoff'])
+        archive_path = os.path.join(options['output_dir'], checkpoint['file'])
+        history = UserRequestHistory.objects.filter(created_at__lt=cutoff)
+
+        def save_checkpoint():
+            tmp_path = f'{checkpoint_path}.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(checkpoint, f)
+            os.replace(tmp_path, checkpoint_path)
+
+        def delete_archived():
+            # Короткая транзакция на пачку — без долгих блокировок таблицы
+            with transaction.atomic():
+                deleted, _ = history.filter(
+                    id__gt=checkpoint['deleted_through'], id__lte=checkpoint['archived_through']
+                ).delete()
+            checkpoint['deleted_through'] = checkpoint['archived_through']
+            save_checkpoint()
+            return deleted
+
+        # Отрезаем недописанный блок, если прошлый запуск прервался во время записи
+        if os.path.exists(archive_path) and os.path.getsize(archive_path) > checkpoint['archive_size']:
+            with open(archive_path, 'r+b') as raw:
+                raw.truncate(checkpoint['archive_size'])
+
+        # Пачка уже в архиве, но не удалена (прерывание между шагами)
+        total_deleted = 0
+        if checkpoint['archived_through'] > checkpoint['deleted_through']:
+            total_deleted += delete_archived()
+
+        total_archived = 0
+        while True:
+            batch = (
+                history.filter(id__gt=checkpoint['archived_through'])
+                .order_by('id')
+                .values(*ARCHIVE_FIELDS, telegram_id=F('user__telegram_id'))[:options['batch_size']]
+            )
+            rows = batch.iterator(chunk_size=options['chunk_size'])
+            first = next(rows, None)
+            if first is None:
+                break
+
+            last_id = None
+            count = 0
+            # Каждая пачка дописывается отдельным gzip-блоком, файл остаётся читаемым целиком
+            with open(archive_path, 'ab') as raw:
+                with gzip.GzipFile(fileobj=raw, mode='wb') as archive:
+                    for row in itertools.chain([first], rows):
+                        line = json.dumps(row, cls=DjangoJSONEncoder, ensure_ascii=False) + '\n'
+                        archive.write(line.encode('utf-8'))
+                        last_id = row['id']
+                        count += 1
+                raw.flush()
+                os.fsync(raw.fileno())
+                archive_size = raw.tell()
+
+            checkpoint['archived_through'] = last_id
+            checkpoint['archive_size'] = archive_size
+            save_checkpoint()
+            total_archived += count
+            total_deleted += delete_archived()
+            self.stdout.write(f"Архивировано {total_archived}, удалено {total_deleted} (до id {last_id})")
+            if options['sleep']:
+                time.sleep(options['sleep'])
+
+        if os.path.exists(checkpoint_path):
+            os.remove(checkpoint_path)
+        self.stdout.write(self.style.SUCCESS(
+            f"Готово: архивировано {total_archived}, удалено {total_deleted} записей старше {cutoff:%Y-%m-%d}"
+        ))
@@ -0,0 +1,107 @@
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connection
+
+from users.models import User, UserRequestHistory
+
+
+def _percentile(values, percent):
+    return statistics.quantiles(values, n=100)[percent - 1] if len(values) > 1 else values[0]
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает скорость записи истории запросов при разных профилях БД (DB_PROFILE). '
+        'Для SQLite каждый профиль проверяется на отдельной временной базе.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=2000, help='Сколько записей вставить')
+        parser.add_argument('--threads', type=int, default=4, help='Параллельных потоков')
+        parser.add_argument('--profiles', default='default,tuned', help='Профили через запятую')
+        parser.add_argument('--output', help='Файл для результатов в JSON')
+        # Внутренние флаги: замер в текущем процессе с уже выбранным профилем
+        parser.add_argument('--run', action='store_true', help='Выполнить замер в этом процессе')
+        parser.add_argument('--migrate', action='store_true', help='Перед замером применить миграции')
+
+    def handle(self, *args, **options):
+        if options['run']:
+            result = self._run(options['rows'], options['threads'], options['migrate'])
+            self.stdout.write(json.dumps(result))
+            return
+
+        is_sqlite = settings.DATABASES['default']['ENGINE'] == 'django.db.backends.sqlite3'
+        results = []
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            for profile in options['profiles'].split(','):
+                env = {**os.environ, 'DB_PROFILE': profile}
+                command = [
+                    sys.executable, str(settings.BASE_DIR / 'manage.py'), 'benchmark_history_inserts',
+                    '--run', '--rows', str(options['rows']), '--threads', str(options['threads']),
+                ]
+                if is_sqlite:
+                    env['DB_NAME'] = os.path.join(tmp_dir, f'{profile}.sqlite3')
+                    command.append('--migrate')
+                completed = subprocess.run(command, env=env, capture_output=True, text=True, check=True)
+                result = json.loads(completed.stdout.strip().splitlines()[-1])
+                results.append(result)
+                self.stdout.write(
+                    f"{profile}: {result['inserts_per_second']:.0f} вставок/с, "
+                    f"p50 {result['p50_ms']:.2f} мс, p95 {result['p95_ms']:.2f} мс, p99 {result['p99_ms']:.2f} мс"
+                )
+
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                json.dump(results, f, indent=2)
+
+    def _run(self, rows, threads, migrate):
+        if migrate:
+            call_command('migrate', verbosity=0)
+
+        user = User.objects.create(telegram_id=-random.randint(1, 2**62), username='benchmark')
+        latencies = []
+        lock = threading.Lock()
+
+        def worker(count):
+            local = []
+            for _ in range(count):
+                # Как в обработке запроса: соединение закрывается или переиспользуется по CONN_MAX_AGE
+                close_old_connections()
+                started = time.perf_counter()
+                UserRequestHistory.objects.create(user_id=user.id, request_text='benchmark')
+                local.append(time.perf_counter() - started)
+                close_old_connections()
+            connection.close()
+            with lock:
+                latencies.extend(local)
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            per_thread = [rows // threads + (1 if i < rows % threads else 0) for i in range(threads)]
+            list(executor.map(worker, per_thread))
+        elapsed = time.perf_counter() - started
+
+        user.delete()
+        return {
+            'profile': settings.DB_PROFILE,
+            'vendor': connection.vendor,
+            'rows': rows,
+            'threads': threads,
+            'seconds': elapsed,
+            'inserts_per_second': rows / elapsed,
+            'p50_ms': _percentile(latencies, 50) * 1000,
+            'p95_ms': _percentile(latencies, 95) * 1000,
+            'p99_ms': _percentile(latencies, 99) * 1000,
+        }
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.5 on 2026-10-19 14:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0004_alter_userrequesthistory_options'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='userrequesthistory',
+            options={'ordering': ['-created_at', '-id'], 'verbose_name': 'User request history', 'verbose_name_plural': 'User request histories'},
+        ),
+        migrations.AddIndex(
+            model_name='userrequesthistory',
+            index=models.Index(fields=['user', 'created_at', 'id'], name='users_history_user_created'),
+        ),
+        migrations.AddIndex(
+            model_name='userrequesthistory',
+            index=models.Index(fields=['created_at'], name='users_history_created'),
+        ),
+    ]
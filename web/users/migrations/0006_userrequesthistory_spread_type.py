@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-19 14:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0005_userrequesthistory_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userrequesthistory',
+            name='spread_type',
+            field=models.CharField(blank=True, default='', max_length=32),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.5 on 2026-10-19 15:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0006_userrequesthistory_spread_type'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='blocked_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(condition=models.Q(('blocked_at__isnull', True)), fields=['telegram_id'], name='users_user_reachable'),
+        ),
+    ]
@@ -1,5 +1,37 @@
 from django.db import models
 from django.conf import settings
+from django.utils import timezone
+
+
+class UserManager(models.Manager):
+    def register(self, telegram_id, **fields):
+        """Создаёт пользователя; возвращает (пользователь, создан ли).
+
+        Повторный /start снимает отметку о блокировке: пользователь снова
+        доступен для рассылок.
+        """
+        user, created = self.get_or_create(telegram_id=telegram_id, defaults=fields)
+        if not created and user.blocked_at is not None:
+            user.blocked_at = None
+            user.save(update_fields=["blocked_at"])
+        return user, created
+
+    async def aregister(self, telegram_id, **fields):
+        user, created = await self.aget_or_create(telegram_id=telegram_id, defaults=fields)
+        if not created and user.blocked_at is not None:
+            user.blocked_at = None
+            await user.asave(update_fields=["blocked_at"])
+        return user, created
+
+    def mark_blocked(self, telegram_ids):
+        """Отмечает заблокировавших бота; возвращает число новых отметок"""
+        return self._reachable(telegram_ids).update(blocked_at=timezone.now())
+
+    async def amark_blocked(self, telegram_ids):
+        return await self._reachable(telegram_ids).aupdate(blocked_at=timezone.now())
+
+    def _reachable(self, telegram_ids):
+        return self.filter(telegram_id__in=telegram_ids, blocked_at__isnull=True)
 
 
 class User(models.Model):
@@ -8,17 +40,57 @@ class User(models.Model):
     first_name = models.CharField(max_length=64, blank=True, null=True)
     last_name = models.CharField(max_length=64, blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    # Когда рассылка узнала, что пользователь заблокировал бота; сбрасывается при /start
+    blocked_at = models.DateTimeField(blank=True, null=True)
+
+    objects = UserManager()
+
+    class Meta:
+        indexes = [
+            # Получатели рассылки по возрастанию telegram_id (keyset-пагинация)
+            models.Index(
+                fields=["telegram_id"],
+                condition=models.Q(blocked_at__isnull=True),
+                name="users_user_reachable",
+            ),
+        ]
 
     def __str__(self):
         return f"{self.username or self.first_name} ({self.telegram_id})"
 
+class UserRequestHistoryManager(models.Manager):
+    def record(self, telegram_id, **fields):
+        """Записывает запрос в историю пользователя; None — пользователь не найден"""
+        user_id = User.objects.filter(telegram_id=telegram_id).values_list("id", flat=True).first()
+        if user_id is None:
+            return None
+        return self.create(user_id=user_id, **fields)
+
+    async def arecord(self, telegram_id, **fields):
+        user_id = await User.objects.filter(telegram_id=telegram_id).values_list("id", flat=True).afirst()
+        if user_id is None:
+            return None
+        return await self.acreate(user_id=user_id, **fields)
+
+
 # Модель для хранения истории запросов пользователя
 class UserRequestHistory(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="requests")
     request_text = models.TextField()
+    # Ключ расклада (см. spreads.config.SPREADS); пусто для обычных сообщений
+    spread_type = models.CharField(max_length=32, blank=True, default="")
     created_at = models.DateTimeField(auto_now_add=True)
 
+    objects = UserRequestHistoryManager()
+
     class Meta:
+        ordering = ["-created_at", "-id"]
+        indexes = [
+            # История пользователя по времени (keyset-пагинация по created_at, id)
+            models.Index(fields=["user", "created_at", "id"], name="users_history_user_created"),
+            # Фильтр и сортировка по дате в админке
+            models.Index(fields=["created_at"], name="users_history_created"),
+        ]
         verbose_name = "User request history"
         verbose_name_plural = "User request histories"
 
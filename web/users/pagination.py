@@ -0,0 +1,106 @@
+import base64
+from datetime import datetime
+
+from django.db.models import Q
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+# Получатели рассылки отдаются только id, поэтому страницы крупнее
+DEFAULT_RECIPIENTS_PAGE_SIZE = 500
+MAX_RECIPIENTS_PAGE_SIZE = 5000
+MAX_BLOCKED_BATCH = 5000
+
+
+def encode_cursor(item):
+    """Курсор указывает на последнюю отданную запись: (created_at, id)"""
+    raw = f"{item.created_at.isoformat()}|{item.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor):
+    """Возвращает (created_at, id) или None, если курсор некорректен"""
+    try:
+        created_at, item_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(created_at), int(item_id)
+    except (ValueError, UnicodeError):
+        return None
+
+
+def parse_page_params(params):
+    """Разбирает cursor и limit; возвращает (позиция, limit, ошибка)"""
+    limit = params.get("limit", str(DEFAULT_PAGE_SIZE))
+    if not (limit.isdigit() and 1 <= int(limit) <= MAX_PAGE_SIZE):
+        return None, None, f"limit должен быть числом от 1 до {MAX_PAGE_SIZE}"
+    position = None
+    if params.get("cursor"):
+        position = decode_cursor(params["cursor"])
+        if position is None:
+            return None, None, "Некорректный cursor"
+    return position, int(limit), None
+
+
+def keyset_page(queryset, position, limit):
+    """Следующая страница по (created_at, id) в обратном порядке без OFFSET.
+
+    Выбирается на одну запись больше, чтобы узнать, есть ли следующая страница.
+    """
+    if position is not None:
+        created_at, item_id = position
+        queryset = queryset.filter(
+            Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=item_id)
+        )
+    return queryset.order_by("-created_at", "-id")[: limit + 1]
+
+
+def page_data(items, limit, serializer_class):
+    next_cursor = encode_cursor(items[limit - 1]) if len(items) > limit else None
+    return {
+        "results": serializer_class(items[:limit], many=True).data,
+        "next_cursor": next_cursor,
+    }
+
+
+def parse_recipient_params(params):
+    """Разбирает after (последний отданный telegram_id) и limit; возвращает (after, limit, ошибка)"""
+    limit = params.get("limit", str(DEFAULT_RECIPIENTS_PAGE_SIZE))
+    if not (limit.isdigit() and 1 <= int(limit) <= MAX_RECIPIENTS_PAGE_SIZE):
+        return None, None, f"limit должен быть числом от 1 до {MAX_RECIPIENTS_PAGE_SIZE}"
+    after = params.get("after")
+    if after:
+        try:
+            after = int(after)
+        except ValueError:
+            return None, None, "after должен быть числом"
+    else:
+        after = None
+    return after, int(limit), None
+
+
+def recipients_page(queryset, after, limit):
+    """telegram_id пользователей, не заблокировавших бота, по возрастанию без OFFSET.
+
+    Как и keyset_page, выбирается на одну запись больше.
+    """
+    queryset = queryset.filter(blocked_at__isnull=True)
+    if after is not None:
+        queryset = queryset.filter(telegram_id__gt=after)
+    return queryset.order_by("telegram_id").values_list("telegram_id", flat=True)[: limit + 1]
+
+
+def recipients_data(telegram_ids, limit):
+    return {
+        "results": telegram_ids[:limit],
+        "next_after": telegram_ids[limit - 1] if len(telegram_ids) > limit else None,
+    }
+
+
+def parse_blocked_ids(data):
+    """Список telegram_id из тела запроса; возвращает (ids, ошибка)"""
+    telegram_ids = data.get("telegram_ids") if isinstance(data, dict) else None
+    if not isinstance(telegram_ids, list) or not all(
+        isinstance(item, int) and not isinstance(item, bool) for item in telegram_ids
+    ):
+        return None, "telegram_ids должен быть списком чисел"
+    if len(telegram_ids) > MAX_BLOCKED_BATCH:
+        return None, f"Не больше {MAX_BLOCKED_BATCH} telegram_ids за запрос"
+    return telegram_ids, None
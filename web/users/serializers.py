@@ -8,16 +8,17 @@ class UserSerializer(serializers.ModelSerializer):
         model = User
         fields = ["telegram_id", "username", "first_name", "last_name", "created_at"]
 
+
+class UserRegisterSerializer(UserSerializer):
+    """Проверка данных регистрации без запроса к БД (уникальность проверяет get_or_create)"""
+
+    class Meta(UserSerializer.Meta):
+        extra_kwargs = {"telegram_id": {"validators": []}}
+
 class UserRequestHistorySerializer(serializers.ModelSerializer):
     telegram_id = serializers.IntegerField(write_only=True)
 
     class Meta:
         model = UserRequestHistory
-        fields = ("telegram_id", "request_text", "created_at")
+        fields = ("telegram_id", "request_text", "spread_type", "created_at")
         read_only_fields = ("created_at",)
-
-    def create(self, validated_data):
-        telegram_id = validated_data.pop("telegram_id")
-        from .models import User
-        user = User.objects.get(telegram_id=telegram_id)
-        return UserRequestHistory.objects.create(user=user, **validated_data)
\ No newline at end of file
@@ -1,3 +1,179 @@
-from django.test import TestCase
+import gzip
+import io
+import json
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.core.management import call_command
+from django.db import transaction
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from .models import User, UserRequestHistory
+from .pagination import decode_cursor, encode_cursor
+
+TOKEN = "test-token"
+
+
+class CursorTests(TestCase):
+    def test_round_trip(self):
+        user = User.objects.create(telegram_id=1)
+        item = UserRequestHistory.objects.create(user=user, request_text="Вопрос")
+        self.assertEqual(decode_cursor(encode_cursor(item)), (item.created_at, item.id))
+
+    def test_invalid_cursor(self):
+        for cursor in ("", "not-base64!", "bm8tc2VwYXJhdG9y", "eHx5"):
+            self.assertIsNone(decode_cursor(cursor), cursor)
+
+
+@override_settings(BOT_API_TOKEN=TOKEN)
+class BotClientTestCase(TestCase):
+    def get(self, url, params=None, token=TOKEN):
+        return self.client.get(url, params, headers={"X-Bot-Token": token})
+
+    def post(self, url, data, token=TOKEN):
+        return self.client.post(url, data, content_type="application/json", headers={"X-Bot-Token": token})
+
+
+class UserHistoryTests(BotClientTestCase):
+    url = "/api/users/1/requests/"
+
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create(telegram_id=1)
+        UserRequestHistory.objects.bulk_create(
+            UserRequestHistory(user=user, request_text=f"Вопрос {number}") for number in range(7)
+        )
+        # Одинаковое время у части записей: порядок держится на id
+        now = timezone.now()
+        for number, item in enumerate(UserRequestHistory.objects.order_by("id")):
+            item.created_at = now + timedelta(seconds=number // 3)
+            item.save(update_fields=["created_at"])
+
+    def test_pages(self):
+        texts, cursor = [], None
+        while True:
+            response = self.get(self.url, {"limit": 3, **({"cursor": cursor} if cursor else {})})
+            self.assertEqual(response.status_code, 200)
+            data = response.json()
+            texts += [item["request_text"] for item in data["results"]]
+            cursor = data["next_cursor"]
+            if cursor is None:
+                break
+        self.assertEqual(texts, [f"Вопрос {number}" for number in reversed(range(7))])
+
+    def test_bad_params(self):
+        self.assertEqual(self.get(self.url, {"limit": 0}).status_code, 400)
+        self.assertEqual(self.get(self.url, {"cursor": "broken"}).status_code, 400)
+        self.assertEqual(self.get("/api/users/2/requests/").status_code, 404)
+
+    def test_requires_token(self):
+        self.assertEqual(self.get(self.url, token="wrong").status_code, 403)
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+
+
+class ArchiveRequestsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create(telegram_id=42)
+        UserRequestHistory.objects.bulk_create(
+            UserRequestHistory(user=user, request_text=f"Вопрос {number}") for number in range(10)
+        )
+        cls.old_ids = list(UserRequestHistory.objects.order_by("id").values_list("id", flat=True)[:8])
+        UserRequestHistory.objects.filter(id__in=cls.old_ids).update(
+            created_at=timezone.now() - timedelta(days=200)
+        )
+
+    def setUp(self):
+        self.output_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.output_dir)
+
+    def archive(self):
+        call_command(
+            "archive_requests", output_dir=self.output_dir, batch_size=3, sleep=0, stdout=io.StringIO()
+        )
+
+    def archived_rows(self):
+        [name] = [name for name in os.listdir(self.output_dir) if name.endswith(".jsonl.gz")]
+        with gzip.open(os.path.join(self.output_dir, name), "rt", encoding="utf-8") as f:
+            return [json.loads(line) for line in f]
+
+    def test_archive_then_delete(self):
+        self.archive()
+        rows = self.archived_rows()
+        self.assertEqual([row["id"] for row in rows], self.old_ids)
+        self.assertEqual({row["telegram_id"] for row in rows}, {42})
+        self.assertEqual(UserRequestHistory.objects.count(), 2)
+        self.assertFalse(UserRequestHistory.objects.filter(id__in=self.old_ids).exists())
+        self.assertFalse(os.path.exists(os.path.join(self.output_dir, "checkpoint.json")))
+
+    def test_resume_after_interruption(self):
+        # Вторая пачка записана в архив, но прерывание случилось до её удаления
+        fail_second_delete = mock.patch(
+            "users.management.commands.archive_requests.transaction",
+            **{"atomic.side_effect": [transaction.atomic(), KeyboardInterrupt]},
+        )
+        with fail_second_delete, self.assertRaises(KeyboardInterrupt):
+            self.archive()
+        with open(os.path.join(self.output_dir, "checkpoint.json"), encoding="utf-8") as f:
+            checkpoint = json.load(f)
+        self.assertEqual(checkpoint["deleted_through"], self.old_ids[2])
+        self.assertEqual(checkpoint["archived_through"], self.old_ids[5])
+        self.assertEqual(UserRequestHistory.objects.count(), 7)
+
+        # Недописанный блок следующей пачки отрезается при продолжении
+        [name] = [name for name in os.listdir(self.output_dir) if name.endswith(".jsonl.gz")]
+        with open(os.path.join(self.output_dir, name), "ab") as f:
+            f.write(b"\x1f\x8b partial")
+
+        self.archive()
+        self.assertEqual([row["id"] for row in self.archived_rows()], self.old_ids)
+        self.assertEqual(UserRequestHistory.objects.count(), 2)
+        self.assertFalse(os.path.exists(os.path.join(self.output_dir, "checkpoint.json")))
+
+
+class RecipientsTests(BotClientTestCase):
+    url = "/api/users/recipients/"
+
+    @classmethod
+    def setUpTestData(cls):
+        User.objects.bulk_create(User(telegram_id=telegram_id) for telegram_id in range(1, 11))
+
+    def recipients(self, limit=3):
+        telegram_ids, after = [], None
+        while True:
+            response = self.get(self.url, {"limit": limit, **({"after": after} if after else {})})
+            self.assertEqual(response.status_code, 200)
+            data = response.json()
+            telegram_ids += data["results"]
+            after = data["next_after"]
+            if after is None:
+                return telegram_ids
+
+    def test_pages(self):
+        self.assertEqual(self.recipients(), list(range(1, 11)))
+
+    def test_blocked_excluded_until_register(self):
+        response = self.post("/api/users/blocked/", {"telegram_ids": [2, 5, 42]})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {"updated": 2})
+        self.assertEqual(self.recipients(), [1, 3, 4, 6, 7, 8, 9, 10])
+        # Повторная отметка ничего не меняет
+        self.assertEqual(self.post("/api/users/blocked/", {"telegram_ids": [2]}).json(), {"updated": 0})
+
+        # Повторный /start возвращает пользователя в рассылку
+        response = self.client.post("/api/users/register/", {"telegram_id": 5}, content_type="application/json")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.recipients(), [1, 3, 4, 5, 6, 7, 8, 9, 10])
+
+    def test_bad_params(self):
+        self.assertEqual(self.get(self.url, {"after": "x"}).status_code, 400)
+        self.assertEqual(self.post("/api/users/blocked/", {"telegram_ids": ["1"]}).status_code, 400)
+
+    def test_requires_token(self):
+        self.assertEqual(self.get(self.url, token="wrong").status_code, 403)
+        self.assertEqual(self.post("/api/users/blocked/", {"telegram_ids": [1]}, token="").status_code, 403)
+        self.assertIsNone(User.objects.get(telegram_id=1).blocked_at)
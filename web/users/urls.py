@@ -1,7 +1,28 @@
+from django.conf import settings
 from django.urls import path
-from .views import UserCreateView, UserRequestCreateView
+from . import async_views
+from .views import (
+    BlockedUsersView,
+    RecipientListView,
+    UserCreateView,
+    UserRequestCreateView,
+    UserRequestListView,
+)
 
-urlpatterns = [
-    path('register/', UserCreateView.as_view(), name='user-register'),
-    path('requests/', UserRequestCreateView.as_view(), name='user-request-create'),
-]
\ No newline at end of file
+if settings.ASYNC_API:
+    # Под ASGI регистрацию и запись истории обрабатывают асинхронные представления
+    urlpatterns = [
+        path('register/', async_views.register_user, name='user-register'),
+        path('requests/', async_views.create_user_request, name='user-request-create'),
+        path('<int:telegram_id>/requests/', async_views.list_user_requests, name='user-request-list'),
+        path('recipients/', async_views.list_recipients, name='user-recipients'),
+        path('blocked/', async_views.mark_blocked, name='user-blocked'),
+    ]
+else:
+    urlpatterns = [
+        path('register/', UserCreateView.as_view(), name='user-register'),
+        path('requests/', UserRequestCreateView.as_view(), name='user-request-create'),
+        path('<int:telegram_id>/requests/', UserRequestListView.as_view(), name='user-request-list'),
+        path('recipients/', RecipientListView.as_view(), name='user-recipients'),
+        path('blocked/', BlockedUsersView.as_view(), name='user-blocked'),
+    ]
@@ -1,22 +1,116 @@
-from rest_framework import generics, permissions
+from rest_framework import generics
 from rest_framework.response import Response
 from rest_framework import status
+from rest_framework.views import APIView
+from mystratarotbot.permissions import BOT_ONLY_ERROR, is_bot_request
 from .models import User, UserRequestHistory
-from .serializers import UserSerializer, UserRequestHistorySerializer
+from .pagination import (
+    keyset_page,
+    page_data,
+    parse_blocked_ids,
+    parse_page_params,
+    parse_recipient_params,
+    recipients_data,
+    recipients_page,
+)
+from .serializers import UserRegisterSerializer, UserRequestHistorySerializer, UserSerializer
+
+# Разбор запросов и ответы общие для этих представлений и async_views
+
+
+def parse_registration(data):
+    """Проверяет данные регистрации; возвращает (telegram_id, остальные поля, ошибки)"""
+    serializer = UserRegisterSerializer(data=data)
+    if not serializer.is_valid():
+        return None, None, serializer.errors
+    fields = dict(serializer.validated_data)
+    return fields.pop("telegram_id"), fields, None
+
+
+def registration_data(user, created):
+    """Тело и статус ответа регистрации; уже зарегистрированный — ошибка, как у DRF"""
+    if not created:
+        return {"telegram_id": ["user with this telegram id already exists."]}, status.HTTP_400_BAD_REQUEST
+    return UserSerializer(user).data, status.HTTP_201_CREATED
+
+
+def parse_history_entry(data):
+    """Проверяет запись истории; возвращает (telegram_id, остальные поля, ошибки)"""
+    if not data.get("telegram_id"):
+        return None, None, {"error": "telegram_id is required"}
+    serializer = UserRequestHistorySerializer(data=data)
+    if not serializer.is_valid():
+        return None, None, serializer.errors
+    fields = dict(serializer.validated_data)
+    return fields.pop("telegram_id"), fields, None
+
+
+def history_entry_data(history):
+    """Тело и статус ответа на запись истории; None — пользователь не найден"""
+    if history is None:
+        return {"error": "User not found"}, status.HTTP_404_NOT_FOUND
+    return UserRequestHistorySerializer(history).data, status.HTTP_201_CREATED
+
 
 # Создание нового пользователя
-class UserCreateView(generics.CreateAPIView):
-    queryset = User.objects.all()
-    serializer_class = UserSerializer
+class UserCreateView(APIView):
+    def post(self, request):
+        telegram_id, fields, errors = parse_registration(request.data)
+        if errors:
+            return Response(errors, status=status.HTTP_400_BAD_REQUEST)
+        data, code = registration_data(*User.objects.register(telegram_id, **fields))
+        return Response(data, status=code)
+
 
+class UserRequestCreateView(APIView):
+    def post(self, request):
+        telegram_id, fields, errors = parse_history_entry(request.data)
+        if errors:
+            return Response(errors, status=status.HTTP_400_BAD_REQUEST)
+        data, code = history_entry_data(UserRequestHistory.objects.record(telegram_id, **fields))
+        return Response(data, status=code)
+
+
+class UserRequestListView(generics.GenericAPIView):
+    """История запросов пользователя, новые сверху, с keyset-пагинацией (?cursor=&limit=)"""
 
-class UserRequestCreateView(generics.CreateAPIView):
     serializer_class = UserRequestHistorySerializer
 
-    def create(self, request, *args, **kwargs):
-        telegram_id = request.data.get("telegram_id")
-        if not telegram_id:
-            return Response({"error": "telegram_id is required"}, status=status.HTTP_400_BAD_REQUEST)
-        if not User.objects.filter(telegram_id=telegram_id).exists():
+    def get(self, request, telegram_id):
+        if not is_bot_request(request):
+            return Response(BOT_ONLY_ERROR, status=status.HTTP_403_FORBIDDEN)
+        position, limit, error = parse_page_params(request.query_params)
+        if error:
+            return Response({"error": error}, status=status.HTTP_400_BAD_REQUEST)
+
+        user_id = User.objects.filter(telegram_id=telegram_id).values_list("id", flat=True).first()
+        if user_id is None:
             return Response({"error": "User not found"}, status=status.HTTP_404_NOT_FOUND)
-        return super().create(request, *args, **kwargs)
+
+        items = list(keyset_page(UserRequestHistory.objects.filter(user_id=user_id), position, limit))
+        return Response(page_data(items, limit, self.serializer_class))
+
+
+class RecipientListView(APIView):
+    """telegram_id получателей рассылки по возрастанию (?after=&limit=), без заблокировавших бота"""
+
+    def get(self, request):
+        if not is_bot_request(request):
+            return Response(BOT_ONLY_ERROR, status=status.HTTP_403_FORBIDDEN)
+        after, limit, error = parse_recipient_params(request.query_params)
+        if error:
+            return Response({"error": error}, status=status.HTTP_400_BAD_REQUEST)
+        telegram_ids = list(recipients_page(User.objects.all(), after, limit))
+        return Response(recipients_data(telegram_ids, limit))
+
+
+class BlockedUsersView(APIView):
+    """Отмечает пользователей, заблокировавших бота: рассылка их больше не получает"""
+
+    def post(self, request):
+        if not is_bot_request(request):
+            return Response(BOT_ONLY_ERROR, status=status.HTTP_403_FORBIDDEN)
+        telegram_ids, error = parse_blocked_ids(request.data)
+        if error:
+            return Response({"error": error}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({"updated": User.objects.mark_blocked(telegram_ids)})